@@ -0,0 +1,309 @@
+"""
+离线接口基准测试：在本地数据库中生成测试数据，通过Flask test client逐个请求所有API，
+统计吞吐量、p50/p95/p99耗时和SQL条数，并输出可用于对比的基准结果
+
+用法：
+    python -m benchmarks.run                                  # 使用临时sqlite数据库
+    python -m benchmarks.run --database-uri mysql://... --reset
+    python -m benchmarks.run --output baseline.json           # 保存基准结果
+    python -m benchmarks.run --compare baseline.json          # 与基准结果对比，有退化时返回码为1
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='离线接口基准测试')
+    parser.add_argument('--database-uri', help='数据库地址，默认使用临时sqlite数据库')
+    parser.add_argument('--reset', action='store_true', help='先删除数据库中已有的表再生成数据')
+    parser.add_argument('--scale', type=float, default=1.0, help='测试数据规模倍数，默认1')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--skew', type=float, help='测试数据的幂律分布指数，0为均匀分布')
+    parser.add_argument('--requests', type=int, default=50, help='每个接口的请求次数，默认50')
+    parser.add_argument('--warmup', type=int, default=3, help='每个接口正式统计前的预热请求次数')
+    parser.add_argument('--only', help='只测试名称中包含该字符串的接口')
+    parser.add_argument('--output', help='将结果写入该JSON文件')
+    parser.add_argument('--compare', help='与该JSON基准结果对比')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='对比时允许的p95耗时增幅，默认0.2')
+    return parser.parse_args()
+
+
+def build_routes(sizes, rng):
+    """
+    生成需要测试的接口列表，每个接口随机选择数据中存在的ID和用户
+    :param sizes: 各表的行数
+    :param rng: 随机数生成器
+    :return: [(接口名称, 请求方法, 生成请求参数的函数)]
+    """
+    from benchmarks.datagen import openid_of, plan_owner
+
+    def user():
+        return rng.randint(1, sizes['users'])
+
+    def headers(user_id=None):
+        return {'X-WX-OPENID': openid_of(user_id or user())}
+
+    def news_id():
+        return rng.randint(1, sizes['news'])
+
+    def companion_id():
+        return rng.randint(1, sizes['companions'])
+
+    def own_plan():
+        plan_id = rng.randint(1, sizes['plans'])
+        return plan_id, headers(plan_owner(plan_id, sizes))
+
+    def future_day(offset):
+        return (date.today() + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+    def plan_detail(prefix):
+        plan_id, plan_headers = own_plan()
+        return '{}/{}'.format(prefix, plan_id), {'headers': plan_headers}
+
+    def reserve():
+        start = rng.randint(1, 300)
+        return '/api/companion/reserve', {'headers': headers(), 'json': {
+            'companion_id': companion_id(), 'start_date': future_day(start), 'end_date': future_day(start + 2)}}
+
+    return [
+        ('GET /api/count', 'GET', lambda: ('/api/count', {})),
+        ('POST /api/count', 'POST', lambda: ('/api/count', {'json': {'action': 'inc'}})),
+        ('POST /api/user/login', 'POST', lambda: ('/api/user/login', {'headers': headers(), 'json': {}})),
+        ('POST /api/user/update', 'POST', lambda: ('/api/user/update', {
+            'headers': headers(), 'json': {'nickname': '旅行者'}})),
+        ('GET /api/user/info', 'GET', lambda: ('/api/user/info', {'headers': headers()})),
+        ('GET /api/guides', 'GET', lambda: ('/api/guides?page=1', {})),
+        ('GET /api/guides/<id>', 'GET', lambda: ('/api/guides/{}'.format(rng.randint(1, sizes['guides'])), {
+            'headers': headers()})),
+        ('POST /api/guides', 'POST', lambda: ('/api/guides', {'json': {'title': '新攻略', 'content': '内容'}})),
+        ('GET /api/attraction/list', 'GET', lambda: ('/api/attraction/list?page=1', {})),
+        ('GET /api/attraction/<id>', 'GET', lambda: (
+            '/api/attraction/{}'.format(rng.randint(1, sizes['attractions'])), {})),
+        ('POST /api/favorite/add', 'POST', lambda: ('/api/favorite/add', {'headers': headers(), 'json': {
+            'type': 'attraction', 'item_id': rng.randint(1, sizes['attractions'])}})),
+        ('POST /api/favorite/remove', 'POST', lambda: ('/api/favorite/remove', {'headers': headers(), 'json': {
+            'type': 'attraction', 'item_id': rng.randint(1, sizes['attractions'])}})),
+        ('GET /api/favorite/list', 'GET', lambda: ('/api/favorite/list', {'headers': headers()})),
+        ('GET /api/favorites', 'GET', lambda: ('/api/favorites', {'headers': headers()})),
+        ('POST /api/plan/create', 'POST', lambda: ('/api/plan/create', {'headers': headers(), 'json': {
+            'title': '新行程', 'start_date': future_day(1), 'end_date': future_day(3)}})),
+        ('POST /api/plan/item/add', 'POST', lambda: ('/api/plan/item/add', {'json': {
+            'plan_id': rng.randint(1, sizes['plans']), 'day': 1,
+            'attraction_id': rng.randint(1, sizes['attractions'])}})),
+        ('GET /api/plan/list', 'GET', lambda: ('/api/plan/list', {'headers': headers()})),
+        ('GET /api/plan/<id>', 'GET', lambda: plan_detail('/api/plan')),
+        ('GET /api/plans', 'GET', lambda: ('/api/plans', {'headers': headers()})),
+        ('GET /api/plans/<id>', 'GET', lambda: plan_detail('/api/plans')),
+        ('GET /api/initialize/status', 'GET', lambda: ('/api/initialize/status', {})),
+        ('GET /api/news/list', 'GET', lambda: ('/api/news/list?page=1', {
+            'headers': headers()})),
+        ('GET /api/news/<id>', 'GET', lambda: ('/api/news/{}'.format(news_id()), {'headers': headers()})),
+        ('POST /api/news/like', 'POST', lambda: ('/api/news/like', {'headers': headers(), 'json': {
+            'news_id': news_id()}})),
+        ('POST /api/news/unlike', 'POST', lambda: ('/api/news/unlike', {'headers': headers(), 'json': {
+            'news_id': news_id()}})),
+        ('GET /api/news/liked', 'GET', lambda: ('/api/news/liked?ids={}'.format(
+            ','.join(str(news_id()) for _ in range(20))), {'headers': headers()})),
+        ('GET /api/news/comments/<id>', 'GET', lambda: ('/api/news/comments/{}'.format(news_id()), {})),
+        ('GET /api/news/comments/<id>/replies', 'GET', lambda: ('/api/news/comments/{}/replies'.format(
+            rng.randint(1, sizes['news_comments'])), {})),
+        ('POST /api/news/comment', 'POST', lambda: ('/api/news/comment', {'headers': headers(), 'json': {
+            'news_id': news_id(), 'content': '写得很好'}})),
+        ('GET /api/companion/list', 'GET', lambda: ('/api/companion/list?page=1', {})),
+        ('GET /api/companion/<id>', 'GET', lambda: ('/api/companion/{}'.format(companion_id()), {})),
+        ('GET /api/companion/tags', 'GET', lambda: ('/api/companion/tags', {})),
+        ('GET /api/companion/<id>/availability', 'GET', lambda: ('/api/companion/{}/availability?month={}'.format(
+            companion_id(), future_day(rng.randint(0, 300))[:7]), {})),
+        ('POST /api/companion/reserve', 'POST', reserve),
+        ('GET /api/companion/orders', 'GET', lambda: ('/api/companion/orders', {'headers': headers()})),
+        ('POST /api/companion/review', 'POST', lambda: ('/api/companion/review', {'headers': headers(), 'json': {
+            'reservation_id': rng.randint(1, sizes['reservations']), 'rating': 5}})),
+        ('POST /api/user/follow', 'POST', lambda: ('/api/user/follow', {'headers': headers(), 'json': {
+            'following_id': openid_of(user())}})),
+        ('POST /api/user/unfollow', 'POST', lambda: ('/api/user/unfollow', {'headers': headers(), 'json': {
+            'following_id': openid_of(user())}})),
+        ('GET /api/user/followers', 'GET', lambda: ('/api/user/followers', {'headers': headers()})),
+        ('GET /api/user/following', 'GET', lambda: ('/api/user/following', {'headers': headers()})),
+        ('GET /api/solution/list', 'GET', lambda: ('/api/solution/list?page=1', {})),
+        ('GET /api/solution/<id>', 'GET', lambda: ('/api/solution/{}'.format(rng.randint(1, sizes['solutions'])), {})),
+        ('POST /api/solution/apply', 'POST', lambda: ('/api/solution/apply', {'headers': headers(), 'json': {
+            'solution_id': rng.randint(1, sizes['solutions'])}})),
+        ('POST /api/feedback/submit', 'POST', lambda: ('/api/feedback/submit', {'headers': headers(), 'json': {
+            'type': '建议', 'content': '希望增加更多目的地'}})),
+        ('GET /api/about/info', 'GET', lambda: ('/api/about/info?type=company', {})),
+        ('GET /api/search', 'GET', lambda: ('/api/search?keyword={}'.format(rng.choice(['北京', '成都', '京都'])), {})),
+    ]
+
+
+def percentile(sorted_values, percent):
+    """
+    最近秩法计算百分位数
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def is_error(response):
+    if response.status_code >= 400:
+        return True
+    if response.mimetype != 'application/json':
+        return False
+    body = response.get_json(silent=True)
+    return isinstance(body, dict) and body.get('code', 0) != 0
+
+
+def run_route(client, method, make_request, requests, warmup, query_counter):
+    """
+    对单个接口发起请求并统计结果
+    """
+    for _ in range(warmup):
+        path, kwargs = make_request()
+        client.open(path, method=method, **kwargs)
+
+    latencies = []
+    queries = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        path, kwargs = make_request()
+        query_counter['count'] = 0
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(query_counter['count'])
+        if is_error(response):
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries_avg': round(sum(queries) / float(len(queries)), 2) if queries else 0,
+        'queries_max': max(queries) if queries else 0
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基准结果对比，返回退化的接口列表
+    p95耗时增幅超过tolerance（且绝对值超过1ms）或平均SQL条数增加都视为退化
+    """
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline['routes'].get(name)
+        if previous is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance) and current['p95_ms'] - previous['p95_ms'] > 1:
+            regressions.append('{}: p95 {:.3f}ms -> {:.3f}ms'.format(name, previous['p95_ms'], current['p95_ms']))
+        if current['queries_avg'] > previous['queries_avg'] + 0.5:
+            regressions.append('{}: SQL条数 {} -> {}'.format(name, previous['queries_avg'], current['queries_avg']))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    warnings.filterwarnings('ignore')
+
+    temp_dir = None
+    database_uri = args.database_uri
+    if not database_uri:
+        temp_dir = tempfile.mkdtemp(prefix='travel-bench-')
+        database_uri = 'sqlite:///' + os.path.join(temp_dir, 'bench.db')
+    os.environ['DATABASE_URI'] = database_uri
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    # 压测在单进程中执行，默认使用进程内存储测量详情缓存的效果
+    os.environ.setdefault('SHARED_CACHE_URL', 'memory://')
+
+    # 需要在设置环境变量之后再导入应用
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from wxcloudrun import create_app, db
+    from benchmarks.datagen import DEFAULT_SKEW, generate
+
+    app = create_app()
+    # 接口内部的错误日志只计入错误数，不输出
+    logging.getLogger('travel-cloud').setLevel(logging.CRITICAL)
+    with app.app_context():
+        if args.reset or temp_dir:
+            db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        sizes = generate(db.engine, args.scale, args.seed, DEFAULT_SKEW if args.skew is None else args.skew)
+        print('生成测试数据 {} 行，耗时 {:.1f}s'.format(sum(sizes.values()), time.perf_counter() - start))
+
+    query_counter = {'count': 0}
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        query_counter['count'] += 1
+
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'database': database_uri.split('://')[0],
+            'scale': args.scale,
+            'skew': DEFAULT_SKEW if args.skew is None else args.skew,
+            'requests': args.requests,
+            'python': platform.python_version(),
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        },
+        'routes': {}
+    }
+
+    print('{:<32} {:>8} {:>6} {:>9} {:>9} {:>9} {:>7} {:>6}'.format(
+        '接口', 'req/s', '错误', 'p50(ms)', 'p95(ms)', 'p99(ms)', 'SQL均值', 'SQL最大'))
+    for name, method, make_request in build_routes(sizes, rng):
+        if args.only and args.only not in name:
+            continue
+        result = run_route(client, method, make_request, args.requests, args.warmup, query_counter)
+        results['routes'][name] = result
+        print('{:<32} {:>8} {:>6} {:>9} {:>9} {:>9} {:>7} {:>6}'.format(
+            name, result['throughput_rps'], result['errors'], result['p50_ms'], result['p95_ms'], result['p99_ms'],
+            result['queries_avg'], result['queries_max']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print('结果已写入 {}'.format(args.output))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('与基准 {} 相比存在退化:'.format(baseline['meta'].get('commit')))
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print('与基准 {} 相比无退化'.format(baseline['meta'].get('commit')))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,115 @@
 import os
 
-# 是否开启debug模式
-DEBUG = True
+# 服务运行模式：development 使用Flask自带的开发服务器，production 使用gunicorn多进程服务
+SERVER_MODE = os.environ.get("SERVER_MODE", 'development')
+
+# 是否开启debug模式，生产模式下默认关闭
+DEBUG = os.environ.get("FLASK_DEBUG", '0' if SERVER_MODE == 'production' else '1') == '1'
+
+# 生产模式下的gunicorn配置
+# worker进程数，1核实例建议2个
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", 2))
+# worker类型：gthread（多线程）或 gevent（协程）
+SERVER_WORKER_CLASS = os.environ.get("SERVER_WORKER_CLASS", 'gthread')
+# gthread模式下每个worker的线程数
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 4))
+# gevent模式下每个worker的最大并发连接数
+SERVER_WORKER_CONNECTIONS = int(os.environ.get("SERVER_WORKER_CONNECTIONS", 1000))
+# keep-alive连接的保持时间（秒）
+SERVER_KEEPALIVE = int(os.environ.get("SERVER_KEEPALIVE", 5))
+# 请求处理超时时间（秒）
+SERVER_TIMEOUT = int(os.environ.get("SERVER_TIMEOUT", 30))
+# 收到退出信号后等待处理中请求完成的时间（秒）
+SERVER_GRACEFUL_TIMEOUT = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", 30))
 
 # 读取数据库环境变量
 username = os.environ.get("MYSQL_USERNAME", 'root')
 password = os.environ.get("MYSQL_PASSWORD", 'ug3qudNb')
 db_address = os.environ.get("MYSQL_ADDRESS", '127.0.0.1:3306')
+
+# 数据库连接地址，不设置时根据上面的MySQL变量拼接，本地测试可设置为sqlite地址
+DATABASE_URI = os.environ.get("DATABASE_URI", '')
+
+# 数据库连接池配置
+# 连接池常驻连接数
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+# 连接池满后允许额外创建的连接数
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+# 连接回收时间（秒），需小于MySQL的wait_timeout，避免使用已被服务端断开的连接
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 280))
+# 取出连接时先ping一次，自动替换失效连接
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", '1') == '1'
+# 连接池耗尽时等待可用连接的超时时间（秒）
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 10))
+
+# 只读实例地址，多个用逗号分隔，账号密码与主库相同；不设置时所有读写都走主库
+DB_REPLICA_ADDRESSES = [address.strip() for address in os.environ.get("MYSQL_REPLICA_ADDRESSES", '').split(',')
+                        if address.strip()]
+# 写操作后该用户的读请求固定走主库的时长（秒），保证读到自己的写入
+DB_REPLICA_PIN_SECONDS = int(os.environ.get("DB_REPLICA_PIN_SECONDS", 5))
+
+# 是否统计各路由的请求耗时和SQL条数，统计结果通过 /metrics 输出
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", '1') == '1'
+
+# 单次请求SQL条数检查：off 关闭，warn 超出预算时记录告警（预发环境），raise 超出预算时报错（测试环境）
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", 'off')
+# 同一条查询在一次请求中重复执行达到该次数时视为N+1查询并告警
+QUERY_REPEAT_THRESHOLD = int(os.environ.get("QUERY_REPEAT_THRESHOLD", 5))
+
+# 响应使用的JSON编码器：auto 优先使用orjson，未安装时使用标准库json；也可指定 orjson 或 json
+JSON_BACKEND = os.environ.get("JSON_BACKEND", 'auto')
+
+# 响应压缩：按Accept-Encoding使用brotli（需安装brotli）或gzip压缩响应体
+COMPRESSION_ENABLED = os.environ.get("COMPRESSION_ENABLED", '1') == '1'
+# 小于该字节数的响应不压缩
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+# gzip压缩级别（1-9）
+COMPRESSION_LEVEL = int(os.environ.get("COMPRESSION_LEVEL", 6))
+# brotli压缩质量（0-11）
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+# 除text/*外需要压缩的类型，图片、压缩包等已压缩的类型不在其中
+COMPRESSION_MIMETYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+# 协商缓存：为GET响应添加ETag/Last-Modified，客户端缓存未过期时返回304
+CONDITIONAL_GET_ENABLED = os.environ.get("CONDITIONAL_GET_ENABLED", '1') == '1'
+# 没有声明版本查询函数的接口按响应内容计算ETag（仍需执行查询，但可以省去响应体的传输）
+CONDITIONAL_GET_CONTENT_HASH = os.environ.get("CONDITIONAL_GET_CONTENT_HASH", '1') == '1'
+
+# openid到用户信息的进程内缓存：最大条目数（0为关闭）和过期时间（秒），用户信息更新后其他worker最多在该时间后读到新数据
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 60))
+
+# 详情接口的共享缓存：redis://[:password@]host[:port][/db] 为多个容器共享的Redis，memory:// 为进程内存储（只用于单进程的本地开发和测试），默认为空即关闭
+# 生产环境的多个gunicorn worker各有一份进程内存储，缓存删除不会同步到其他worker，不要使用memory://
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", '')
+# 缓存key的前缀，缓存的数据结构变化时修改前缀即可使旧数据失效
+SHARED_CACHE_PREFIX = os.environ.get("SHARED_CACHE_PREFIX", 'travel:v1:')
+# 访问缓存的超时时间（秒），超时按未命中处理
+SHARED_CACHE_TIMEOUT = float(os.environ.get("SHARED_CACHE_TIMEOUT", 0.2))
+# 各类数据的缓存时间（秒）
+SHARED_CACHE_DEFAULT_TTL = int(os.environ.get("SHARED_CACHE_DEFAULT_TTL", 300))
+SHARED_CACHE_TTLS = {
+    'attraction': int(os.environ.get("CACHE_TTL_ATTRACTION", 600)),
+    'companion': int(os.environ.get("CACHE_TTL_COMPANION", 120)),
+    'solution': int(os.environ.get("CACHE_TTL_SOLUTION", 300)),
+    'guide': int(os.environ.get("CACHE_TTL_GUIDE", 600)),
+    'companion_summary': int(os.environ.get("CACHE_TTL_COMPANION_SUMMARY", 600)),
+}
+
+# 浏览次数写回数据库的间隔（秒），期间的浏览次数在内存中累计后合并为一条UPDATE；设置为0时每次浏览立即写回
+VIEW_COUNTER_FLUSH_INTERVAL = float(os.environ.get("VIEW_COUNTER_FLUSH_INTERVAL", 10))
+
+# /api/count的计数分片数：自增随机落在Counters表ID为1到该值的其中一行上，读取时求和；减少分片数前需先把多出的分片合并到保留的分片
+COUNTER_SHARDS = int(os.environ.get("COUNTER_SHARDS", 16))
+# 计数合计值的进程内缓存时间（秒），本进程自增和清零时会失效
+COUNTER_CACHE_TTL = float(os.environ.get("COUNTER_CACHE_TTL", 1))
+
+# 资讯评论列表中每条评论附带的回复条数，其余回复通过 /api/news/comments/<评论ID>/replies 按游标获取
+NEWS_REPLY_PREVIEW_SIZE = int(os.environ.get("NEWS_REPLY_PREVIEW_SIZE", 3))
+
+# 向导标签索引的重建间隔（秒），标签和向导标签关系变更后其他worker最多在该时间后读到新数据
+COMPANION_TAG_INDEX_TTL = int(os.environ.get("COMPANION_TAG_INDEX_TTL", 300))
+# 按标签筛选向导时，标签索引算出的候选向导数超过该值时改为在数据库中用子查询筛选，避免IN列表过长
+COMPANION_TAG_FILTER_MAX_IDS = int(os.environ.get("COMPANION_TAG_FILTER_MAX_IDS", 5000))
+# 向导列表筛选项的价格区间分界点，如 0,300,500 分为 <0、[0,300)、[300,500)、>=500，空的区间不返回
+COMPANION_PRICE_BANDS = [int(bound) for bound in os.environ.get("COMPANION_PRICE_BANDS", "300,500,1000,2000").split(',')]
@@ -1,8 +1,30 @@
-# 创建应用实例
 import sys
 
-from wxcloudrun import app
+import config
+
+# gevent模式需要在导入其他模块之前打补丁
+if config.SERVER_MODE == 'production' and config.SERVER_WORKER_CLASS == 'gevent':
+    try:
+        from gevent import monkey
+        monkey.patch_all()
+    except ImportError:
+        pass
+
+# 创建应用实例
+from wxcloudrun import create_app, init_database, reconcile_ratings
+
+app = create_app()
 
 # 启动Flask Web服务
 if __name__ == '__main__':
-    app.run(host=sys.argv[1], port=sys.argv[2])
+    # python run.py init-db 创建数据库表
+    if sys.argv[1] == 'init-db':
+        init_database(app)
+    # python run.py reconcile-ratings 校正向导评分
+    elif sys.argv[1] == 'reconcile-ratings':
+        reconcile_ratings(app)
+    elif config.SERVER_MODE == 'production':
+        from wxcloudrun.server import run_production
+        run_production(app, host=sys.argv[1], port=sys.argv[2])
+    else:
+        app.run(host=sys.argv[1], port=sys.argv[2])
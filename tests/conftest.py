@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+# 测试使用临时的SQLite数据库和进程内共享缓存，超出SQL预算的请求直接报错；需要在导入应用之前设置
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['QUERY_BUDGET_MODE'] = 'raise'
+os.environ['SHARED_CACHE_URL'] = 'memory://'
+os.environ['METRICS_ENABLED'] = '0'
+
+import pytest  # noqa: E402
+
+from wxcloudrun import create_app, db  # noqa: E402
+from wxcloudrun.common.cache import TTLCache, caches  # noqa: E402
+from wxcloudrun.common.shared_cache import MemoryBackend, shared_cache  # noqa: E402
+from wxcloudrun.common.tag_index import companion_tag_index  # noqa: E402
+from wxcloudrun.common.view_counter import view_counter  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """
+    每个测试使用空的数据库和缓存
+    """
+    from wxcloudrun import model  # noqa: F401
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    shared_cache.backend = MemoryBackend()
+    for cache in caches.values():
+        if isinstance(cache, TTLCache):
+            cache.clear()
+    companion_tag_index.invalidate()
+    view_counter.flush()
+    yield
+    with app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def add(app):
+    """
+    在应用上下文中插入数据并提交
+    :return: 函数，参数为模型实例，返回插入后的ID列表
+    """
+
+    def add_rows(*rows):
+        with app.app_context():
+            db.session.add_all(rows)
+            db.session.commit()
+            return [getattr(row, 'id', None) for row in rows]
+
+    return add_rows
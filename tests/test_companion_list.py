@@ -0,0 +1,192 @@
+import bisect
+import random
+
+import pytest
+
+import config
+from wxcloudrun.common.tag_index import companion_tag_index
+from wxcloudrun.model import Companion, CompanionTag, CompanionTagRelation
+
+LOCATIONS = ['杭州', '苏州', '成都', '西安']
+TAGS = ['美食', '摄影', '徒步', '亲子', '历史']
+
+
+@pytest.fixture
+def companions(add):
+    """
+    随机生成向导和标签，返回 {向导ID: (价格, 地点, 状态, 标签ID集合)}，作为检查接口结果的参照
+    """
+    rng = random.Random(7)
+    tag_ids = add(*[CompanionTag(name=name) for name in TAGS])
+    rows = [Companion(user_id='guide_{}'.format(i), title='向导{}'.format(i), price=rng.choice([100, 300, 450, 800, 2500]),
+                      location=rng.choice(LOCATIONS), status=1 if rng.random() < 0.8 else 0, rating=rng.randint(1, 5))
+            for i in range(60)]
+    companion_ids = add(*rows)
+    data = {}
+    relations = []
+    for companion_id, row in zip(companion_ids, rows):
+        tags = set(rng.sample(tag_ids, rng.randint(0, 3)))
+        relations.extend(CompanionTagRelation(companion_id=companion_id, tag_id=tag_id) for tag_id in tags)
+        data[companion_id] = (row.price, row.location, row.status, tags)
+    add(*relations)
+    return {'tag_ids': tag_ids, 'data': data}
+
+
+def expected_ids(data, tag_ids=(), match_all=True, location=None, min_price=None, max_price=None):
+    ids = []
+    for companion_id, (price, companion_location, status, tags) in data.items():
+        if status != 1:
+            continue
+        if tag_ids and not (set(tag_ids) <= tags if match_all else set(tag_ids) & tags):
+            continue
+        if location and location not in companion_location:
+            continue
+        if min_price is not None and price < min_price:
+            continue
+        if max_price is not None and price > max_price:
+            continue
+        ids.append(companion_id)
+    return sorted(ids)
+
+
+def expected_facets(data, ids, tag_names):
+    bounds = config.COMPANION_PRICE_BANDS
+    edges = [None] + list(bounds) + [None]
+    price_counts, location_counts, tag_counts = {}, {}, {}
+    for companion_id in ids:
+        price, location, _, tags = data[companion_id]
+        band = bisect.bisect_right(bounds, price)
+        price_counts[band] = price_counts.get(band, 0) + 1
+        location_counts[location] = location_counts.get(location, 0) + 1
+        for tag_id in tags:
+            tag_counts[tag_id] = tag_counts.get(tag_id, 0) + 1
+    return {
+        'tags': [{'id': tag_id, 'name': tag_names[tag_id], 'count': count}
+                 for tag_id, count in sorted(tag_counts.items(), key=lambda item: (-item[1], item[0]))],
+        'price_bands': [{'min': edges[band], 'max': edges[band + 1], 'count': price_counts[band]}
+                        for band in sorted(price_counts)],
+        'locations': [{'location': location, 'count': count}
+                      for location, count in sorted(location_counts.items(), key=lambda item: (-item[1], item[0]))]
+    }
+
+
+def list_companions(client, **params):
+    params.setdefault('page_size', 100)
+    result = client.get('/api/companion/list', query_string=params).get_json()
+    assert result['code'] == 0, result
+    return result['data']
+
+
+FILTERS = [
+    {},
+    {'tag_ids': [0]},
+    {'tag_ids': [0, 1]},
+    {'tag_ids': [0, 1], 'match_all': False},
+    {'tag_ids': [2, 3, 4], 'match_all': False},
+    {'location': '杭'},
+    {'min_price': 300, 'max_price': 800},
+    {'tag_ids': [1], 'location': '成都', 'max_price': 500},
+    {'tag_ids': [0, 2], 'match_all': False, 'min_price': 450},
+]
+
+
+def request_params(companions, filters):
+    params = {'facets': 1}
+    if filters.get('tag_ids'):
+        params['tag_ids'] = ','.join(str(companions['tag_ids'][i]) for i in filters['tag_ids'])
+        params['tag_match'] = 'all' if filters.get('match_all', True) else 'any'
+    for key in ('location', 'min_price', 'max_price'):
+        if key in filters:
+            params[key] = filters[key]
+    return params
+
+
+def oracle_ids(companions, filters):
+    return expected_ids(companions['data'], [companions['tag_ids'][i] for i in filters.get('tag_ids', [])],
+                        filters.get('match_all', True), filters.get('location'), filters.get('min_price'),
+                        filters.get('max_price'))
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_facets_match_filtered_companions(client, companions, filters):
+    result = list_companions(client, **request_params(companions, filters))
+    ids = oracle_ids(companions, filters)
+    assert sorted(item['id'] for item in result['list']) == ids
+    tag_names = dict(zip(companions['tag_ids'], TAGS))
+    assert result['facets'] == expected_facets(companions['data'], ids, tag_names)
+
+
+def test_facets_without_matches(app, client, companions):
+    result = list_companions(client, facets=1, location='不存在')
+    assert result['total'] == 0
+    assert result['facets'] == {'tags': [], 'price_bands': [], 'locations': []}
+    with app.app_context():
+        assert companion_tag_index.count_tags(0) == []
+
+
+TAG_FILTERS = [filters for filters in FILTERS if filters.get('tag_ids')] + [
+    {'tag_ids': [0, 1, 2]},
+    {'tag_ids': [0, 1, 2, 3, 4], 'match_all': False},
+    {'tag_ids': [3, 3]},
+]
+
+
+@pytest.mark.parametrize('filters', TAG_FILTERS)
+def test_tag_filter_matches_sql_fallback(client, companions, filters, monkeypatch):
+    params = request_params(companions, filters)
+    params.pop('facets')
+    ids = oracle_ids(companions, filters)
+    bitset = list_companions(client, **params)
+    # 候选向导数超过上限时改用GROUP BY子查询筛选，两种方式的结果应完全相同
+    monkeypatch.setattr(config, 'COMPANION_TAG_FILTER_MAX_IDS', 0)
+    fallback = list_companions(client, **params)
+    assert sorted(item['id'] for item in bitset['list']) == ids
+    assert bitset == fallback
+
+
+def test_unknown_tag_matches_nothing(client, companions):
+    assert list_companions(client, tag_ids='999')['total'] == 0
+    tag_id = companions['tag_ids'][0]
+    any_result = list_companions(client, tag_ids='{},999'.format(tag_id), tag_match='any')
+    assert sorted(item['id'] for item in any_result['list']) == expected_ids(companions['data'], [tag_id])
+    assert list_companions(client, tag_ids='{},999'.format(tag_id), tag_match='all')['total'] == 0
+
+
+def test_invalid_tag_params(client, companions):
+    assert client.get('/api/companion/list?tag_ids=a').get_json()['code'] == -1
+    assert client.get('/api/companion/list?tag_ids=1&tag_match=some').get_json()['code'] == -1
+
+
+def test_tag_index_rebuilds_after_tag_edits(client, add, companions):
+    tag_id = companions['tag_ids'][0]
+    companion_id = next(companion_id for companion_id, (_, _, status, tags) in companions['data'].items()
+                        if status == 1 and tag_id not in tags)
+    before = {item['id'] for item in list_companions(client, tag_ids=tag_id)['list']}
+    assert before == set(expected_ids(companions['data'], [tag_id]))
+
+    # 给一个向导加上已有标签，并新建一个标签
+    new_tag_id, = add(CompanionTag(name='夜游'))
+    add(CompanionTagRelation(companion_id=companion_id, tag_id=tag_id),
+        CompanionTagRelation(companion_id=companion_id, tag_id=new_tag_id))
+
+    # 失效之前继续使用旧索引
+    assert {item['id'] for item in list_companions(client, tag_ids=tag_id)['list']} == before
+    assert list_companions(client, tag_ids=new_tag_id)['total'] == 0
+
+    companion_tag_index.invalidate()
+    assert {item['id'] for item in list_companions(client, tag_ids=tag_id)['list']} == before | {companion_id}
+    assert [item['id'] for item in list_companions(client, tag_ids=new_tag_id)['list']] == [companion_id]
+    detail_tags = client.get('/api/companion/{}'.format(companion_id)).get_json()['data']['tags']
+    assert {'id': new_tag_id, 'name': '夜游'} in detail_tags
+
+
+def test_detail_cache_follows_tag_index(client, add):
+    companion_id, = add(Companion(user_id='guide', title='向导', price=300, location='杭州', status=1))
+    tag_id, = add(CompanionTag(name='美食'))
+    assert client.get('/api/companion/{}'.format(companion_id)).get_json()['data']['tags'] == []
+
+    # 详情已进入共享缓存，修改标签并使索引失效后应返回新标签
+    add(CompanionTagRelation(companion_id=companion_id, tag_id=tag_id))
+    companion_tag_index.invalidate()
+    tags = client.get('/api/companion/{}'.format(companion_id)).get_json()['data']['tags']
+    assert tags == [{'id': tag_id, 'name': '美食'}]
@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from wxcloudrun import db
+from wxcloudrun.dao import reconcile_companion_ratings
+from wxcloudrun.model import Companion, CompanionReservation
+
+
+def review(client, reservation_id, user_id, rating):
+    return client.post('/api/companion/review', headers={'X-WX-OPENID': user_id},
+                       json={'reservation_id': reservation_id, 'rating': rating, 'content': '很好'}).get_json()
+
+
+def finished_reservations(add, companion_id, user_ids):
+    end = date.today() - timedelta(days=3)
+    return add(*[CompanionReservation(companion_id=companion_id, user_id=user_id, start_date=end - timedelta(days=2),
+                                      end_date=end, status=2) for user_id in user_ids])
+
+
+def rating_of(app, companion_id):
+    with app.app_context():
+        companion = Companion.query.get(companion_id)
+        return companion.rating, companion.rating_sum, companion.review_count
+
+
+def test_review_accumulates_rating(app, client, add):
+    companion_id, = add(Companion(user_id='guide_1', title='向导', price=300, location='杭州'))
+    user_ids = ['user_1', 'user_2', 'user_3']
+    reservation_ids = finished_reservations(add, companion_id, user_ids)
+
+    assert review(client, reservation_ids[0], user_ids[0], 5)['code'] == 0
+    assert rating_of(app, companion_id) == (Decimal('5.00'), Decimal('5.00'), 1)
+    assert review(client, reservation_ids[1], user_ids[1], 4)['code'] == 0
+    assert review(client, reservation_ids[2], user_ids[2], 3.5)['code'] == 0
+    assert rating_of(app, companion_id) == (Decimal('4.17'), Decimal('12.50'), 3)
+
+    # 重复评价不再累加
+    assert review(client, reservation_ids[0], user_ids[0], 1)['code'] == -1
+    assert rating_of(app, companion_id) == (Decimal('4.17'), Decimal('12.50'), 3)
+
+    # 评价后详情返回新的评分
+    detail = client.get('/api/companion/{}'.format(companion_id)).get_json()['data']
+    assert detail['review_count'] == 3
+
+
+def test_reconcile_restores_corrupted_aggregates(app, client, add):
+    reviewed_id, unreviewed_id, intact_id = add(
+        Companion(user_id='guide_1', title='向导1', price=300, location='杭州'),
+        Companion(user_id='guide_2', title='向导2', price=300, location='杭州', rating=4.5),
+        Companion(user_id='guide_3', title='向导3', price=300, location='杭州'))
+    reservation_ids = finished_reservations(add, reviewed_id, ['user_1', 'user_2'])
+    assert review(client, reservation_ids[0], 'user_1', 5)['code'] == 0
+    assert review(client, reservation_ids[1], 'user_2', 2)['code'] == 0
+    intact_reservation, = finished_reservations(add, intact_id, ['user_3'])
+    assert review(client, intact_reservation, 'user_3', 4)['code'] == 0
+
+    with app.app_context():
+        Companion.query.filter_by(id=reviewed_id).update({'rating': 1, 'rating_sum': 99, 'review_count': 1})
+        Companion.query.filter_by(id=unreviewed_id).update({'rating_sum': 8, 'review_count': 2})
+        db.session.commit()
+
+        assert reconcile_companion_ratings() == 2
+    assert rating_of(app, reviewed_id) == (Decimal('3.50'), Decimal('7.00'), 2)
+    # 没有评价的向导只清零累加值，保留原来的评分
+    assert rating_of(app, unreviewed_id) == (Decimal('4.50'), Decimal('0.00'), 0)
+    assert rating_of(app, intact_id) == (Decimal('4.00'), Decimal('4.00'), 1)
+
+    with app.app_context():
+        assert reconcile_companion_ratings() == 0
@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+from wxcloudrun.model import Companion, CompanionReservation
+
+HEADERS = {'X-WX-OPENID': 'user_1'}
+
+
+def day(offset):
+    return date.today() + timedelta(days=offset)
+
+
+def reserve(client, companion_id, start, end):
+    return client.post('/api/companion/reserve', headers=HEADERS, json={
+        'companion_id': companion_id, 'start_date': start.isoformat(), 'end_date': end.isoformat()}).get_json()
+
+
+def legacy_reservation(companion_id, start, end, status=1):
+    return CompanionReservation(companion_id=companion_id, user_id='legacy', start_date=start, end_date=end,
+                                status=status)
+
+
+def test_reserve_rejects_overlap(client, add):
+    companion_id, = add(Companion(user_id='guide_1', title='向导', price=300, location='杭州'))
+    assert reserve(client, companion_id, day(10), day(12))['code'] == 0
+    for start, end in [(day(12), day(14)), (day(8), day(10)), (day(5), day(20)), (day(11), day(11))]:
+        assert reserve(client, companion_id, start, end)['code'] == -1
+    assert reserve(client, companion_id, day(13), day(14))['code'] == 0
+    assert reserve(client, companion_id, day(8), day(9))['code'] == 0
+
+
+def test_reserve_ignores_cancelled(client, add):
+    companion_id, = add(Companion(user_id='guide_1', title='向导', price=300, location='杭州'))
+    add(legacy_reservation(companion_id, day(10), day(12), status=3))
+    assert reserve(client, companion_id, day(10), day(12))['code'] == 0
+
+
+def test_reserve_detects_overlap_with_legacy_overlapping_rows(client, add):
+    # 旧接口写入的互相重叠的预约：A包含B，新预约只与A重叠
+    companion_id, = add(Companion(user_id='guide_1', title='向导', price=300, location='杭州'))
+    add(legacy_reservation(companion_id, day(10), day(40)), legacy_reservation(companion_id, day(12), day(13)))
+    result = reserve(client, companion_id, day(20), day(22))
+    assert result['code'] == -1
+
+
+def test_availability_includes_spanning_legacy_rows(client, add):
+    companion_id, = add(Companion(user_id='guide_1', title='向导', price=300, location='杭州'))
+    first_day = date(2030, 3, 1)
+    add(legacy_reservation(companion_id, date(2030, 2, 10), date(2030, 3, 20)),
+        legacy_reservation(companion_id, date(2030, 2, 12), date(2030, 2, 13)),
+        legacy_reservation(companion_id, date(2030, 3, 25), date(2030, 4, 2)),
+        legacy_reservation(companion_id, date(2030, 3, 5), date(2030, 3, 6), status=3),
+        legacy_reservation(companion_id, date(2030, 4, 1), date(2030, 4, 3)))
+    result = client.get('/api/companion/{}/availability?month={}'.format(
+        companion_id, first_day.strftime('%Y-%m'))).get_json()
+    assert result['code'] == 0
+    assert result['data']['booked'] == [
+        {'start_date': '2030-02-10', 'end_date': '2030-03-20'},
+        {'start_date': '2030-03-25', 'end_date': '2030-04-02'},
+    ]
+
+
+def test_review_invalidates_companion_summary(app, client, add):
+    from wxcloudrun import db
+    companion_id, = add(Companion(user_id='guide_1', title='旧标题', price=300, location='杭州'))
+    reservation_id, = add(CompanionReservation(companion_id=companion_id, user_id='user_1', start_date=day(-5),
+                                               end_date=day(-3), status=2))
+
+    def order_titles():
+        result = client.get('/api/companion/orders', headers=HEADERS).get_json()
+        return [item['companion_info']['title'] for item in result['data']['list']]
+
+    assert order_titles() == ['旧标题']
+    with app.app_context():
+        Companion.query.filter_by(id=companion_id).update({'title': '新标题'})
+        db.session.commit()
+    # 摘要缓存未失效前仍是旧数据
+    assert order_titles() == ['旧标题']
+
+    result = client.post('/api/companion/review', headers=HEADERS,
+                         json={'reservation_id': reservation_id, 'rating': 5, 'content': '很好'}).get_json()
+    assert result['code'] == 0
+    assert order_titles() == ['新标题']
+
+
+
+def test_conflict_check_scans_index_from_end_date(app):
+    # 冲突检查沿索引从 end_date >= 开始日期 处扫描，不访问已经结束的历史预约
+    from sqlalchemy import event
+    from wxcloudrun import db
+    from wxcloudrun.dao import find_conflicting_reservation
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            find_conflicting_reservation(1, day(10), day(12))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        statement, parameters = executed[-1]
+        connection = db.engine.raw_connection()
+        try:
+            plan = connection.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        finally:
+            connection.close()
+    assert 'USING COVERING INDEX idx_reservation_companion_dates (companion_id=? AND end_date>?)' in plan[0][-1]
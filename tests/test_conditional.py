@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from wxcloudrun import db
+from wxcloudrun.model import AboutInfo, Attraction
+
+
+def test_attraction_edit_is_not_served_from_stale_cache(app, client, add):
+    attraction_id, = add(Attraction(name='旧名称', location='30.2,120.1'))
+    path = '/api/attraction/{}'.format(attraction_id)
+    first = client.get(path)
+    assert first.get_json()['data']['name'] == '旧名称'
+    # 再次请求命中共享缓存
+    assert client.get(path).get_json()['data']['name'] == '旧名称'
+
+    with app.app_context():
+        attraction = Attraction.query.get(attraction_id)
+        attraction.name = '新名称'
+        db.session.commit()
+
+    second = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['data']['name'] == '新名称'
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert client.get(path, headers={'If-None-Match': second.headers['ETag']}).status_code == 304
+
+
+def test_about_info_etag_matches_served_row(app, client):
+    updated_at = datetime(2030, 1, 1)
+    with app.app_context():
+        # 后插入的一条ID更大、更新时间更早
+        db.session.add(AboutInfo(id=2, title='简介', content='第一条', type='company', updated_at=updated_at))
+        db.session.add(AboutInfo(id=3, title='简介', content='第二条', type='company',
+                                 updated_at=updated_at - timedelta(days=1)))
+        db.session.commit()
+    first = client.get('/api/about/info')
+    assert first.get_json()['data']['content'] == '第一条'
+
+    with app.app_context():
+        info = AboutInfo.query.get(2)
+        info.content = '第一条（修改）'
+        db.session.commit()
+    second = client.get('/api/about/info', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.get_json()['data']['content'] == '第一条（修改）'
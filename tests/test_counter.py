@@ -0,0 +1,85 @@
+import pytest
+
+import config
+from wxcloudrun import db
+from wxcloudrun.dao import counter_dao
+from wxcloudrun.model import Counters
+
+
+def post_count(client, action):
+    result = client.post('/api/count', json={'action': action}).get_json()
+    assert result['code'] == 0
+    return result['data']
+
+
+def shard_rows(app):
+    with app.app_context():
+        return {counter.id: counter.count for counter in Counters.query.order_by(Counters.id)}
+
+
+@pytest.fixture(params=['upsert', 'update_then_insert'])
+def upsert_mode(request, monkeypatch):
+    # 不支持单条语句插入或更新的方言先UPDATE，没有更新到行时再INSERT
+    if request.param == 'update_then_insert':
+        monkeypatch.setattr(counter_dao, 'UPSERT_DIALECTS', {})
+    return request.param
+
+
+def test_increments_are_summed_over_shards(app, client, upsert_mode):
+    totals = [post_count(client, 'inc') for _ in range(40)]
+    assert totals == list(range(1, 41))
+    assert client.get('/api/count').get_json()['data'] == 40
+
+    rows = shard_rows(app)
+    assert sum(rows.values()) == 40
+    assert set(rows) <= set(range(1, config.COUNTER_SHARDS + 1))
+    # 40次随机自增落在多个分片上
+    assert len(rows) > 1
+
+
+def test_same_shard_is_updated_in_place(app, client, upsert_mode, monkeypatch):
+    monkeypatch.setattr(counter_dao.random, 'randint', lambda first, last: first)
+    for _ in range(3):
+        post_count(client, 'inc')
+    assert shard_rows(app) == {1: 3}
+
+
+def test_existing_counter_row_is_first_shard(app, client, add):
+    # 升级前ID为1的计数行
+    add(Counters(id=1, count=5))
+    assert client.get('/api/count').get_json()['data'] == 5
+    assert post_count(client, 'inc') == 6
+
+
+def test_counters_do_not_share_shards(app, add):
+    add(Counters(id=config.COUNTER_SHARDS, count=2), Counters(id=config.COUNTER_SHARDS + 1, count=7))
+    with app.app_context():
+        assert counter_dao.get_counter_sum(1) == 2
+        assert counter_dao.get_counter_sum(2) == 7
+        counter_dao.increment_counter(2)
+        assert counter_dao.get_counter_sum(1) == 2
+        assert counter_dao.get_counter_sum(2) == 8
+        assert all(config.COUNTER_SHARDS < counter.id <= 2 * config.COUNTER_SHARDS
+                   for counter in Counters.query.filter(Counters.id > config.COUNTER_SHARDS))
+
+
+def test_clear_removes_all_shards(app, client, add):
+    add(Counters(id=config.COUNTER_SHARDS + 1, count=7))
+    for _ in range(10):
+        post_count(client, 'inc')
+    post_count(client, 'clear')
+    assert client.get('/api/count').get_json()['data'] == 0
+    assert shard_rows(app) == {config.COUNTER_SHARDS + 1: 7}
+    assert post_count(client, 'inc') == 1
+
+
+def test_sum_is_cached_until_local_write(app, add):
+    add(Counters(id=1, count=1))
+    with app.app_context():
+        assert counter_dao.get_counter_sum(1) == 1
+        # 其他进程的写入在缓存过期前不可见，本进程的自增立即失效缓存
+        Counters.query.filter(Counters.id == 1).update({'count': 10})
+        db.session.commit()
+        assert counter_dao.get_counter_sum(1) == 1
+        counter_dao.increment_counter(1)
+        assert counter_dao.get_counter_sum(1) == 11
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from wxcloudrun.common.db_pool import InstrumentedQueuePool, get_pool_statuses
+from wxcloudrun.common.metrics import render_pool_metrics
+
+
+def make_engine(tmp_path, name, **kwargs):
+    return create_engine('sqlite:///{}'.format(tmp_path / '{}.db'.format(name)), poolclass=InstrumentedQueuePool,
+                         **kwargs)
+
+
+def test_each_pool_has_its_own_stats(tmp_path):
+    primary = make_engine(tmp_path, 'primary')
+    replica = make_engine(tmp_path, 'replica')
+    for _ in range(3):
+        with primary.connect():
+            pass
+    with replica.connect():
+        statuses = get_pool_statuses({'primary': primary, 'replica_0': replica})
+    assert statuses['primary']['checkouts'] == 3
+    assert statuses['primary']['checked_out'] == 0
+    assert statuses['replica_0']['checkouts'] == 1
+    assert statuses['replica_0']['checked_out'] == 1
+
+
+def test_stats_survive_pool_recreate(tmp_path):
+    engine = make_engine(tmp_path, 'primary')
+    with engine.connect():
+        pass
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert get_pool_statuses({'primary': engine})['primary']['checkouts'] == 2
+
+
+def test_timeouts_are_counted_per_pool(tmp_path):
+    primary = make_engine(tmp_path, 'primary', pool_size=1, max_overflow=0, pool_timeout=0.01)
+    replica = make_engine(tmp_path, 'replica')
+    with primary.connect():
+        with pytest.raises(exc.TimeoutError):
+            primary.connect()
+    statuses = get_pool_statuses({'primary': primary, 'replica_0': replica})
+    assert statuses['primary']['timeouts'] == 1
+    assert statuses['replica_0']['timeouts'] == 0
+
+
+def test_metrics_are_labelled_by_pool(tmp_path):
+    primary = make_engine(tmp_path, 'primary')
+    replica = make_engine(tmp_path, 'replica')
+    with primary.connect():
+        pass
+    text = render_pool_metrics(get_pool_statuses({'primary': primary, 'replica_0': replica}))
+    assert 'db_pool_checkouts_total{pool="primary"} 1' in text
+    assert 'db_pool_checkouts_total{pool="replica_0"} 0' in text
+    assert text.count('# TYPE db_pool_checkouts_total counter') == 1
+    assert 'db_pool_checkout_wait_seconds_total{pool="replica_0"}' in text
+
+
+def test_status_endpoint_reports_primary(client):
+    data = client.get('/api/status/pool').get_json()['data']
+    assert list(data) == ['primary']
+    assert data['primary']['checkouts'] >= 0
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'db_pool_checkout_wait_seconds_total{pool="primary"}' in metrics
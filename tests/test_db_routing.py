@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+from flask import Flask, request
+
+import config
+from wxcloudrun import db
+from wxcloudrun.common import db_routing
+from wxcloudrun.common.db_routing import CONSISTENCY_HEADER, init_replica_routing
+from wxcloudrun.model import User
+
+
+@pytest.fixture
+def routed_app(tmp_path, monkeypatch):
+    """
+    主库和只读实例各为一个SQLite文件的应用，两边的用户昵称不同，用于区分查询走了哪个库
+    """
+    binds = {'replica_0': 'sqlite:///' + os.path.join(str(tmp_path), 'replica.db')}
+    monkeypatch.setattr(db_routing, 'get_replica_binds', lambda: binds)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(str(tmp_path), 'primary.db')
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    init_replica_routing(app)
+
+    @app.route('/nickname', methods=['GET', 'POST'])
+    def nickname():
+        user = User.query.filter_by(openid='user_1').first()
+        if request.method == 'POST' and 'nickname' in request.get_json():
+            user.nickname = request.get_json()['nickname']
+            db.session.commit()
+        return user.nickname
+
+    # 会话按线程划分，先丢弃其他应用在本线程中创建的会话
+    db.session.remove()
+    with app.app_context():
+        for bind in (None, 'replica_0'):
+            engine = db.get_engine(app, bind=bind)
+            db.Model.metadata.create_all(engine, tables=[User.__table__])
+            engine.execute(User.__table__.insert(), openid='user_1', nickname='主库' if bind is None else '只读实例')
+    yield app
+    db.session.remove()
+
+
+def read(client, token=None):
+    headers = {CONSISTENCY_HEADER: token} if token is not None else {}
+    return client.get('/nickname', headers=headers).get_data(as_text=True)
+
+
+def test_get_reads_from_replica(routed_app):
+    client = routed_app.test_client()
+    assert routed_app.extensions['db_replicas'] == ['replica_0']
+    assert read(client) == '只读实例'
+    # 写请求中的查询走主库，只读的写请求不返回token
+    response = client.post('/nickname', json={})
+    assert response.get_data(as_text=True) == '主库'
+    assert CONSISTENCY_HEADER not in response.headers
+    # 请求之外的查询走主库
+    with routed_app.app_context():
+        assert User.query.filter_by(openid='user_1').first().nickname == '主库'
+
+
+def test_fresh_token_pins_reads_to_primary(routed_app):
+    client = routed_app.test_client()
+    response = client.post('/nickname', json={'nickname': '新昵称'})
+    assert response.get_data(as_text=True) == '新昵称'
+    token = response.headers[CONSISTENCY_HEADER]
+
+    # 带着写操作返回的token，固定期内读主库，读到自己的写入
+    assert read(client, token) == '新昵称'
+    # 不带token时仍读只读实例
+    assert read(client) == '只读实例'
+
+    # 过期、超出最大固定时长或格式错误的token无效
+    now = int(time.time() * 1000)
+    assert read(client, str(now - 1)) == '只读实例'
+    assert read(client, str(now + (config.DB_REPLICA_PIN_SECONDS + 60) * 1000)) == '只读实例'
+    assert read(client, 'abc') == '只读实例'
@@ -0,0 +1,21 @@
+from wxcloudrun.api.news import COMMENT_PAGE_SIZE_LIMIT
+from wxcloudrun.model import News, NewsComment
+
+
+def test_comment_page_size_is_capped(client, add):
+    news_id, = add(News(title='资讯', content='内容', author_id='author'))
+    comment_ids = add(*[NewsComment(news_id=news_id, user_id='user_{}'.format(i), content='评论')
+                        for i in range(COMMENT_PAGE_SIZE_LIMIT + 5)])
+    add(*[NewsComment(news_id=news_id, user_id='user_1', content='回复', parent_id=comment_id)
+          for comment_id in comment_ids])
+    result = client.get('/api/news/comments/{}?page_size=5000'.format(news_id)).get_json()
+    assert result['code'] == 0
+    assert result['data']['page_size'] == COMMENT_PAGE_SIZE_LIMIT
+    assert len(result['data']['list']) == COMMENT_PAGE_SIZE_LIMIT
+    assert result['data']['total'] == COMMENT_PAGE_SIZE_LIMIT + 5
+    assert all(len(item['replies']) == 1 for item in result['data']['list'])
+
+
+def test_comment_page_size_must_be_positive(client, add):
+    news_id, = add(News(title='资讯', content='内容', author_id='author'))
+    assert client.get('/api/news/comments/{}?page_size=0'.format(news_id)).get_json()['code'] == -1
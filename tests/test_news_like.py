@@ -0,0 +1,66 @@
+from wxcloudrun.model import News, NewsLike
+
+
+def like(client, news_id, openid, action='like'):
+    return client.post('/api/news/{}'.format(action), headers={'X-WX-OPENID': openid},
+                       json={'news_id': news_id}).get_json()
+
+
+def stored_like_count(app, news_id):
+    with app.app_context():
+        return News.query.get(news_id).like_count
+
+
+def like_rows(app, news_id):
+    with app.app_context():
+        return sorted(row.user_id for row in NewsLike.query.filter_by(news_id=news_id))
+
+
+def test_like_and_unlike(app, client, add):
+    news_id, = add(News(title='资讯', content='内容', author_id='author'))
+    assert like(client, news_id, 'user_1')['data'] == {'like_count': 1}
+    assert like(client, news_id, 'user_2')['data'] == {'like_count': 2}
+    assert like(client, news_id, 'user_1', 'unlike')['data'] == {'like_count': 1}
+    assert stored_like_count(app, news_id) == 1
+    assert like_rows(app, news_id) == ['user_2']
+    liked = client.get('/api/news/liked?ids={}'.format(news_id), headers={'X-WX-OPENID': 'user_2'}).get_json()
+    assert liked['data'] == [news_id]
+
+
+def test_double_like_keeps_count(app, client, add):
+    news_id, = add(News(title='资讯', content='内容', author_id='author'))
+    assert like(client, news_id, 'user_1')['code'] == 0
+    result = like(client, news_id, 'user_1')
+    assert result['code'] == -1
+    assert result['errorMsg'] == '已经点赞过'
+    # 重复点赞时点赞数的增加随事务回滚
+    assert stored_like_count(app, news_id) == 1
+    assert like_rows(app, news_id) == ['user_1']
+
+
+def test_double_unlike_keeps_count(app, client, add):
+    news_id, = add(News(title='资讯', content='内容', author_id='author'))
+    like(client, news_id, 'user_1')
+    like(client, news_id, 'user_2')
+    assert like(client, news_id, 'user_1', 'unlike')['code'] == 0
+    result = like(client, news_id, 'user_1', 'unlike')
+    assert result['code'] == -1
+    assert result['errorMsg'] == '尚未点赞'
+    assert stored_like_count(app, news_id) == 1
+    assert like_rows(app, news_id) == ['user_2']
+
+
+def test_unlike_never_goes_below_zero(app, client, add):
+    # 点赞数与点赞记录不一致的旧数据
+    news_id, = add(News(title='资讯', content='内容', author_id='author', like_count=0))
+    add(NewsLike(news_id=news_id, user_id='user_1'))
+    assert like(client, news_id, 'user_1', 'unlike')['data'] == {'like_count': 0}
+    assert stored_like_count(app, news_id) == 0
+
+
+def test_like_missing_news(app, client, add):
+    for action in ('like', 'unlike'):
+        result = like(client, 999, 'user_1', action)
+        assert result['code'] == -1
+        assert result['errorMsg'] == '资讯不存在'
+    assert like_rows(app, 999) == []
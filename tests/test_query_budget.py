@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+
+import pytest
+
+from wxcloudrun.common.query_budget import QueryBudgetExceeded, assert_max_queries
+from wxcloudrun.model import (Attraction, Companion, CompanionReservation, CompanionReview, CompanionTag,
+                              CompanionTagRelation, Counters, Favorite, News, NewsComment, NewsLike, TravelGuide,
+                              TravelPlan, TravelPlanItem, User, UserFollow)
+
+# 每类数据的条数，大于QUERY_REPEAT_THRESHOLD，逐条查询的接口会超出预算
+ROWS = 8
+
+
+@pytest.fixture
+def seeded(add):
+    """
+    为所有声明了SQL预算的接口准备数据，每个列表都有多条记录
+    """
+    user_ids = add(*[User(openid='user_{}'.format(i), nickname='用户{}'.format(i)) for i in range(ROWS + 1)])
+    attraction_ids = add(*[Attraction(name='景点{}'.format(i), location='杭州') for i in range(ROWS)])
+    guide_ids = add(*[TravelGuide(title='指南{}'.format(i), content='内容') for i in range(ROWS)])
+    add(*[Favorite(user_id=user_ids[0], type='attraction', item_id=item_id) for item_id in attraction_ids],
+        *[Favorite(user_id=user_ids[0], type='guide', item_id=item_id) for item_id in guide_ids])
+    plan_id, = add(TravelPlan(user_id=user_ids[0], title='行程', start_date=date(2030, 1, 1),
+                              end_date=date(2030, 1, 3)))
+    add(*[TravelPlanItem(plan_id=plan_id, day=i % 3 + 1, attraction_id=attraction_id)
+          for i, attraction_id in enumerate(attraction_ids)])
+
+    news_ids = add(*[News(title='资讯{}'.format(i), content='内容', author_id='author') for i in range(ROWS)])
+    add(*[NewsLike(news_id=news_id, user_id='user_0') for news_id in news_ids[::2]])
+    comment_ids = add(*[NewsComment(news_id=news_ids[0], user_id='user_{}'.format(i), content='评论')
+                        for i in range(ROWS)])
+    add(*[NewsComment(news_id=news_ids[0], user_id='user_{}'.format(i), content='回复', parent_id=comment_id)
+          for comment_id in comment_ids for i in range(5)])
+
+    companion_ids = add(*[Companion(user_id='guide_{}'.format(i), title='向导{}'.format(i), price=300,
+                                    location='杭州') for i in range(ROWS)])
+    tag_ids = add(*[CompanionTag(name='标签{}'.format(i)) for i in range(3)])
+    add(*[CompanionTagRelation(companion_id=companion_id, tag_id=tag_id)
+          for companion_id in companion_ids for tag_id in tag_ids[:companion_id % 3 + 1]])
+    start = date(2030, 1, 1)
+    reservation_ids = add(*[CompanionReservation(
+        companion_id=companion_id, user_id='user_0', start_date=start + timedelta(days=i * 3),
+        end_date=start + timedelta(days=i * 3 + 1), status=2) for i, companion_id in enumerate(companion_ids)])
+    add(*[CompanionReservation(companion_id=companion_ids[0], user_id='user_1', start_date=start + timedelta(days=i),
+                               end_date=start + timedelta(days=i), status=1) for i in range(30, 30 + ROWS)])
+    add(*[CompanionReview(reservation_id=reservation_id, user_id='user_0', companion_id=companion_id, rating=5)
+          for reservation_id, companion_id in zip(reservation_ids[::2], companion_ids[::2])])
+
+    add(*[UserFollow(follower_id='user_{}'.format(i), following_id='user_0') for i in range(1, ROWS + 1)])
+    add(*[UserFollow(follower_id='user_0', following_id='user_{}'.format(i)) for i in range(1, ROWS + 1, 2)])
+    add(*[Counters(id=shard, count=shard) for shard in range(1, 4)])
+    return {'plan_id': plan_id, 'news_id': news_ids[0], 'news_ids': news_ids, 'comment_id': comment_ids[0],
+            'tag_ids': tag_ids,
+            'companion_id': companion_ids[0]}
+
+
+BUDGETED_REQUESTS = [
+    ('/api/count', {}),
+    ('/api/news/list', {'X-WX-OPENID': 'user_0'}),
+    ('/api/companion/list', {}),
+    ('/api/companion/list?facets=1&tag_ids={tag_id_list}&tag_match=any', {}),
+    ('/api/companion/list?facets=1&location=杭州&min_price=100&tag_ids={tag_id_list}', {}),
+    ('/api/favorite/list', {'x-wx-openid': 'user_0'}),
+    ('/api/favorites', {'x-wx-openid': 'user_0'}),
+    ('/api/plan/{plan_id}', {'x-wx-openid': 'user_0'}),
+    ('/api/plans/{plan_id}', {'x-wx-openid': 'user_0'}),
+    ('/api/news/liked?ids={news_id_list}', {'X-WX-OPENID': 'user_0'}),
+    ('/api/news/comments/{news_id}', {}),
+    ('/api/news/comments/{comment_id}/replies', {}),
+    ('/api/companion/orders', {'X-WX-OPENID': 'user_0'}),
+    ('/api/companion/{companion_id}/availability?month=2030-01', {}),
+    ('/api/user/followers?user_id=user_0', {'X-WX-OPENID': 'user_0'}),
+    ('/api/user/followers', {'X-WX-OPENID': 'user_0'}),
+    ('/api/user/following', {'X-WX-OPENID': 'user_0'}),
+]
+
+
+def expand(path, seeded):
+    return path.format(news_id_list=','.join(map(str, seeded['news_ids'])),
+                       tag_id_list=','.join(map(str, seeded['tag_ids'])), **seeded)
+
+
+@pytest.mark.parametrize('path, headers', BUDGETED_REQUESTS)
+def test_endpoint_within_query_budget(client, seeded, path, headers):
+    # QUERY_BUDGET_MODE=raise，超出预算时请求抛出QueryBudgetExceeded
+    response = client.get(expand(path, seeded), headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['code'] == 0
+
+
+def test_budgeted_endpoints_are_covered(app):
+    paths = {rule.rule for rule in app.url_map.iter_rules()
+             if getattr(app.view_functions[rule.endpoint], 'query_budget', None) is not None}
+    covered = {path.split('?')[0] for path, _ in BUDGETED_REQUESTS}
+    covered = {path.replace('{plan_id}', '<int:plan_id>').replace('{news_id}', '<int:news_id>')
+               .replace('{comment_id}', '<int:comment_id>').replace('{companion_id}', '<int:companion_id>')
+               for path in covered}
+    assert paths <= covered
+
+
+def test_over_budget_request_raises(app, client, seeded, monkeypatch):
+    view = app.view_functions['social.get_followers']
+    monkeypatch.setattr(view, 'query_budget', 1)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/api/user/followers?user_id=user_0', headers={'X-WX-OPENID': 'user_0'})
+
+
+def test_followers_batch_load_users(client, seeded):
+    result = client.get('/api/user/followers?user_id=user_0', headers={'X-WX-OPENID': 'user_0'}).get_json()['data']
+    assert result['total'] == ROWS
+    by_user = {item['user_id']: item for item in result['list']}
+    assert set(by_user) == {'user_{}'.format(i) for i in range(1, ROWS + 1)}
+    assert by_user['user_1']['nickname'] == '用户1'
+    assert [user_id for user_id, item in sorted(by_user.items()) if item['is_following']] == \
+        sorted('user_{}'.format(i) for i in range(1, ROWS + 1, 2))
+
+    following = client.get('/api/user/following', headers={'X-WX-OPENID': 'user_0'}).get_json()['data']
+    assert sorted(item['user_id'] for item in following['list']) == \
+        sorted('user_{}'.format(i) for i in range(1, ROWS + 1, 2))
+
+
+def test_assert_max_queries(app, seeded):
+    from wxcloudrun.dao import get_counter_sum
+    with app.app_context():
+        with assert_max_queries(1):
+            assert get_counter_sum(1) == 6
+        with pytest.raises(QueryBudgetExceeded):
+            with assert_max_queries(0):
+                User.query.filter_by(openid='user_1').first()
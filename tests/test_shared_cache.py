@@ -0,0 +1,181 @@
+import io
+import socketserver
+import threading
+
+import pytest
+
+import config
+from wxcloudrun.common.shared_cache import (CacheNamespace, MemoryBackend, RedisBackend, RedisError, SharedCache,
+                                            create_backend)
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """
+    只支持缓存用到的命令的Redis服务端，请求用被测客户端的解析器读取
+    """
+
+    def handle(self):
+        parser = RedisBackend('127.0.0.1')
+        while True:
+            try:
+                command = parser._read_reply(self.rfile)
+            except ConnectionError:
+                return
+            self.server.commands.append(command)
+            name, args = command[0].upper(), command[1:]
+            data = self.server.data
+            if name in (b'AUTH', b'SELECT'):
+                reply = b'+OK\r\n'
+            elif name == b'GET':
+                reply = self.bulk(data.get(args[0]))
+            elif name == b'MGET':
+                reply = b'*%d\r\n' % len(args) + b''.join(self.bulk(data.get(key)) for key in args)
+            elif name == b'SET':
+                data[args[0]] = args[1]
+                reply = b'+OK\r\n'
+            elif name == b'DEL':
+                reply = b':%d\r\n' % sum(data.pop(key, None) is not None for key in args)
+            else:
+                reply = b"-ERR unknown command '%s'\r\n" % name
+            self.wfile.write(reply)
+
+    @staticmethod
+    def bulk(value):
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+@pytest.fixture
+def redis_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.data = {}
+    server.commands = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class BrokenBackend(object):
+    def get(self, key):
+        raise ConnectionError('refused')
+
+    get_many = set = delete = get
+
+
+def test_encode_command():
+    assert RedisBackend._encode(('SET', 'k', '详情', 'EX', 60)) == \
+        b'*5\r\n$3\r\nSET\r\n$1\r\nk\r\n$6\r\n' + '详情'.encode('utf-8') + b'\r\n$2\r\nEX\r\n$2\r\n60\r\n'
+    # 二进制值原样发送，其中的\r\n不影响长度前缀
+    assert RedisBackend._encode((b'a\r\nb',)) == b'*1\r\n$4\r\na\r\nb\r\n'
+
+
+def test_read_reply():
+    backend = RedisBackend('127.0.0.1')
+
+    def read(data):
+        return backend._read_reply(io.BytesIO(data))
+
+    assert read(b'+OK\r\n') == b'OK'
+    assert read(b':42\r\n') == 42
+    assert read(b'$4\r\na\r\nb\r\n') == b'a\r\nb'
+    assert read(b'$0\r\n\r\n') == b''
+    assert read(b'$-1\r\n') is None
+    assert read(b'*3\r\n$1\r\na\r\n$-1\r\n*1\r\n:1\r\n') == [b'a', None, [1]]
+    assert read(b'*-1\r\n') is None
+    with pytest.raises(RedisError, match='WRONGTYPE'):
+        read(b'-WRONGTYPE Operation against a key\r\n')
+    for truncated in [b'', b'+OK', b'$5\r\nab\r\n', b'?\r\n']:
+        with pytest.raises(ConnectionError):
+            read(truncated)
+
+
+def test_create_backend():
+    assert create_backend('') is None
+    assert isinstance(create_backend('memory://'), MemoryBackend)
+    backend = create_backend('redis://:p%40ss@cache.local:6380/2')
+    assert (backend.host, backend.port, backend.db, backend.password) == ('cache.local', 6380, 2, 'p@ss')
+    backend = create_backend('redis://cache.local')
+    assert (backend.port, backend.db, backend.password) == (6379, 0, None)
+    with pytest.raises(ValueError):
+        create_backend('memcached://cache.local')
+
+
+def test_redis_backend_commands(redis_server):
+    host, port = redis_server.server_address
+    backend = RedisBackend(host, port, db=3, password='secret', timeout=1)
+    backend.set('a', '{"id": 1}', 60)
+    assert backend.get('a') == b'{"id": 1}'
+    assert backend.get('missing') is None
+    assert backend.get_many(['a', 'missing']) == [b'{"id": 1}', None]
+    assert backend.get_many([]) == []
+    backend.delete('a', 'missing')
+    assert backend.get('a') is None
+
+    # 连接用完放回连接池，AUTH和SELECT只在建立连接时发送一次
+    assert redis_server.commands[:3] == [
+        [b'AUTH', b'secret'], [b'SELECT', b'3'], [b'SET', b'a', b'{"id": 1}', b'EX', b'60']]
+    assert sum(command[0] == b'AUTH' for command in redis_server.commands) == 1
+
+    # Redis返回的错误不影响连接
+    with pytest.raises(RedisError):
+        backend.execute('FLUSHALL')
+    assert backend.execute('SET', 'b', 1) == b'OK'
+    assert sum(command[0] == b'AUTH' for command in redis_server.commands) == 1
+
+
+def test_namespace_round_trip():
+    cache = SharedCache(MemoryBackend())
+    namespace = cache.namespace('test_round_trip', ttl=60)
+    assert namespace.get(1) is None
+    namespace.set(1, {'id': 1, 'title': '向导', 'tags': [{'id': 2}]})
+    namespace.set(2, {'id': 2})
+    assert namespace.get(1) == {'id': 1, 'title': '向导', 'tags': [{'id': 2}]}
+    assert cache.backend.get(config.SHARED_CACHE_PREFIX + 'test_round_trip:1') is not None
+    assert namespace.get_many([1, 2, 3]) == {1: {'id': 1, 'title': '向导', 'tags': [{'id': 2}]}, 2: {'id': 2}}
+
+    namespace.delete(1, 3)
+    assert namespace.get(1) is None
+    stats = namespace.stats()
+    assert (stats['hits'], stats['misses'], stats['errors']) == (3, 3, 0)
+
+
+def test_namespace_uses_redis_backend(redis_server):
+    host, port = redis_server.server_address
+    namespace = SharedCache(RedisBackend(host, port, timeout=1)).namespace('test_redis', ttl=30)
+    namespace.set('x', {'name': '景点'})
+    assert namespace.get('x') == {'name': '景点'}
+    assert namespace.get_many(['x', 'y']) == {'x': {'name': '景点'}}
+    key = (config.SHARED_CACHE_PREFIX + 'test_redis:x').encode()
+    assert [command[:2] + command[3:] for command in redis_server.commands if command[0] == b'SET'] == \
+        [[b'SET', key, b'EX', b'30']]
+    assert [command[1:] for command in redis_server.commands if command[0] == b'MGET'] == \
+        [[key, (config.SHARED_CACHE_PREFIX + 'test_redis:y').encode()]]
+
+
+def test_namespace_falls_back_when_backend_fails():
+    cache = SharedCache(BrokenBackend())
+    namespace = cache.namespace('test_broken', ttl=60)
+    # 缓存出错时按未命中处理，不抛出异常
+    namespace.set(1, {'id': 1})
+    assert namespace.get(1) is None
+    assert namespace.get_many([1, 2]) == {}
+    namespace.delete(1)
+    assert namespace.stats()['errors'] == 4
+
+    # 缓存关闭时不访问存储
+    cache.backend = None
+    assert namespace.get(1) is None
+    assert namespace.get_many([1]) == {}
+    namespace.set(1, {'id': 1})
+    assert namespace.stats()['errors'] == 4
+
+
+def test_redis_backend_unreachable_is_a_miss():
+    # 没有服务监听的端口，连接失败时按未命中处理
+    with socketserver.TCPServer(('127.0.0.1', 0), socketserver.BaseRequestHandler) as server:
+        host, port = server.server_address
+    namespace = CacheNamespace(SharedCache(RedisBackend(host, port, timeout=0.2)), 'test_unreachable', 60)
+    assert namespace.get(1) is None
+    assert namespace.stats()['errors'] == 1
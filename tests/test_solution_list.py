@@ -0,0 +1,50 @@
+from wxcloudrun.common.view_counter import view_counter
+from wxcloudrun.model import Solution
+
+HEADERS = {'X-WX-OPENID': 'user_1'}
+
+
+def get_list(client, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get('/api/solution/list', headers=headers)
+
+
+def view_counts(response):
+    return {item['id']: item['view_count'] for item in response.get_json()['data']['list']}
+
+
+def test_list_not_modified(client, add):
+    add(Solution(title='方案', description='描述', content='内容'))
+    response = get_list(client)
+    assert response.status_code == 200
+    assert response.headers.get('Last-Modified') is None
+    assert get_list(client, response.headers['ETag']).status_code == 304
+
+
+def test_pending_views_change_list_version(client, add):
+    solution_id, = add(Solution(title='方案', description='描述', content='内容', view_count=3))
+    first = get_list(client)
+    assert view_counts(first) == {solution_id: 3}
+
+    # 浏览次数只在内存中累计，尚未写回数据库
+    client.get('/api/solution/{}'.format(solution_id))
+    second = get_list(client, first.headers['ETag'])
+    assert second.status_code == 200
+    assert view_counts(second) == {solution_id: 4}
+
+    # 写回数据库后浏览次数不变，版本仍然变化
+    assert view_counter.flush() == 1
+    third = get_list(client, second.headers['ETag'])
+    assert third.status_code == 200
+    assert view_counts(third) == {solution_id: 4}
+    assert get_list(client, third.headers['ETag']).status_code == 304
+
+
+def test_apply_changes_list_version(client, add):
+    solution_id, = add(Solution(title='方案', description='描述', content='内容'))
+    first = get_list(client)
+    result = client.post('/api/solution/apply', headers=HEADERS, json={'solution_id': solution_id}).get_json()
+    assert result['code'] == 0
+    second = get_list(client, first.headers['ETag'])
+    assert second.status_code == 200
+    assert second.get_json()['data']['list'][0]['apply_count'] == 1
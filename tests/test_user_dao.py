@@ -0,0 +1,43 @@
+from wxcloudrun import db
+from wxcloudrun.common.query_budget import assert_max_queries
+from wxcloudrun.dao import get_user_by_openid, update_user
+from wxcloudrun.dao.user_dao import user_cache
+from wxcloudrun.model import User
+
+HEADERS = {'X-WX-OPENID': 'user_1'}
+
+
+def test_cached_user_in_fresh_session(app, add):
+    user_id, = add(User(openid='user_1', nickname='旅行者', gender=1))
+    with app.app_context():
+        assert get_user_by_openid('user_1').id == user_id
+        db.session.remove()
+
+    # 新的Session中由缓存的字段值构造实体，不查询数据库
+    with app.app_context():
+        with assert_max_queries(0):
+            user = get_user_by_openid('user_1')
+        assert user in db.session
+        assert (user.id, user.openid, user.nickname, user.gender) == (user_id, 'user_1', '旅行者', 1)
+
+        # 构造的实体可以直接修改保存，保存后缓存失效
+        user.nickname = '新昵称'
+        update_user(user)
+        assert user_cache.get('user_1') is None
+        db.session.remove()
+
+    with app.app_context():
+        assert User.query.get(user_id).nickname == '新昵称'
+        assert get_user_by_openid('user_1').nickname == '新昵称'
+
+
+def test_update_invalidates_cached_user(client, add):
+    add(User(openid='user_1', nickname='旅行者'))
+    assert client.get('/api/user/info', headers=HEADERS).get_json()['data']['userInfo']['nickname'] == '旅行者'
+    assert user_cache.get('user_1') is not None
+
+    result = client.post('/api/user/update', headers=HEADERS, json={'nickname': '新昵称', 'phone': '13800000000'})
+    assert result.get_json()['code'] == 0
+    assert user_cache.get('user_1') is None
+    user_info = client.get('/api/user/info', headers=HEADERS).get_json()['data']['userInfo']
+    assert (user_info['nickname'], user_info['phone']) == ('新昵称', '13800000000')
@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import event
+
+import config
+from wxcloudrun import db
+from wxcloudrun.common import view_counter as view_counter_module
+from wxcloudrun.common.view_counter import ViewCounter
+from wxcloudrun.model import News
+
+
+@pytest.fixture
+def counter(app, monkeypatch):
+    """
+    独立的计数器，后台线程的写回间隔很长，测试中只由flush写回
+    """
+    monkeypatch.setattr(config, 'VIEW_COUNTER_FLUSH_INTERVAL', 3600)
+    counter = ViewCounter()
+    counter.init_app(app)
+    return counter
+
+
+def new_news(add, count, view_count=0):
+    return add(*[News(title='资讯{}'.format(i), content='内容', author_id='author', view_count=view_count)
+                 for i in range(count)])
+
+
+def view_counts(app):
+    with app.app_context():
+        return dict(db.session.query(News.id, News.view_count).order_by(News.id))
+
+
+def test_flush_writes_pending_views(app, add, counter):
+    first, second = new_news(add, 2, view_count=10)
+    flushed = []
+    counter.on_flush(News, flushed.append)
+
+    counter.incr(News, first)
+    counter.incr(News, first)
+    counter.incr(News, second, 3)
+    assert counter.pending(News, first) == 2
+    assert counter.pending(News, second) == 3
+    # 写回前数据库中的值不变
+    assert view_counts(app) == {first: 10, second: 10}
+
+    token, generation = counter.generation(News)
+    assert counter.flush() == 5
+    assert counter.pending(News, first) == 0
+    assert view_counts(app) == {first: 12, second: 13}
+    assert flushed == [[first, second]]
+    assert counter.generation(News) == (token, generation + 1)
+    assert counter.stats() == {'pending_items': 0, 'pending_views': 0, 'flushed_views': 5, 'flush_errors': 0}
+
+    # 没有增量时不执行UPDATE，也不调用回调
+    assert counter.flush() == 0
+    assert flushed == [[first, second]]
+
+
+def test_flush_updates_in_chunks(app, add, counter, monkeypatch):
+    monkeypatch.setattr(view_counter_module, 'FLUSH_CHUNK_SIZE', 2)
+    news_ids = new_news(add, 5)
+    flushed = []
+    counter.on_flush(News, flushed.append)
+    for count, news_id in enumerate(news_ids, 1):
+        counter.incr(News, news_id, count)
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        assert counter.flush() == 15
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+    assert len([statement for statement in statements if statement.startswith('UPDATE')]) == 3
+    assert flushed == [news_ids[0:2], news_ids[2:4], news_ids[4:]]
+    assert view_counts(app) == {news_id: count for count, news_id in enumerate(news_ids, 1)}
+
+
+def test_failed_flush_keeps_views(app, add, counter):
+    news_id, = new_news(add, 1)
+    flushed = []
+    counter.on_flush(News, flushed.append)
+    counter.incr(News, news_id, 2)
+
+    # 表不存在时UPDATE失败，增量放回缓冲区，不调用回调
+    with app.app_context():
+        News.__table__.drop(db.engine)
+    assert counter.flush() == 0
+    assert counter.pending(News, news_id) == 2
+    assert counter.stats()['flush_errors'] == 1
+    assert flushed == []
+
+    with app.app_context():
+        News.__table__.create(db.engine)
+    news_id, = new_news(add, 1, view_count=1)
+    counter.incr(News, news_id)
+    assert counter.flush() == 3
+    assert view_counts(app) == {news_id: 4}
+    assert flushed == [[news_id]]
@@ -156,6 +156,7 @@ CREATE TABLE IF NOT EXISTS `Companions` (
     experience_years INT DEFAULT 0,
     languages VARCHAR(255),
     rating DECIMAL(3, 2) DEFAULT 5.00,
+    rating_sum DECIMAL(12, 2) NOT NULL DEFAULT 0.00,
     review_count INT DEFAULT 0,
     status TINYINT DEFAULT 1 COMMENT '1: 活跃, 0: 非活跃',
     createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -181,6 +182,7 @@ CREATE TABLE IF NOT EXISTS `CompanionReservations` (
     status TINYINT DEFAULT 0 COMMENT '0: 待确认, 1: 已确认, 2: 已完成, 3: 已取消',
     createdAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_reservation_companion_dates (companion_id, start_date, end_date),
     FOREIGN KEY (companion_id) REFERENCES Companions(id) ON DELETE CASCADE
 );
 
@@ -288,10 +290,10 @@ INSERT INTO CompanionTags (name) VALUES
 ('摄影'), ('徒步'), ('美食'), ('历史'), ('自驾'), ('购物'), ('潜水'), ('登山');
 
 -- 向导测试数据
-INSERT INTO Companions (user_id, title, description, avatar, cover_image, price, location, experience_years, languages, rating, review_count) VALUES
-('guide001', '巴厘岛专业向导', '5年巴厘岛带团经验，精通各种小众景点和体验', 'https://example.com/avatars/guide1.jpg', 'https://example.com/covers/bali.jpg', 800.00, '巴厘岛', 5, '中文,英文,印尼语', 4.92, 68),
-('guide002', '京都深度游向导', '京都本地人，带您体验最地道的京都文化', 'https://example.com/avatars/guide2.jpg', 'https://example.com/covers/kyoto.jpg', 1200.00, '京都', 8, '中文,日语,英文', 4.88, 126),
-('guide003', '巴黎艺术之旅', '艺术专业毕业，对巴黎各大博物馆了如指掌', 'https://example.com/avatars/guide3.jpg', 'https://example.com/covers/paris.jpg', 1500.00, '巴黎', 6, '中文,法语,英文', 4.95, 87);
+INSERT INTO Companions (user_id, title, description, avatar, cover_image, price, location, experience_years, languages, rating, rating_sum, review_count) VALUES
+('guide001', '巴厘岛专业向导', '5年巴厘岛带团经验，精通各种小众景点和体验', 'https://example.com/avatars/guide1.jpg', 'https://example.com/covers/bali.jpg', 800.00, '巴厘岛', 5, '中文,英文,印尼语', 4.92, 334.56, 68),
+('guide002', '京都深度游向导', '京都本地人，带您体验最地道的京都文化', 'https://example.com/avatars/guide2.jpg', 'https://example.com/covers/kyoto.jpg', 1200.00, '京都', 8, '中文,日语,英文', 4.88, 614.88, 126),
+('guide003', '巴黎艺术之旅', '艺术专业毕业，对巴黎各大博物馆了如指掌', 'https://example.com/avatars/guide3.jpg', 'https://example.com/covers/paris.jpg', 1500.00, '巴黎', 6, '中文,法语,英文', 4.95, 430.65, 87);
 
 -- 向导标签关系测试数据
 INSERT INTO CompanionTagRelations (companion_id, tag_id) VALUES
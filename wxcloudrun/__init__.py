@@ -1,9 +1,18 @@
+import time
+
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 import pymysql
 import config
 import logging
 
+from wxcloudrun.common.compression import init_compression
+from wxcloudrun.common.conditional import init_conditional_get
+from wxcloudrun.common.db_pool import get_engine_options
+from wxcloudrun.common.db_routing import RoutingSQLAlchemy, get_replica_binds, init_replica_routing
+from wxcloudrun.common.metrics import init_metrics
+from wxcloudrun.common.query_budget import init_query_budget
+from wxcloudrun.common.view_counter import view_counter
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('travel-cloud')
@@ -11,29 +20,105 @@ logger = logging.getLogger('travel-cloud')
 # 因MySQLDB不支持Python3，使用pymysql扩展库代替MySQLDB库
 pymysql.install_as_MySQLdb()
 
-# 初始化web应用
-app = Flask(__name__, instance_relative_config=True)
-app.config['DEBUG'] = config.DEBUG
+# 初始化DB操作对象，在create_app中绑定到应用，配置了只读实例时只读请求的查询走只读实例
+db = RoutingSQLAlchemy()
+
+
+def create_app():
+    """
+    创建并初始化Flask应用
+    启动时不执行建表等DDL操作，建表请使用 init-db 命令
+    :return: Flask应用实例
+    """
+    boot_timings = {}
+    start = time.perf_counter()
+
+    # 初始化web应用并加载配置
+    app = Flask(__name__, instance_relative_config=True)
+    app.config.from_object('config')
+
+    # 设定数据库链接和连接池
+    app.config['SQLALCHEMY_DATABASE_URI'] = config.DATABASE_URI or 'mysql://{}:{}@{}/flask_demo'.format(
+        config.username, config.password, config.db_address)
+    app.config['SQLALCHEMY_BINDS'] = get_replica_binds()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = get_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    boot_timings['config'] = time.perf_counter() - start
+
+    # 绑定DB操作对象，此时不会建立数据库连接
+    phase_start = time.perf_counter()
+    db.init_app(app)
+    init_replica_routing(app)
+    # 浏览次数定时批量写回数据库，进程退出时写回剩余的增量
+    view_counter.init_app(app)
+    boot_timings['db'] = time.perf_counter() - phase_start
+
+    # 注册API路由
+    phase_start = time.perf_counter()
+    from wxcloudrun.api import init_app
+    init_app(app)
+    boot_timings['routes'] = time.perf_counter() - phase_start
+
+    # 注册响应压缩，after_request按注册的逆序执行，压缩需要最先注册以便最后执行
+    if config.COMPRESSION_ENABLED:
+        init_compression(app)
+
+    # 注册协商缓存，需要在压缩之后注册，按压缩前的内容计算ETag
+    if config.CONDITIONAL_GET_ENABLED:
+        init_conditional_get(app)
+
+    # 注册请求统计
+    if config.METRICS_ENABLED:
+        init_metrics(app)
+
+    # 注册SQL条数预算检查，用于开发、测试和预发环境发现N+1查询
+    if config.QUERY_BUDGET_MODE != 'off':
+        init_query_budget(app)
+
+    # 注册命令行工具
+    register_commands(app)
+
+    boot_timings['total'] = time.perf_counter() - start
+    app.config['BOOT_TIMINGS'] = boot_timings
+    logger.info("应用启动耗时: {}".format(
+        ', '.join('{}={:.1f}ms'.format(phase, cost * 1000) for phase, cost in boot_timings.items())))
+    return app
+
+
+def register_commands(app):
+    """
+    注册flask命令行工具
+    :param app: Flask应用实例
+    """
+
+    @app.cli.command('init-db')
+    def init_db():
+        """创建数据库表"""
+        init_database(app)
 
-# 设定数据库链接
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://{}:{}@{}/flask_demo'.format(config.username, config.password,
-                                                                             config.db_address)
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    @app.cli.command('reconcile-ratings')
+    def reconcile_ratings_command():
+        """按评价表校正向导的评分"""
+        reconcile_ratings(app)
 
-# 初始化DB操作对象
-db = SQLAlchemy(app)
 
-# 创建数据库表
-with app.app_context():
-    try:
+def init_database(app):
+    """
+    创建所有数据库表，只在部署或初始化时显式调用
+    :param app: Flask应用实例
+    """
+    from wxcloudrun import model  # noqa: F401
+    with app.app_context():
         db.create_all()
-        logger.info("数据库表创建成功")
-    except Exception as e:
-        logger.error(f"数据库表创建失败: {str(e)}")
+    logger.info("数据库表创建成功")
 
-# 注册API路由
-from wxcloudrun.api import init_app
-init_app(app)
 
-# 加载配置
-app.config.from_object('config')
+def reconcile_ratings(app):
+    """
+    按评价表重新计算向导的评分之和、评价数和平均评分，由定时任务周期执行，修正累加值的偏差
+    :param app: Flask应用实例
+    """
+    from wxcloudrun.dao import reconcile_companion_ratings
+    with app.app_context():
+        fixed = reconcile_companion_ratings()
+    logger.info("向导评分校正完成，修正 {} 个向导".format(fixed))
@@ -1,23 +1,28 @@
-# 这个文件会由主应用导入，从而注册所有的API路由
+# 这个文件会由create_app调用，从而注册所有的API路由
 
 def init_app(app):
     """
     初始化并注册所有API路由到Flask应用
     :param app: Flask应用实例
     """
-    # 导入所有API模块，会自动向app注册路由
+    # 在创建应用时才导入API模块，导入wxcloudrun包本身不会加载路由和模型
     from wxcloudrun.api import counter
     from wxcloudrun.api import user
     from wxcloudrun.api import guide
     from wxcloudrun.api import attraction
     from wxcloudrun.api import favorite
     from wxcloudrun.api import plan
-    from wxcloudrun.api import initialize 
-    
+    from wxcloudrun.api import initialize
+
     # 新增API模块
     from wxcloudrun.api import news
     from wxcloudrun.api import companion
     from wxcloudrun.api import social
     from wxcloudrun.api import solution
     from wxcloudrun.api import feedback
-    from wxcloudrun.api import search 
\ No newline at end of file
+    from wxcloudrun.api import search
+    from wxcloudrun.api import status
+
+    for module in (counter, user, guide, attraction, favorite, plan, initialize,
+                   news, companion, social, solution, feedback, search, status):
+        app.register_blueprint(module.bp)
@@ -1,8 +1,16 @@
-from flask import request, jsonify
-from wxcloudrun import app, db
+from flask import Blueprint, g, request
+from wxcloudrun.common.conditional import cache_validator, version_etag
+from wxcloudrun.common.response import make_json_response
+from wxcloudrun.common.shared_cache import shared_cache
+from wxcloudrun import db
 from wxcloudrun.model import Attraction
 
-@app.route('/api/attraction/list', methods=['GET'])
+bp = Blueprint('attraction', __name__)
+
+# 景点详情的共享缓存，key中带有景点的版本，景点更新后旧的缓存不再命中
+attraction_cache = shared_cache.namespace('attraction')
+
+@bp.route('/api/attraction/list', methods=['GET'])
 def get_attractions():
     """获取景点列表"""
     try:
@@ -38,18 +46,33 @@ def get_attractions():
             'per_page': per_page
         }
         
-        return jsonify(result)
+        return make_json_response(result)
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
+
+def attraction_version(attraction_id):
+    """景点详情的版本，只查询更新时间"""
+    updated_at = db.session.query(Attraction.updated_at).filter(Attraction.id == attraction_id).scalar()
+    if updated_at is None:
+        return None
+    return version_etag('attraction', attraction_id, updated_at), updated_at
 
-@app.route('/api/attraction/<int:attraction_id>', methods=['GET'])
+@bp.route('/api/attraction/<int:attraction_id>', methods=['GET'])
+@cache_validator(attraction_version)
 def get_attraction(attraction_id):
     """获取景点详情"""
     try:
+        # 协商缓存已经查询过版本时直接使用，保证响应体与ETag对应同一版本
+        version = g.cache_version if 'cache_version' in g else attraction_version(attraction_id)
+        cache_key = '{}:{}'.format(attraction_id, version[0]) if version is not None else None
+        cached = attraction_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return make_json_response(cached)
+
         attraction = Attraction.query.get(attraction_id)
         if not attraction:
-            return jsonify({'code': -1, 'msg': '景点不存在'})
+            return make_json_response({'code': -1, 'msg': '景点不存在'})
         
         # 格式化景点数据
         result = {
@@ -66,11 +89,14 @@ def get_attraction(attraction_id):
                 'opening_hours': attraction.opening_hours,
                 'tips': attraction.tips,
                 'category': attraction.category,
-                'created_at': attraction.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'created_at': attraction.created_at
             }
         }
         
-        return jsonify(result)
+        if cache_key is not None:
+            attraction_cache.set(cache_key, result)
+        
+        return make_json_response(result)
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)}) 
\ No newline at end of file
+        return make_json_response({'code': -1, 'msg': str(e)}) 
\ No newline at end of file
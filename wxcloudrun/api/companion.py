@@ -1,11 +1,30 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
+import calendar
 import logging
+import config
 from wxcloudrun.model import Companion, CompanionTag, CompanionTagRelation, CompanionReservation, CompanionReview
 from wxcloudrun import db
-from wxcloudrun.response import make_succ_response, make_err_response
-from datetime import datetime
-from sqlalchemy import func
+from wxcloudrun.common.response import make_succ_response, make_err_response
+from wxcloudrun.common.query_budget import query_budget
+from wxcloudrun.common.shared_cache import shared_cache
+from wxcloudrun.common.tag_index import bit_positions, companion_tag_index
+from wxcloudrun.dao import add_companion_rating, lock_companion, find_conflicting_reservation, get_booked_intervals
+from datetime import date, datetime
+from sqlalchemy import case, func
+from sqlalchemy.orm import load_only
+
+bp = Blueprint('companion', __name__)
+
+# 向导详情（含最近评价）的共享缓存，评价后失效；标签不放入缓存，返回时从标签索引读取，标签索引重建后详情随之更新
+companion_cache = shared_cache.namespace('companion')
+
+# 预约列表中展示的向导摘要的共享缓存，同一用户的预约记录中向导多有重复
+companion_summary_cache = shared_cache.namespace('companion_summary')
+
+# 向导数据变更后同时删除其详情和摘要的缓存
+def invalidate_companion_cache(companion_id):
+    companion_cache.delete(companion_id)
+    companion_summary_cache.delete(companion_id)
 
 # 配置日志
 logger = logging.getLogger('travel-cloud')
@@ -18,17 +37,60 @@ def get_openid():
         return None
     return openid
 
-# 获取结伴旅行向导列表
-@app.route('/api/companion/list', methods=['GET'])
+# 统计筛选结果中各标签、价格区间和地点的向导数：价格区间和地点各一条GROUP BY查询，不把筛选结果取到Python中
+# tag_bits为筛选结果的向导位图，只按标签筛选时可以由标签索引算出，标签计数直接用位运算完成；为None时标签计数也用GROUP BY查询
+def build_companion_facets(query, tag_bits=None):
+    # 价格区间为左闭右开，第一个区间没有下限，最后一个区间没有上限
+    bounds = config.COMPANION_PRICE_BANDS
+    band = case(*[(Companion.price < bound, i) for i, bound in enumerate(bounds)], else_=len(bounds)).label('band')
+    price_counts = dict(query.with_entities(band, func.count(Companion.id)).group_by(band).all())
+    edges = [None] + list(bounds) + [None]
+    price_bands = [{'min': edges[i], 'max': edges[i + 1], 'count': price_counts[i]}
+                   for i in range(len(bounds) + 1) if price_counts.get(i)]
+    
+    location_counts = query.with_entities(Companion.location, func.count(Companion.id)) \
+        .group_by(Companion.location).all()
+    locations = [{'location': location, 'count': count}
+                 for location, count in sorted(location_counts, key=lambda item: (-item[1], item[0]))]
+    
+    if tag_bits is not None:
+        tags = companion_tag_index.count_tags(tag_bits)
+    else:
+        tag_counts = db.session.query(
+            CompanionTag.id, CompanionTag.name, func.count(CompanionTagRelation.companion_id)
+        ).join(CompanionTagRelation, CompanionTagRelation.tag_id == CompanionTag.id) \
+            .filter(CompanionTagRelation.companion_id.in_(query.with_entities(Companion.id))) \
+            .group_by(CompanionTag.id, CompanionTag.name).all()
+        tags = [{'id': tag_id, 'name': name, 'count': count}
+                for tag_id, name, count in sorted(tag_counts, key=lambda item: (-item[2], item[0]))]
+    return {
+        'tags': tags,
+        'price_bands': price_bands,
+        'locations': locations
+    }
+
+# 获取结伴旅行向导列表，facets=1时同时返回当前筛选条件下各标签、价格区间和地点的向导数
+# SQL预算：总数和本页各1条，筛选项最多3条，标签索引过期重建时3条
+@bp.route('/api/companion/list', methods=['GET'])
+@query_budget(8)
 def get_companion_list():
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 10))
         location = request.args.get('location')
-        tag_id = request.args.get('tag_id')
         min_price = request.args.get('min_price')
         max_price = request.args.get('max_price')
         
+        # 标签筛选：tag_ids为逗号分隔的标签ID，tag_match为all时需同时有所有标签，any时有任一标签即可；兼容单个tag_id
+        try:
+            tag_ids = [int(tag_id) for value in request.args.getlist('tag_ids') + request.args.getlist('tag_id')
+                       for tag_id in value.split(',') if tag_id.strip()]
+        except ValueError:
+            return make_err_response('tag_ids参数错误')
+        tag_match = request.args.get('tag_match', 'all')
+        if tag_match not in ('all', 'any'):
+            return make_err_response('tag_match参数错误')
+        
         # 构建查询
         query = Companion.query.filter(Companion.status == 1)  # 只查询活跃的向导
         
@@ -36,14 +98,21 @@ def get_companion_list():
         if location:
             query = query.filter(Companion.location.like(f'%{location}%'))
         
-        # 按标签筛选
-        if tag_id:
-            query = query.join(
-                CompanionTagRelation, 
-                CompanionTagRelation.companion_id == Companion.id
-            ).filter(
-                CompanionTagRelation.tag_id == tag_id
-            )
+        # 按标签筛选，先用标签索引的位图算出候选向导，再与地点、价格等条件一起按主键查询
+        candidate_bits = None
+        if tag_ids:
+            candidate_bits = companion_tag_index.tag_bits(tag_ids, tag_match == 'all')
+            candidate_ids = bit_positions(candidate_bits)
+            if len(candidate_ids) <= config.COMPANION_TAG_FILTER_MAX_IDS:
+                query = query.filter(Companion.id.in_(candidate_ids))
+            else:
+                # 候选向导过多时IN列表过长，改用子查询在数据库中筛选
+                tagged = db.session.query(CompanionTagRelation.companion_id).filter(
+                    CompanionTagRelation.tag_id.in_(set(tag_ids))
+                ).group_by(CompanionTagRelation.companion_id)
+                if tag_match == 'all':
+                    tagged = tagged.having(func.count(CompanionTagRelation.tag_id) == len(set(tag_ids)))
+                query = query.filter(Companion.id.in_(tagged))
         
         # 按价格范围筛选
         if min_price:
@@ -51,6 +120,16 @@ def get_companion_list():
         if max_price:
             query = query.filter(Companion.price <= float(max_price))
         
+        # 没有地点和价格条件时，筛选结果即活跃向导与标签候选向导的交集，标签计数不需要查询数据库
+        facets = None
+        if request.args.get('facets') in ('1', 'true'):
+            facet_bits = None
+            if not (location or min_price or max_price):
+                facet_bits = companion_tag_index.active_bits()
+                if candidate_bits is not None:
+                    facet_bits &= candidate_bits
+            facets = build_companion_facets(query, facet_bits)
+        
         # 按评分降序排序
         companions = query.order_by(Companion.rating.desc()).paginate(
             page=page, per_page=page_size
@@ -65,53 +144,41 @@ def get_companion_list():
         }
         
         for companion in companions.items:
-            # 获取向导标签
-            tags = db.session.query(CompanionTag).join(
-                CompanionTagRelation,
-                CompanionTagRelation.tag_id == CompanionTag.id
-            ).filter(
-                CompanionTagRelation.companion_id == companion.id
-            ).all()
-            
-            # 格式化标签
-            formatted_tags = [{'id': tag.id, 'name': tag.name} for tag in tags]
-            
-            # 添加到结果列表
+            # 添加到结果列表，标签从进程内索引获取
             result['list'].append({
                 'id': companion.id,
                 'user_id': companion.user_id,
                 'title': companion.title,
                 'avatar': companion.avatar,
                 'cover_image': companion.cover_image,
-                'price': float(companion.price),
+                'price': companion.price,
                 'location': companion.location,
                 'languages': companion.languages,
-                'rating': float(companion.rating),
+                'rating': companion.rating,
                 'review_count': companion.review_count,
-                'tags': formatted_tags
+                'tags': companion_tag_index.tags_of(companion.id)
             })
         
+        if facets is not None:
+            result['facets'] = facets
+        
         return make_succ_response(result)
     except Exception as e:
         logger.error(f"获取向导列表失败: {e}")
         return make_err_response(f"获取向导列表失败: {str(e)}")
 
 # 获取向导详情
-@app.route('/api/companion/<int:companion_id>', methods=['GET'])
+@bp.route('/api/companion/<int:companion_id>', methods=['GET'])
 def get_companion_detail(companion_id):
     try:
+        cached = companion_cache.get(companion_id)
+        if cached is not None:
+            return make_succ_response(dict(cached, tags=companion_tag_index.tags_of(companion_id)))
+
         companion = Companion.query.get(companion_id)
         if not companion:
             return make_err_response('向导不存在')
         
-        # 获取向导标签
-        tags = db.session.query(CompanionTag).join(
-            CompanionTagRelation,
-            CompanionTagRelation.tag_id == CompanionTag.id
-        ).filter(
-            CompanionTagRelation.companion_id == companion_id
-        ).all()
-        
         # 获取向导评价
         reviews = CompanionReview.query.filter_by(
             companion_id=companion_id
@@ -119,18 +186,17 @@ def get_companion_detail(companion_id):
             CompanionReview.created_at.desc()
         ).limit(5).all()
         
-        # 格式化标签和评价
-        formatted_tags = [{'id': tag.id, 'name': tag.name} for tag in tags]
+        # 格式化评价
         formatted_reviews = []
         
         for review in reviews:
             formatted_reviews.append({
                 'id': review.id,
                 'user_id': review.user_id,
-                'rating': float(review.rating),
+                'rating': review.rating,
                 'content': review.content,
                 'images': review.images.split(',') if review.images else [],
-                'created_at': review.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'created_at': review.created_at
             })
         
         # 构建返回数据
@@ -141,25 +207,25 @@ def get_companion_detail(companion_id):
             'description': companion.description,
             'avatar': companion.avatar,
             'cover_image': companion.cover_image,
-            'price': float(companion.price),
+            'price': companion.price,
             'location': companion.location,
             'experience_years': companion.experience_years,
             'languages': companion.languages,
-            'rating': float(companion.rating),
+            'rating': companion.rating,
             'review_count': companion.review_count,
             'status': companion.status,
-            'created_at': companion.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'tags': formatted_tags,
+            'created_at': companion.created_at,
             'reviews': formatted_reviews
         }
+        companion_cache.set(companion_id, result)
         
-        return make_succ_response(result)
+        return make_succ_response(dict(result, tags=companion_tag_index.tags_of(companion_id)))
     except Exception as e:
         logger.error(f"获取向导详情失败: {e}")
         return make_err_response(f"获取向导详情失败: {str(e)}")
 
 # 获取向导标签列表
-@app.route('/api/companion/tags', methods=['GET'])
+@bp.route('/api/companion/tags', methods=['GET'])
 def get_companion_tags():
     try:
         tags = CompanionTag.query.all()
@@ -178,7 +244,7 @@ def get_companion_tags():
         return make_err_response(f"获取向导标签失败: {str(e)}")
 
 # 预约向导服务
-@app.route('/api/companion/reserve', methods=['POST'])
+@bp.route('/api/companion/reserve', methods=['POST'])
 def reserve_companion():
     try:
         # 获取请求体参数
@@ -197,11 +263,6 @@ def reserve_companion():
         if not openid:
             return make_err_response('未登录或登录已过期')
         
-        # 检查向导是否存在
-        companion = Companion.query.get(companion_id)
-        if not companion:
-            return make_err_response('向导不存在')
-        
         # 检查日期是否有效
         if start_date > end_date:
             return make_err_response('结束日期不能早于开始日期')
@@ -209,6 +270,18 @@ def reserve_companion():
         if start_date < datetime.now().date():
             return make_err_response('开始日期不能早于当前日期')
         
+        # 检查向导是否存在，并锁定向导行直到提交，同一向导的并发预约在此排队
+        companion = lock_companion(companion_id)
+        if not companion:
+            db.session.rollback()
+            return make_err_response('向导不存在')
+        
+        # 检查档期是否与已有预约冲突
+        conflict = find_conflicting_reservation(companion_id, start_date, end_date)
+        if conflict is not None:
+            db.session.rollback()
+            return make_err_response('该时间段向导已被预约：{} 至 {}'.format(conflict.start_date, conflict.end_date))
+        
         # 创建预约
         reservation = CompanionReservation(
             companion_id=companion_id,
@@ -227,12 +300,12 @@ def reserve_companion():
         result = {
             'id': reservation.id,
             'companion_id': reservation.companion_id,
-            'start_date': reservation.start_date.strftime('%Y-%m-%d'),
-            'end_date': reservation.end_date.strftime('%Y-%m-%d'),
+            'start_date': reservation.start_date,
+            'end_date': reservation.end_date,
             'traveler_count': reservation.traveler_count,
             'special_needs': reservation.special_needs,
             'status': reservation.status,
-            'created_at': reservation.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': reservation.created_at
         }
         
         return make_succ_response(result)
@@ -241,8 +314,59 @@ def reserve_companion():
         logger.error(f"预约向导失败: {e}")
         return make_err_response(f"预约向导失败: {str(e)}")
 
+# 批量获取向导摘要，先从共享缓存批量读取，未命中的向导用一条IN查询补齐并写入缓存
+def get_companion_summaries(companion_ids):
+    companion_ids = list(dict.fromkeys(companion_ids))
+    summaries = {int(key): value for key, value in companion_summary_cache.get_many(companion_ids).items()}
+    missing = [companion_id for companion_id in companion_ids if companion_id not in summaries]
+    if missing:
+        companions = Companion.query.options(
+            load_only(Companion.id, Companion.title, Companion.avatar, Companion.price, Companion.location)
+        ).filter(Companion.id.in_(missing)).all()
+        for companion in companions:
+            summary = {
+                'id': companion.id,
+                'title': companion.title,
+                'avatar': companion.avatar,
+                'price': companion.price,
+                'location': companion.location
+            }
+            summaries[companion.id] = summary
+            companion_summary_cache.set(companion.id, summary)
+    return summaries
+
+# 获取向导某月的档期，返回与该月重叠的已预约日期区间（不含已取消的预约）
+@bp.route('/api/companion/<int:companion_id>/availability', methods=['GET'])
+@query_budget(3)
+def get_companion_availability(companion_id):
+    try:
+        month = request.args.get('month') or datetime.now().strftime('%Y-%m')
+        try:
+            first_day = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            return make_err_response('month参数错误，格式为YYYY-MM')
+        last_day = date(first_day.year, first_day.month, calendar.monthrange(first_day.year, first_day.month)[1])
+        
+        if db.session.query(Companion.id).filter(Companion.id == companion_id).first() is None:
+            return make_err_response('向导不存在')
+        
+        booked = [{
+            'start_date': interval.start_date,
+            'end_date': interval.end_date
+        } for interval in get_booked_intervals(companion_id, first_day, last_day)]
+        
+        return make_succ_response({
+            'companion_id': companion_id,
+            'month': first_day.strftime('%Y-%m'),
+            'booked': booked
+        })
+    except Exception as e:
+        logger.error(f"获取向导档期失败: {e}")
+        return make_err_response(f"获取向导档期失败: {str(e)}")
+
 # 获取用户预约记录
-@app.route('/api/companion/orders', methods=['GET'])
+@bp.route('/api/companion/orders', methods=['GET'])
+@query_budget(4)
 def get_user_reservations():
     try:
         page = int(request.args.get('page', 1))
@@ -276,42 +400,28 @@ def get_user_reservations():
             'list': []
         }
         
+        # 本页预约的向导信息和评价状态各一次批量获取
+        companions = get_companion_summaries([reservation.companion_id for reservation in reservations.items])
+        reviewed_ids = set()
+        if reservations.items:
+            reviewed_ids = {row.reservation_id for row in db.session.query(CompanionReview.reservation_id).filter(
+                CompanionReview.reservation_id.in_([reservation.id for reservation in reservations.items]),
+                CompanionReview.user_id == openid
+            )}
+        
         for reservation in reservations.items:
-            # 获取向导信息
-            companion = Companion.query.get(reservation.companion_id)
-            companion_info = None
-            
-            if companion:
-                companion_info = {
-                    'id': companion.id,
-                    'title': companion.title,
-                    'avatar': companion.avatar,
-                    'price': float(companion.price),
-                    'location': companion.location
-                }
-            
-            # 检查用户是否已评价
-            has_reviewed = False
-            review = CompanionReview.query.filter_by(
-                reservation_id=reservation.id,
-                user_id=openid
-            ).first()
-            
-            if review:
-                has_reviewed = True
-            
             # 添加到结果列表
             result['list'].append({
                 'id': reservation.id,
                 'companion_id': reservation.companion_id,
-                'companion_info': companion_info,
-                'start_date': reservation.start_date.strftime('%Y-%m-%d'),
-                'end_date': reservation.end_date.strftime('%Y-%m-%d'),
+                'companion_info': companions.get(reservation.companion_id),
+                'start_date': reservation.start_date,
+                'end_date': reservation.end_date,
                 'traveler_count': reservation.traveler_count,
                 'special_needs': reservation.special_needs,
                 'status': reservation.status,
-                'has_reviewed': has_reviewed,
-                'created_at': reservation.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'has_reviewed': reservation.id in reviewed_ids,
+                'created_at': reservation.created_at
             })
         
         return make_succ_response(result)
@@ -320,7 +430,7 @@ def get_user_reservations():
         return make_err_response(f"获取预约记录失败: {str(e)}")
 
 # 发表评价
-@app.route('/api/companion/review', methods=['POST'])
+@bp.route('/api/companion/review', methods=['POST'])
 def review_companion():
     try:
         # 获取请求体参数
@@ -367,6 +477,10 @@ def review_companion():
         # 处理图片
         images_str = ','.join(images) if images else None
         
+        # 累加向导的评分之和与评价数，不读取该向导已有的评价
+        rating = round(rating, 2)
+        add_companion_rating(reservation.companion_id, rating)
+        
         # 创建评价
         review = CompanionReview(
             reservation_id=reservation_id,
@@ -378,29 +492,18 @@ def review_companion():
         )
         
         db.session.add(review)
-        
-        # 更新向导的评分和评价数
-        companion = Companion.query.get(reservation.companion_id)
-        if companion:
-            # 计算新的平均评分
-            reviews = CompanionReview.query.filter_by(companion_id=companion.id).all()
-            total_rating = sum([r.rating for r in reviews]) + rating
-            new_rating = total_rating / (len(reviews) + 1)
-            
-            companion.rating = new_rating
-            companion.review_count += 1
-        
         db.session.commit()
+        invalidate_companion_cache(reservation.companion_id)
         
         # 返回新创建的评价
         result = {
             'id': review.id,
             'reservation_id': review.reservation_id,
             'companion_id': review.companion_id,
-            'rating': float(review.rating),
+            'rating': review.rating,
             'content': review.content,
             'images': images,
-            'created_at': review.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': review.created_at
         }
         
         return make_succ_response(result)
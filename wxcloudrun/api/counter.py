@@ -1,12 +1,12 @@
-from datetime import datetime
-from flask import request
-from run import app
-from wxcloudrun.dao import query_counterbyid, delete_counterbyid, insert_counter, update_counterbyid
-from wxcloudrun.models import Counters
+from flask import Blueprint, request
+from wxcloudrun.dao import increment_counter, get_counter_sum, clear_counter
 from wxcloudrun.common.response import make_succ_empty_response, make_succ_response, make_err_response
+from wxcloudrun.common.query_budget import query_budget
 
+bp = Blueprint('counter', __name__)
 
-@app.route('/api/count', methods=['POST'])
+
+@bp.route('/api/count', methods=['POST'])
 def count():
     """
     :return:计数结果/清除结果
@@ -22,26 +22,14 @@ def count():
     # 按照不同的action的值，进行不同的操作
     action = params['action']
 
-    # 执行自增操作
+    # 执行自增操作，计数分散在多个分片上，返回各分片之和
     if action == 'inc':
-        counter = query_counterbyid(1)
-        if counter is None:
-            counter = Counters()
-            counter.id = 1
-            counter.count = 1
-            counter.created_at = datetime.now()
-            counter.updated_at = datetime.now()
-            insert_counter(counter)
-        else:
-            counter.id = 1
-            counter.count += 1
-            counter.updated_at = datetime.now()
-            update_counterbyid(counter)
-        return make_succ_response(counter.count)
+        increment_counter(1)
+        return make_succ_response(get_counter_sum(1))
 
     # 执行清0操作
     elif action == 'clear':
-        delete_counterbyid(1)
+        clear_counter(1)
         return make_succ_empty_response()
 
     # action参数错误
@@ -49,10 +37,10 @@ def count():
         return make_err_response('action参数错误')
 
 
-@app.route('/api/count', methods=['GET'])
+@bp.route('/api/count', methods=['GET'])
+@query_budget(1)
 def get_count():
     """
     :return: 计数的值
     """
-    counter = Counters.query.filter(Counters.id == 1).first()
-    return make_succ_response(0) if counter is None else make_succ_response(counter.count) 
\ No newline at end of file
+    return make_succ_response(get_counter_sum(1)) 
\ No newline at end of file
@@ -1,22 +1,25 @@
-from flask import request, jsonify
-from wxcloudrun import app, db
+from flask import Blueprint, request
+from wxcloudrun import db
 from wxcloudrun.model import Favorite, Attraction, TravelGuide
-from wxcloudrun.dao import get_user_by_openid, get_attraction_by_id, get_travel_guide_by_id, get_user_favorites
-from wxcloudrun.common.response import make_succ_response, make_err_response
+from wxcloudrun.dao import get_user_by_openid, get_user_favorites, get_favorite_items
+from wxcloudrun.common.query_budget import query_budget
+from wxcloudrun.common.response import make_json_response, make_succ_response, make_err_response
 
-@app.route('/api/favorite/add', methods=['POST'])
+bp = Blueprint('favorite', __name__)
+
+@bp.route('/api/favorite/add', methods=['POST'])
 def add_favorite():
     """添加收藏 (从请求头获取openid)"""
     try:
         # 从请求头获取openid
         openid = request.headers.get('x-wx-openid', '')
         if not openid:
-            return jsonify({'code': -1, 'msg': '缺少用户标识'})
+            return make_json_response({'code': -1, 'msg': '缺少用户标识'})
         
         # 根据openid查询用户
         user = get_user_by_openid(openid)
         if not user:
-            return jsonify({'code': -1, 'msg': '用户不存在'})
+            return make_json_response({'code': -1, 'msg': '用户不存在'})
         
         user_id = user.id
         data = request.get_json()
@@ -24,49 +27,49 @@ def add_favorite():
         item_id = data.get('item_id')
         
         if not all([type, item_id]):
-            return jsonify({'code': -1, 'msg': '缺少必要参数'})
+            return make_json_response({'code': -1, 'msg': '缺少必要参数'})
         
         # 检查收藏对象是否存在
         if type == 'attraction':
             item = Attraction.query.get(item_id)
             if not item:
-                return jsonify({'code': -1, 'msg': '景点不存在'})
+                return make_json_response({'code': -1, 'msg': '景点不存在'})
         elif type == 'guide':
             item = TravelGuide.query.get(item_id)
             if not item:
-                return jsonify({'code': -1, 'msg': '旅游指南不存在'})
+                return make_json_response({'code': -1, 'msg': '旅游指南不存在'})
         else:
-            return jsonify({'code': -1, 'msg': '收藏类型错误'})
+            return make_json_response({'code': -1, 'msg': '收藏类型错误'})
         
         # 检查是否已经收藏
         existing = Favorite.query.filter_by(user_id=user_id, type=type, item_id=item_id).first()
         if existing:
-            return jsonify({'code': -1, 'msg': '已经收藏过该内容'})
+            return make_json_response({'code': -1, 'msg': '已经收藏过该内容'})
         
         # 添加收藏
         favorite = Favorite(user_id=user_id, type=type, item_id=item_id)
         db.session.add(favorite)
         db.session.commit()
         
-        return jsonify({'code': 0, 'msg': '收藏成功'})
+        return make_json_response({'code': 0, 'msg': '收藏成功'})
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/favorite/remove', methods=['POST'])
+@bp.route('/api/favorite/remove', methods=['POST'])
 def remove_favorite():
     """取消收藏 (从请求头获取openid)"""
     try:
         # 从请求头获取openid
         openid = request.headers.get('x-wx-openid', '')
         if not openid:
-            return jsonify({'code': -1, 'msg': '缺少用户标识'})
+            return make_json_response({'code': -1, 'msg': '缺少用户标识'})
         
         # 根据openid查询用户
         user = get_user_by_openid(openid)
         if not user:
-            return jsonify({'code': -1, 'msg': '用户不存在'})
+            return make_json_response({'code': -1, 'msg': '用户不存在'})
         
         user_id = user.id
         data = request.get_json()
@@ -74,36 +77,37 @@ def remove_favorite():
         item_id = data.get('item_id')
         
         if not all([type, item_id]):
-            return jsonify({'code': -1, 'msg': '缺少必要参数'})
+            return make_json_response({'code': -1, 'msg': '缺少必要参数'})
         
         # 查找收藏记录
         favorite = Favorite.query.filter_by(user_id=user_id, type=type, item_id=item_id).first()
         if not favorite:
-            return jsonify({'code': -1, 'msg': '未找到收藏记录'})
+            return make_json_response({'code': -1, 'msg': '未找到收藏记录'})
         
         # 删除收藏
         db.session.delete(favorite)
         db.session.commit()
         
-        return jsonify({'code': 0, 'msg': '取消收藏成功'})
+        return make_json_response({'code': 0, 'msg': '取消收藏成功'})
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/favorite/list', methods=['GET'])
+@bp.route('/api/favorite/list', methods=['GET'])
+@query_budget(4)
 def get_favorites():
     """获取用户收藏列表 (从请求头获取openid)"""
     try:
         # 从请求头获取openid
         openid = request.headers.get('x-wx-openid', '')
         if not openid:
-            return jsonify({'code': -1, 'msg': '缺少用户标识'})
+            return make_json_response({'code': -1, 'msg': '缺少用户标识'})
         
         # 根据openid查询用户
         user = get_user_by_openid(openid)
         if not user:
-            return jsonify({'code': -1, 'msg': '用户不存在'})
+            return make_json_response({'code': -1, 'msg': '用户不存在'})
         
         user_id = user.id
         type = request.args.get('type')  # 可选，筛选收藏类型
@@ -116,16 +120,17 @@ def get_favorites():
         favorites = query.all()
         result = {'code': 0, 'data': []}
         
-        # 获取收藏内容的详情
+        # 获取收藏内容的详情，每种类型一条查询
+        items = get_favorite_items(favorites)
         for fav in favorites:
+            item = items.get((fav.type, fav.item_id))
             if fav.type == 'attraction':
-                item = Attraction.query.get(fav.item_id)
                 if item:
                     result['data'].append({
                         'id': fav.id,
                         'type': fav.type,
                         'item_id': fav.item_id,
-                        'created_at': fav.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                        'created_at': fav.created_at,
                         'item': {
                             'id': item.id,
                             'name': item.name,
@@ -134,13 +139,12 @@ def get_favorites():
                         }
                     })
             elif fav.type == 'guide':
-                item = TravelGuide.query.get(fav.item_id)
                 if item:
                     result['data'].append({
                         'id': fav.id,
                         'type': fav.type,
                         'item_id': fav.item_id,
-                        'created_at': fav.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                        'created_at': fav.created_at,
                         'item': {
                             'id': item.id,
                             'title': item.title,
@@ -149,12 +153,13 @@ def get_favorites():
                         }
                     })
         
-        return jsonify(result)
+        return make_json_response(result)
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/favorites', methods=['GET'])
+@bp.route('/api/favorites', methods=['GET'])
+@query_budget(4)
 def get_user_favorites_api():
     """
     获取用户收藏列表
@@ -176,14 +181,16 @@ def get_user_favorites_api():
     # 获取用户收藏
     favorites = get_user_favorites(user_id, type)
     
+    # 获取收藏项目详情，每种类型一条查询
+    items = get_favorite_items(favorites)
+    
     # 构建响应数据
     favorite_list = []
     for fav in favorites:
         item_info = None
         
-        # 获取收藏项目详情
         if fav.type == 'attraction':
-            attraction = get_attraction_by_id(fav.item_id)
+            attraction = items.get((fav.type, fav.item_id))
             if attraction:
                 item_info = {
                     'id': attraction.id,
@@ -194,7 +201,7 @@ def get_user_favorites_api():
                     'category': attraction.category
                 }
         elif fav.type == 'guide':
-            guide = get_travel_guide_by_id(fav.item_id)
+            guide = items.get((fav.type, fav.item_id))
             if guide:
                 item_info = {
                     'id': guide.id,
@@ -210,7 +217,7 @@ def get_user_favorites_api():
                 'type': fav.type,
                 'itemId': fav.item_id,
                 'item': item_info,
-                'createdAt': fav.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'createdAt': fav.created_at
             })
     
     return make_succ_response(favorite_list) 
\ No newline at end of file
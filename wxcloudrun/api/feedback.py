@@ -1,11 +1,13 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
 import logging
 from wxcloudrun.model import Feedback, AboutInfo
 from wxcloudrun import db
-from wxcloudrun.response import make_succ_response, make_err_response
+from wxcloudrun.common.conditional import cache_validator, version_etag
+from wxcloudrun.common.response import make_succ_response, make_err_response
 from datetime import datetime
 
+bp = Blueprint('feedback', __name__)
+
 # 配置日志
 logger = logging.getLogger('travel-cloud')
 
@@ -18,7 +20,7 @@ def get_openid():
     return openid
 
 # 提交反馈信息
-@app.route('/api/feedback/submit', methods=['POST'])
+@bp.route('/api/feedback/submit', methods=['POST'])
 def submit_feedback():
     try:
         # 获取请求体参数
@@ -60,7 +62,7 @@ def submit_feedback():
             'contact': feedback.contact,
             'images': images,
             'status': feedback.status,
-            'created_at': feedback.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': feedback.created_at
         }
         
         return make_succ_response(result)
@@ -69,14 +71,24 @@ def submit_feedback():
         logger.error(f"提交反馈失败: {e}")
         return make_err_response(f"提交反馈失败: {str(e)}")
 
+# 关于我们信息的版本，只查询ID和更新时间；同一类型有多条时与接口一样取ID最小的一条
+def about_info_version():
+    info_type = request.args.get('type', 'company')
+    row = db.session.query(AboutInfo.id, AboutInfo.updated_at).filter(AboutInfo.type == info_type) \
+        .order_by(AboutInfo.id).first()
+    if row is None:
+        return None
+    return version_etag('about', info_type, row.id, row.updated_at), row.updated_at
+
 # 获取关于我们信息
-@app.route('/api/about/info', methods=['GET'])
+@bp.route('/api/about/info', methods=['GET'])
+@cache_validator(about_info_version)
 def get_about_info():
     try:
         info_type = request.args.get('type', 'company')  # 默认获取公司简介
         
         # 获取指定类型的信息
-        info = AboutInfo.query.filter_by(type=info_type).first()
+        info = AboutInfo.query.filter_by(type=info_type).order_by(AboutInfo.id).first()
         if not info:
             return make_err_response(f'未找到{info_type}类型的信息')
         
@@ -86,7 +98,7 @@ def get_about_info():
             'title': info.title,
             'content': info.content,
             'type': info.type,
-            'updated_at': info.updated_at.strftime('%Y-%m-%d %H:%M:%S')
+            'updated_at': info.updated_at
         }
         
         return make_succ_response(result)
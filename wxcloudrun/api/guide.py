@@ -1,12 +1,21 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
 from wxcloudrun.dao import get_travel_guides, get_travel_guide_by_id, create_travel_guide
 from wxcloudrun.dao import get_user_favorites, get_user_by_openid
 from wxcloudrun.models import TravelGuide
 from wxcloudrun.common.response import make_succ_response, make_err_response
+from wxcloudrun.common.shared_cache import shared_cache
+from wxcloudrun.common.view_counter import view_counter
 
+bp = Blueprint('guide', __name__)
 
-@app.route('/api/guides', methods=['GET'])
+# 旅游指南详情的共享缓存，不含与用户相关的收藏状态
+guide_cache = shared_cache.namespace('guide')
+
+# 浏览次数写回数据库后删除缓存，缓存中的浏览次数为写回前数据库中的值
+view_counter.on_flush(TravelGuide, lambda guide_ids: guide_cache.delete(*guide_ids))
+
+
+@bp.route('/api/guides', methods=['GET'])
 def get_guides():
     """
     获取旅游指南列表
@@ -24,23 +33,43 @@ def get_guides():
             'coverImage': guide.cover_image,
             'description': guide.description,
             'author': guide.author,
-            'viewCount': guide.view_count,
+            'viewCount': guide.view_count + view_counter.pending(TravelGuide, guide.id),
             'likeCount': guide.like_count,
-            'createdAt': guide.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'createdAt': guide.created_at
         })
     
     return make_succ_response(result)
 
 
-@app.route('/api/guides/<int:guide_id>', methods=['GET'])
+@bp.route('/api/guides/<int:guide_id>', methods=['GET'])
 def get_guide_detail(guide_id):
     """
     获取旅游指南详情
     """
-    guide = get_travel_guide_by_id(guide_id)
+    result = guide_cache.get(guide_id)
+    if result is None:
+        guide = get_travel_guide_by_id(guide_id)
+        
+        if guide is None:
+            return make_err_response('旅游指南不存在')
+        
+        result = {
+            'id': guide.id,
+            'title': guide.title,
+            'coverImage': guide.cover_image,
+            'description': guide.description,
+            'content': guide.content,
+            'author': guide.author,
+            'viewCount': guide.view_count,
+            'likeCount': guide.like_count,
+            'isFavorite': False,
+            'createdAt': guide.created_at
+        }
+        guide_cache.set(guide_id, result)
     
-    if guide is None:
-        return make_err_response('旅游指南不存在')
+    # 浏览次数在内存中累计，定时写回数据库
+    view_counter.incr(TravelGuide, guide_id)
+    result['viewCount'] += view_counter.pending(TravelGuide, guide_id)
     
     # 检查用户是否已收藏
     is_favorite = False
@@ -58,23 +87,12 @@ def get_guide_detail(guide_id):
                     is_favorite = True
                     break
     
-    result = {
-        'id': guide.id,
-        'title': guide.title,
-        'coverImage': guide.cover_image,
-        'description': guide.description,
-        'content': guide.content,
-        'author': guide.author,
-        'viewCount': guide.view_count,
-        'likeCount': guide.like_count,
-        'isFavorite': is_favorite,
-        'createdAt': guide.created_at.strftime('%Y-%m-%d %H:%M:%S')
-    }
+    result['isFavorite'] = is_favorite
     
     return make_succ_response(result)
 
 
-@app.route('/api/guides', methods=['POST'])
+@bp.route('/api/guides', methods=['POST'])
 def create_guide():
     """
     创建旅游指南（管理员接口）
@@ -1,9 +1,12 @@
-from flask import jsonify
-from wxcloudrun import app, db
+from flask import Blueprint
+from wxcloudrun.common.response import make_json_response
+from wxcloudrun import db
 import json
 import os
 
-@app.route('/api/initialize/status', methods=['GET'])
+bp = Blueprint('initialize', __name__)
+
+@bp.route('/api/initialize/status', methods=['GET'])
 def initialization_status():
     """获取初始化状态"""
     try:
@@ -12,7 +15,7 @@ def initialization_status():
         attraction_count = Attraction.query.count()
         
         if attraction_count > 0:
-            return jsonify({
+            return make_json_response({
                 'code': 0,
                 'data': {
                     'initialized': True,
@@ -20,7 +23,7 @@ def initialization_status():
                 }
             })
         else:
-            return jsonify({
+            return make_json_response({
                 'code': 0,
                 'data': {
                     'initialized': False,
@@ -29,9 +32,9 @@ def initialization_status():
             })
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/initialize/data', methods=['POST'])
+@bp.route('/api/initialize/data', methods=['POST'])
 def initialize_data():
     """初始化数据"""
     try:
@@ -39,15 +42,15 @@ def initialize_data():
         # 由于这是一个示例，我们不会真正执行初始化
         # 实际应用中，您可能需要从init_data.py导入相应的函数
         
-        return jsonify({
+        return make_json_response({
             'code': 0,
             'msg': '数据初始化已触发，请稍后通过status接口查询结果'
         })
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/initialize/reset', methods=['POST'])
+@bp.route('/api/initialize/reset', methods=['POST'])
 def reset_data():
     """重置数据（危险操作）"""
     try:
@@ -55,10 +58,10 @@ def reset_data():
         # 注意：这是一个危险操作，实际应用中应该加入权限验证
         # 在生产环境中，您可能不希望暴露这样的接口
         
-        return jsonify({
+        return make_json_response({
             'code': 0,
             'msg': '数据重置已触发，请稍后通过status接口查询结果'
         })
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)}) 
\ No newline at end of file
+        return make_json_response({'code': -1, 'msg': str(e)}) 
\ No newline at end of file
@@ -1,10 +1,15 @@
-from flask import request, g
-from run import app
+from flask import Blueprint, request, g
 import logging
+import config
 from wxcloudrun.model import News, NewsLike, NewsComment
 from wxcloudrun import db
-from wxcloudrun.response import make_succ_response, make_err_response
+from wxcloudrun.common.query_budget import query_budget
+from wxcloudrun.common.response import make_succ_response, make_err_response
+from wxcloudrun.common.view_counter import view_counter
 from datetime import datetime
+from sqlalchemy import case, func, select, union_all
+
+bp = Blueprint('news', __name__)
 
 # 配置日志
 logger = logging.getLogger('travel-cloud')
@@ -17,8 +22,40 @@ def get_openid():
         return None
     return openid
 
+# 在数据库中原子地增减点赞数，资讯不存在时返回None，否则返回更新后的点赞数
+# 点赞和取消点赞都先更新资讯行再写点赞记录，加锁顺序一致，同一资讯的并发请求在资讯行上排队而不会死锁
+def adjust_news_like_count(news_id, delta):
+    like_count = case([(News.like_count + delta > 0, News.like_count + delta)], else_=0)
+    if db.engine.dialect.name == 'mysql':
+        # 通过LAST_INSERT_ID(expr)在UPDATE的响应中带回新的点赞数，不需要再执行SELECT
+        result = db.session.execute(News.__table__.update().where(News.id == news_id)
+                                    .values(like_count=func.last_insert_id(like_count)))
+        return result.lastrowid if result.rowcount else None
+    result = db.session.execute(News.__table__.update().where(News.id == news_id).values(like_count=like_count))
+    if not result.rowcount:
+        return None
+    return db.session.execute(select([News.like_count]).where(News.id == news_id)).scalar()
+
+# 插入点赞记录，已点赞（uq_news_like冲突）时不插入，返回插入的行数
+def insert_news_like(news_id, openid):
+    stmt = NewsLike.__table__.insert().values(news_id=news_id, user_id=openid, createdAt=func.now()) \
+        .prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+    return db.session.execute(stmt).rowcount
+
+# 单次批量查询点赞状态最多的资讯数
+LIKED_IDS_LIMIT = 100
+
+# 批量查询用户点赞过哪些资讯，一条IN查询
+def get_liked_news_ids(openid, news_ids):
+    if not openid or not news_ids:
+        return set()
+    rows = db.session.query(NewsLike.news_id).filter(
+        NewsLike.user_id == openid, NewsLike.news_id.in_(set(news_ids))).all()
+    return {row.news_id for row in rows}
+
 # 获取资讯/动态列表
-@app.route('/api/news/list', methods=['GET'])
+@bp.route('/api/news/list', methods=['GET'])
+@query_budget(3)
 def get_news_list():
     try:
         page = int(request.args.get('page', 1))
@@ -33,7 +70,7 @@ def get_news_list():
             query = query.filter_by(category=category)
         
         # 按创建时间倒序排序并分页
-        news_list = query.order_by(News.createdAt.desc()).paginate(
+        news_list = query.order_by(News.created_at.desc()).paginate(
             page=page, per_page=page_size
         )
         
@@ -45,8 +82,8 @@ def get_news_list():
             'list': []
         }
         
-        # 处理用户点赞状态
-        openid = get_openid()
+        # 处理用户点赞状态，当前页的点赞状态一次查出
+        liked_ids = get_liked_news_ids(get_openid(), [news.id for news in news_list.items])
         
         for news in news_list.items:
             item = {
@@ -54,19 +91,13 @@ def get_news_list():
                 'title': news.title,
                 'cover_image': news.cover_image,
                 'author_id': news.author_id,
-                'view_count': news.view_count,
+                'view_count': news.view_count + view_counter.pending(News, news.id),
                 'like_count': news.like_count,
                 'comment_count': news.comment_count,
-                'created_at': news.createdAt.strftime('%Y-%m-%d %H:%M:%S'),
-                'is_liked': False
+                'created_at': news.created_at,
+                'is_liked': news.id in liked_ids
             }
             
-            # 如果有用户登录，检查是否点赞过
-            if openid:
-                like = NewsLike.query.filter_by(news_id=news.id, user_id=openid).first()
-                if like:
-                    item['is_liked'] = True
-            
             result['list'].append(item)
         
         return make_succ_response(result)
@@ -75,16 +106,15 @@ def get_news_list():
         return make_err_response(f"获取资讯列表失败: {str(e)}")
 
 # 获取资讯/动态详情
-@app.route('/api/news/<int:news_id>', methods=['GET'])
+@bp.route('/api/news/<int:news_id>', methods=['GET'])
 def get_news_detail(news_id):
     try:
         news = News.query.get(news_id)
         if not news:
             return make_err_response('资讯不存在')
         
-        # 增加浏览次数
-        news.view_count += 1
-        db.session.commit()
+        # 增加浏览次数，在内存中累计，定时写回数据库
+        view_counter.incr(News, news_id)
         
         # 构建返回数据
         result = {
@@ -93,28 +123,46 @@ def get_news_detail(news_id):
             'content': news.content,
             'cover_image': news.cover_image,
             'author_id': news.author_id,
-            'view_count': news.view_count,
+            'view_count': news.view_count + view_counter.pending(News, news_id),
             'like_count': news.like_count,
             'comment_count': news.comment_count,
-            'created_at': news.createdAt.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': news.updatedAt.strftime('%Y-%m-%d %H:%M:%S'),
-            'is_liked': False
+            'created_at': news.created_at,
+            'updated_at': news.updated_at,
+            'is_liked': news_id in get_liked_news_ids(get_openid(), [news_id])
         }
         
-        # 获取当前用户是否点赞
-        openid = get_openid()
-        if openid:
-            like = NewsLike.query.filter_by(news_id=news_id, user_id=openid).first()
-            if like:
-                result['is_liked'] = True
-        
         return make_succ_response(result)
     except Exception as e:
         logger.error(f"获取资讯详情失败: {e}")
         return make_err_response(f"获取资讯详情失败: {str(e)}")
 
+# 批量获取当前用户对资讯的点赞状态，ids为逗号分隔的资讯ID，也可以重复传ids参数
+@bp.route('/api/news/liked', methods=['GET'])
+@query_budget(1)
+def get_news_liked():
+    try:
+        news_ids = []
+        for value in request.args.getlist('ids'):
+            news_ids.extend(int(news_id) for news_id in value.split(',') if news_id.strip())
+    except ValueError:
+        return make_err_response('ids参数错误')
+    if len(news_ids) > LIKED_IDS_LIMIT:
+        return make_err_response(f'ids最多{LIKED_IDS_LIMIT}个')
+    
+    openid = get_openid()
+    if not openid:
+        return make_err_response('未登录或登录已过期')
+    
+    try:
+        # 返回点赞过的资讯ID，按请求的顺序
+        liked_ids = get_liked_news_ids(openid, news_ids)
+        return make_succ_response([news_id for news_id in dict.fromkeys(news_ids) if news_id in liked_ids])
+    except Exception as e:
+        logger.error(f"获取点赞状态失败: {e}")
+        return make_err_response(f"获取点赞状态失败: {str(e)}")
+
 # 点赞资讯/动态
-@app.route('/api/news/like', methods=['POST'])
+@bp.route('/api/news/like', methods=['POST'])
 def like_news():
     try:
         # 获取请求体参数
@@ -129,33 +177,24 @@ def like_news():
         if not openid:
             return make_err_response('未登录或登录已过期')
         
-        # 检查资讯是否存在
-        news = News.query.get(news_id)
-        if not news:
+        # 增加点赞数并创建点赞记录，并发重复点赞由唯一约束保证只插入一条，未插入时回滚点赞数
+        like_count = adjust_news_like_count(news_id, 1)
+        if like_count is None:
+            db.session.rollback()
             return make_err_response('资讯不存在')
-        
-        # 检查是否已经点赞
-        like = NewsLike.query.filter_by(news_id=news_id, user_id=openid).first()
-        if like:
+        if not insert_news_like(news_id, openid):
+            db.session.rollback()
             return make_err_response('已经点赞过')
-        
-        # 创建点赞记录
-        new_like = NewsLike(news_id=news_id, user_id=openid)
-        db.session.add(new_like)
-        
-        # 更新资讯点赞数
-        news.like_count += 1
-        
         db.session.commit()
         
-        return make_succ_response({'like_count': news.like_count})
+        return make_succ_response({'like_count': like_count})
     except Exception as e:
         db.session.rollback()
         logger.error(f"点赞资讯失败: {e}")
         return make_err_response(f"点赞资讯失败: {str(e)}")
 
 # 取消点赞
-@app.route('/api/news/unlike', methods=['POST'])
+@bp.route('/api/news/unlike', methods=['POST'])
 def unlike_news():
     try:
         # 获取请求体参数
@@ -170,44 +209,71 @@ def unlike_news():
         if not openid:
             return make_err_response('未登录或登录已过期')
         
-        # 检查资讯是否存在
-        news = News.query.get(news_id)
-        if not news:
+        # 减少点赞数并删除点赞记录，未删除到记录时回滚点赞数
+        like_count = adjust_news_like_count(news_id, -1)
+        if like_count is None:
+            db.session.rollback()
             return make_err_response('资讯不存在')
-        
-        # 检查是否已经点赞
-        like = NewsLike.query.filter_by(news_id=news_id, user_id=openid).first()
-        if not like:
+        deleted = db.session.execute(NewsLike.__table__.delete().where(
+            NewsLike.news_id == news_id, NewsLike.user_id == openid)).rowcount
+        if not deleted:
+            db.session.rollback()
             return make_err_response('尚未点赞')
-        
-        # 删除点赞记录
-        db.session.delete(like)
-        
-        # 更新资讯点赞数
-        if news.like_count > 0:
-            news.like_count -= 1
-        
         db.session.commit()
         
-        return make_succ_response({'like_count': news.like_count})
+        return make_succ_response({'like_count': like_count})
     except Exception as e:
         db.session.rollback()
         logger.error(f"取消点赞失败: {e}")
         return make_err_response(f"取消点赞失败: {str(e)}")
 
-# 获取评论列表
-@app.route('/api/news/comments/<int:news_id>', methods=['GET'])
+# 单次获取回复的最大条数
+REPLY_PAGE_SIZE_LIMIT = 100
+
+# 评论列表单页的最大条数，每条评论的回复预览是UNION ALL中的一个子查询，需要限制子查询个数
+COMMENT_PAGE_SIZE_LIMIT = 50
+
+# 格式化回复
+def format_reply(reply):
+    return {
+        'id': reply.id,
+        'user_id': reply.user_id,
+        'content': reply.content,
+        'created_at': reply.created_at
+    }
+
+# 一条查询获取多个评论各自最早的limit条回复，每个评论一个带LIMIT的子查询，用UNION ALL合并
+# 回复按ID（即发布顺序）升序排列，使用parent_id索引
+def get_reply_previews(parent_ids, limit):
+    if not parent_ids or limit <= 0:
+        return {}
+    columns = [NewsComment.id, NewsComment.user_id, NewsComment.content, NewsComment.parent_id, NewsComment.created_at]
+    parts = []
+    for parent_id in parent_ids:
+        part = select(columns).where(NewsComment.parent_id == parent_id).order_by(NewsComment.id).limit(limit).subquery()
+        parts.append(select(part.c))
+    stmt = parts[0] if len(parts) == 1 else union_all(*parts)
+    replies = {}
+    for reply in db.session.execute(stmt):
+        replies.setdefault(reply.parent_id, []).append(reply)
+    return replies
+
+# 获取评论列表，每条评论只带最早的几条回复，其余回复通过回复列表接口按游标获取
+@bp.route('/api/news/comments/<int:news_id>', methods=['GET'])
+@query_budget(3)
 def get_news_comments(news_id):
     try:
         page = int(request.args.get('page', 1))
-        page_size = int(request.args.get('page_size', 20))
+        page_size = min(int(request.args.get('page_size', 20)), COMMENT_PAGE_SIZE_LIMIT)
+        if page_size <= 0:
+            return make_err_response('page_size参数错误')
         
         # 获取一级评论
         comments = NewsComment.query.filter_by(
             news_id=news_id, 
             parent_id=None
         ).order_by(
-            NewsComment.createdAt.desc()
+            NewsComment.created_at.desc(), NewsComment.id.desc()
         ).paginate(
             page=page, per_page=page_size
         )
@@ -220,31 +286,24 @@ def get_news_comments(news_id):
             'list': []
         }
         
+        # 一次查出本页所有评论的回复，多取一条用于判断是否还有更多回复
+        preview_size = config.NEWS_REPLY_PREVIEW_SIZE
+        replies = get_reply_previews([comment.id for comment in comments.items], preview_size + 1)
+        
         for comment in comments.items:
-            # 查询该评论的回复
-            replies = NewsComment.query.filter_by(
-                parent_id=comment.id
-            ).order_by(
-                NewsComment.createdAt.asc()
-            ).all()
-            
-            # 格式化回复
-            formatted_replies = []
-            for reply in replies:
-                formatted_replies.append({
-                    'id': reply.id,
-                    'user_id': reply.user_id,
-                    'content': reply.content,
-                    'created_at': reply.createdAt.strftime('%Y-%m-%d %H:%M:%S')
-                })
+            comment_replies = replies.get(comment.id, [])
+            has_more = len(comment_replies) > preview_size
+            comment_replies = comment_replies[:preview_size]
             
             # 添加到结果列表
             result['list'].append({
                 'id': comment.id,
                 'user_id': comment.user_id,
                 'content': comment.content,
-                'created_at': comment.createdAt.strftime('%Y-%m-%d %H:%M:%S'),
-                'replies': formatted_replies
+                'created_at': comment.created_at,
+                'replies': [format_reply(reply) for reply in comment_replies],
+                'has_more_replies': has_more,
+                'replies_cursor': comment_replies[-1].id if has_more else None
             })
         
         return make_succ_response(result)
@@ -252,8 +311,34 @@ def get_news_comments(news_id):
         logger.error(f"获取评论列表失败: {e}")
         return make_err_response(f"获取评论列表失败: {str(e)}")
 
+# 获取评论的回复列表，cursor为上一页最后一条回复的ID，不传时从第一条开始
+@bp.route('/api/news/comments/<int:comment_id>/replies', methods=['GET'])
+@query_budget(1)
+def get_comment_replies(comment_id):
+    try:
+        cursor = request.args.get('cursor', type=int)
+        page_size = min(int(request.args.get('page_size', 20)), REPLY_PAGE_SIZE_LIMIT)
+        if page_size <= 0:
+            return make_err_response('page_size参数错误')
+        
+        query = NewsComment.query.filter(NewsComment.parent_id == comment_id)
+        if cursor:
+            query = query.filter(NewsComment.id > cursor)
+        replies = query.order_by(NewsComment.id).limit(page_size + 1).all()
+        
+        has_more = len(replies) > page_size
+        replies = replies[:page_size]
+        return make_succ_response({
+            'list': [format_reply(reply) for reply in replies],
+            'has_more': has_more,
+            'next_cursor': replies[-1].id if has_more else None
+        })
+    except Exception as e:
+        logger.error(f"获取回复列表失败: {e}")
+        return make_err_response(f"获取回复列表失败: {str(e)}")
+
 # 发布评论
-@app.route('/api/news/comment', methods=['POST'])
+@bp.route('/api/news/comment', methods=['POST'])
 def post_news_comment():
     try:
         # 获取请求体参数
@@ -302,7 +387,7 @@ def post_news_comment():
             'user_id': new_comment.user_id,
             'content': new_comment.content,
             'parent_id': new_comment.parent_id,
-            'created_at': new_comment.createdAt.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': new_comment.created_at
         }
         
         return make_succ_response(result)
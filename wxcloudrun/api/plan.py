@@ -1,23 +1,26 @@
-from flask import request, jsonify
-from wxcloudrun import app, db
+from flask import Blueprint, request
+from wxcloudrun import db
 from wxcloudrun.model import TravelPlan, TravelPlanItem, Attraction
 from wxcloudrun.dao import get_user_by_openid
-from wxcloudrun.common.response import make_succ_response, make_err_response
+from wxcloudrun.common.response import make_json_response, make_succ_response, make_err_response
+from wxcloudrun.common.query_budget import query_budget
 import datetime
 
-@app.route('/api/plan/create', methods=['POST'])
+bp = Blueprint('plan', __name__)
+
+@bp.route('/api/plan/create', methods=['POST'])
 def create_plan():
     """创建旅行计划 (从请求头获取openid)"""
     try:
         # 从请求头获取openid
         openid = request.headers.get('x-wx-openid', '')
         if not openid:
-            return jsonify({'code': -1, 'msg': '缺少用户标识'})
+            return make_json_response({'code': -1, 'msg': '缺少用户标识'})
         
         # 根据openid查询用户
         user = get_user_by_openid(openid)
         if not user:
-            return jsonify({'code': -1, 'msg': '用户不存在'})
+            return make_json_response({'code': -1, 'msg': '用户不存在'})
         
         user_id = user.id
         data = request.get_json()
@@ -27,7 +30,7 @@ def create_plan():
         description = data.get('description', '')
         
         if not all([title, start_date, end_date]):
-            return jsonify({'code': -1, 'msg': '缺少必要参数'})
+            return make_json_response({'code': -1, 'msg': '缺少必要参数'})
         
         # 创建旅行计划
         plan = TravelPlan(
@@ -41,13 +44,13 @@ def create_plan():
         db.session.add(plan)
         db.session.commit()
         
-        return jsonify({'code': 0, 'msg': '创建成功', 'data': {'plan_id': plan.id}})
+        return make_json_response({'code': 0, 'msg': '创建成功', 'data': {'plan_id': plan.id}})
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/plan/item/add', methods=['POST'])
+@bp.route('/api/plan/item/add', methods=['POST'])
 def add_plan_item():
     """添加计划项目"""
     try:
@@ -59,17 +62,17 @@ def add_plan_item():
         note = data.get('note', '')
         
         if not all([plan_id, day, attraction_id]):
-            return jsonify({'code': -1, 'msg': '缺少必要参数'})
+            return make_json_response({'code': -1, 'msg': '缺少必要参数'})
         
         # 检查景点是否存在
         attraction = Attraction.query.get(attraction_id)
         if not attraction:
-            return jsonify({'code': -1, 'msg': '景点不存在'})
+            return make_json_response({'code': -1, 'msg': '景点不存在'})
         
         # 检查计划是否存在
         plan = TravelPlan.query.get(plan_id)
         if not plan:
-            return jsonify({'code': -1, 'msg': '旅行计划不存在'})
+            return make_json_response({'code': -1, 'msg': '旅行计划不存在'})
         
         # 添加计划项目
         item = TravelPlanItem(
@@ -83,25 +86,25 @@ def add_plan_item():
         db.session.add(item)
         db.session.commit()
         
-        return jsonify({'code': 0, 'msg': '添加成功', 'data': {'item_id': item.id}})
+        return make_json_response({'code': 0, 'msg': '添加成功', 'data': {'item_id': item.id}})
     
     except Exception as e:
         db.session.rollback()
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/plan/list', methods=['GET'])
+@bp.route('/api/plan/list', methods=['GET'])
 def get_plans():
     """获取用户的旅行计划列表 (从请求头获取openid)"""
     try:
         # 从请求头获取openid
         openid = request.headers.get('x-wx-openid', '')
         if not openid:
-            return jsonify({'code': -1, 'msg': '缺少用户标识'})
+            return make_json_response({'code': -1, 'msg': '缺少用户标识'})
         
         # 根据openid查询用户
         user = get_user_by_openid(openid)
         if not user:
-            return jsonify({'code': -1, 'msg': '用户不存在'})
+            return make_json_response({'code': -1, 'msg': '用户不存在'})
         
         user_id = user.id
         
@@ -113,42 +116,43 @@ def get_plans():
                 {
                     'id': plan.id,
                     'title': plan.title,
-                    'start_date': plan.start_date.strftime('%Y-%m-%d'),
-                    'end_date': plan.end_date.strftime('%Y-%m-%d'),
+                    'start_date': plan.start_date,
+                    'end_date': plan.end_date,
                     'description': plan.description,
-                    'created_at': plan.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                    'created_at': plan.created_at
                 } for plan in plans
             ]
         }
         
-        return jsonify(result)
+        return make_json_response(result)
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/plan/<int:plan_id>', methods=['GET'])
+@bp.route('/api/plan/<int:plan_id>', methods=['GET'])
+@query_budget(4)
 def get_plan_detail(plan_id):
     """获取旅行计划详情 (从请求头获取openid)"""
     try:
         # 从请求头获取openid
         openid = request.headers.get('x-wx-openid', '')
         if not openid:
-            return jsonify({'code': -1, 'msg': '缺少用户标识'})
+            return make_json_response({'code': -1, 'msg': '缺少用户标识'})
         
         # 根据openid查询用户
         user = get_user_by_openid(openid)
         if not user:
-            return jsonify({'code': -1, 'msg': '用户不存在'})
+            return make_json_response({'code': -1, 'msg': '用户不存在'})
         
         user_id = user.id
         
         plan = TravelPlan.query.get(plan_id)
         if not plan:
-            return jsonify({'code': -1, 'msg': '旅行计划不存在'})
+            return make_json_response({'code': -1, 'msg': '旅行计划不存在'})
         
         # 验证该计划是否属于当前用户
         if plan.user_id != user_id:
-            return jsonify({'code': -1, 'msg': '无权查看该行程'})
+            return make_json_response({'code': -1, 'msg': '无权查看该行程'})
         
         # 获取计划项目
         items = TravelPlanItem.query.filter_by(plan_id=plan_id).all()
@@ -161,10 +165,10 @@ def get_plan_detail(plan_id):
         plan_data = {
             'id': plan.id,
             'title': plan.title,
-            'start_date': plan.start_date.strftime('%Y-%m-%d'),
-            'end_date': plan.end_date.strftime('%Y-%m-%d'),
+            'start_date': plan.start_date,
+            'end_date': plan.end_date,
             'description': plan.description,
-            'created_at': plan.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'created_at': plan.created_at,
             'items': []
         }
         
@@ -187,12 +191,12 @@ def get_plan_detail(plan_id):
                 
             plan_data['items'].append(item_data)
         
-        return jsonify({'code': 0, 'data': plan_data})
+        return make_json_response({'code': 0, 'data': plan_data})
     
     except Exception as e:
-        return jsonify({'code': -1, 'msg': str(e)})
+        return make_json_response({'code': -1, 'msg': str(e)})
 
-@app.route('/api/plans', methods=['GET'])
+@bp.route('/api/plans', methods=['GET'])
 def get_user_plans():
     """获取用户的旅行计划列表，从请求头获取openid"""
     try:
@@ -214,10 +218,10 @@ def get_user_plans():
             result.append({
                 'id': plan.id,
                 'title': plan.title,
-                'startDate': plan.start_date.strftime('%Y-%m-%d'),
-                'endDate': plan.end_date.strftime('%Y-%m-%d'),
+                'startDate': plan.start_date,
+                'endDate': plan.end_date,
                 'description': plan.description,
-                'createdAt': plan.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'createdAt': plan.created_at
             })
         
         return make_succ_response(result)
@@ -225,7 +229,8 @@ def get_user_plans():
     except Exception as e:
         return make_err_response(str(e))
 
-@app.route('/api/plans/<int:plan_id>', methods=['GET'])
+@bp.route('/api/plans/<int:plan_id>', methods=['GET'])
+@query_budget(4)
 def get_plan_detail_api(plan_id):
     """获取旅行计划详情，从请求头获取openid"""
     try:
@@ -258,10 +263,10 @@ def get_plan_detail_api(plan_id):
         plan_data = {
             'id': plan.id,
             'title': plan.title,
-            'startDate': plan.start_date.strftime('%Y-%m-%d'),
-            'endDate': plan.end_date.strftime('%Y-%m-%d'),
+            'startDate': plan.start_date,
+            'endDate': plan.end_date,
             'description': plan.description,
-            'createdAt': plan.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'createdAt': plan.created_at,
             'items': []
         }
         
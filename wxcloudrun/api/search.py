@@ -1,16 +1,17 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
 import logging
 from wxcloudrun.model import Attraction, News, Companion, Solution
 from wxcloudrun import db
-from wxcloudrun.response import make_succ_response, make_err_response
+from wxcloudrun.common.response import make_succ_response, make_err_response
 from sqlalchemy import or_
 
+bp = Blueprint('search', __name__)
+
 # 配置日志
 logger = logging.getLogger('travel-cloud')
 
 # 综合搜索API
-@app.route('/api/search', methods=['GET'])
+@bp.route('/api/search', methods=['GET'])
 def search():
     try:
         keyword = request.args.get('keyword', '')
@@ -74,7 +75,7 @@ def search():
                     'cover_image': news.cover_image,
                     'view_count': news.view_count,
                     'like_count': news.like_count,
-                    'created_at': news.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                    'created_at': news.created_at,
                     'type': 'news'
                 })
         
@@ -94,9 +95,9 @@ def search():
                     'title': companion.title,
                     'avatar': companion.avatar,
                     'cover_image': companion.cover_image,
-                    'price': float(companion.price),
+                    'price': companion.price,
                     'location': companion.location,
-                    'rating': float(companion.rating),
+                    'rating': companion.rating,
                     'type': 'companion'
                 })
         
@@ -116,7 +117,7 @@ def search():
                     'title': solution.title,
                     'cover_image': solution.cover_image,
                     'duration': solution.duration,
-                    'price_estimate': float(solution.price_estimate) if solution.price_estimate else None,
+                    'price_estimate': solution.price_estimate or None,
                     'difficulty': solution.difficulty,
                     'type': 'solution'
                 })
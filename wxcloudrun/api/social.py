@@ -1,9 +1,12 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
 import logging
+from sqlalchemy.orm import load_only
 from wxcloudrun.model import UserFollow, User
 from wxcloudrun import db
-from wxcloudrun.response import make_succ_response, make_err_response
+from wxcloudrun.common.query_budget import query_budget
+from wxcloudrun.common.response import make_succ_response, make_err_response
+
+bp = Blueprint('social', __name__)
 
 # 配置日志
 logger = logging.getLogger('travel-cloud')
@@ -16,8 +19,16 @@ def get_openid():
         return None
     return openid
 
+# 用一条IN查询批量获取用户的昵称和头像
+def get_user_profiles(openids):
+    if not openids:
+        return {}
+    users = User.query.options(load_only(User.openid, User.nickname, User.avatar)) \
+        .filter(User.openid.in_(openids)).all()
+    return {user.openid: user for user in users}
+
 # 关注用户
-@app.route('/api/user/follow', methods=['POST'])
+@bp.route('/api/user/follow', methods=['POST'])
 def follow_user():
     try:
         # 获取请求体参数
@@ -61,7 +72,7 @@ def follow_user():
         return make_err_response(f"关注用户失败: {str(e)}")
 
 # 取消关注
-@app.route('/api/user/unfollow', methods=['POST'])
+@bp.route('/api/user/unfollow', methods=['POST'])
 def unfollow_user():
     try:
         # 获取请求体参数
@@ -96,7 +107,8 @@ def unfollow_user():
         return make_err_response(f"取消关注失败: {str(e)}")
 
 # 获取粉丝列表
-@app.route('/api/user/followers', methods=['GET'])
+@bp.route('/api/user/followers', methods=['GET'])
+@query_budget(4)
 def get_followers():
     try:
         page = int(request.args.get('page', 1))
@@ -124,14 +136,21 @@ def get_followers():
             'list': []
         }
         
-        # 检查当前登录用户是否关注了这些粉丝
-        current_user_id = get_openid()
+        # 批量获取粉丝基本信息
+        follower_ids = [follower[0] for follower in followers]
+        users = get_user_profiles(follower_ids)
         
-        for follower in followers:
-            follower_id = follower[0]
-            
-            # 获取粉丝基本信息
-            user = User.query.filter_by(openid=follower_id).first()
+        # 用一条IN查询检查当前登录用户关注了其中哪些粉丝
+        current_user_id = get_openid()
+        following_ids = set()
+        if current_user_id and follower_ids:
+            following_ids = {row[0] for row in db.session.query(UserFollow.following_id).filter(
+                UserFollow.follower_id == current_user_id,
+                UserFollow.following_id.in_(follower_ids)
+            )}
+        
+        for follower_id in follower_ids:
+            user = users.get(follower_id)
             if not user:
                 continue
             
@@ -139,18 +158,9 @@ def get_followers():
                 'user_id': follower_id,
                 'nickname': user.nickname,
                 'avatar': user.avatar,
-                'is_following': False
+                'is_following': follower_id in following_ids
             }
             
-            # 检查当前登录用户是否关注了该粉丝
-            if current_user_id:
-                is_following = UserFollow.query.filter_by(
-                    follower_id=current_user_id,
-                    following_id=follower_id
-                ).first() is not None
-                
-                follower_info['is_following'] = is_following
-            
             result['list'].append(follower_info)
         
         return make_succ_response(result)
@@ -159,7 +169,8 @@ def get_followers():
         return make_err_response(f"获取粉丝列表失败: {str(e)}")
 
 # 获取关注列表
-@app.route('/api/user/following', methods=['GET'])
+@bp.route('/api/user/following', methods=['GET'])
+@query_budget(3)
 def get_following():
     try:
         page = int(request.args.get('page', 1))
@@ -187,11 +198,12 @@ def get_following():
             'list': []
         }
         
-        for follow in following:
-            following_id = follow[0]
-            
-            # 获取被关注者基本信息
-            user = User.query.filter_by(openid=following_id).first()
+        # 批量获取被关注者基本信息
+        following_ids = [follow[0] for follow in following]
+        users = get_user_profiles(following_ids)
+        
+        for following_id in following_ids:
+            user = users.get(following_id)
             if not user:
                 continue
             
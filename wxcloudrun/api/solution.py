@@ -1,11 +1,20 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
 import logging
 from wxcloudrun.model import Solution, SolutionApplication, TravelPlan
+from sqlalchemy import func
 from wxcloudrun import db
-from wxcloudrun.response import make_succ_response, make_err_response
+from wxcloudrun.common.conditional import cache_validator, version_etag
+from wxcloudrun.common.response import make_succ_response, make_err_response
+from wxcloudrun.common.shared_cache import shared_cache
+from wxcloudrun.common.view_counter import view_counter
 from datetime import datetime
 
+bp = Blueprint('solution', __name__)
+
+# 解决方案详情的共享缓存，应用次数变化和浏览次数写回数据库时失效
+solution_cache = shared_cache.namespace('solution')
+view_counter.on_flush(Solution, lambda solution_ids: solution_cache.delete(*solution_ids))
+
 # 配置日志
 logger = logging.getLogger('travel-cloud')
 
@@ -17,8 +26,17 @@ def get_openid():
         return None
     return openid
 
+# 解决方案列表的版本：方案数量、最近更新时间和本进程浏览次数的版本，应用次数变化和浏览次数写回时更新时间也会变化
+# 列表中的浏览次数包含本进程尚未写回的增量，更新时间不能反映这部分变化，因此只返回ETag，不返回Last-Modified
+def solution_list_version():
+    count, updated_at = db.session.query(func.count(Solution.id), func.max(Solution.updated_at)).one()
+    if updated_at is None:
+        return None
+    return version_etag('solutions', count, updated_at, view_counter.generation(Solution)), None
+
 # 获取解决方案列表
-@app.route('/api/solution/list', methods=['GET'])
+@bp.route('/api/solution/list', methods=['GET'])
+@cache_validator(solution_list_version)
 def get_solution_list():
     try:
         page = int(request.args.get('page', 1))
@@ -58,11 +76,11 @@ def get_solution_list():
                 'description': solution.description,
                 'cover_image': solution.cover_image,
                 'duration': solution.duration,
-                'price_estimate': float(solution.price_estimate) if solution.price_estimate else None,
+                'price_estimate': solution.price_estimate or None,
                 'difficulty': solution.difficulty,
-                'view_count': solution.view_count,
+                'view_count': solution.view_count + view_counter.pending(Solution, solution.id),
                 'apply_count': solution.apply_count,
-                'created_at': solution.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                'created_at': solution.created_at
             })
         
         return make_succ_response(result)
@@ -71,40 +89,45 @@ def get_solution_list():
         return make_err_response(f"获取解决方案列表失败: {str(e)}")
 
 # 获取解决方案详情
-@app.route('/api/solution/<int:solution_id>', methods=['GET'])
+@bp.route('/api/solution/<int:solution_id>', methods=['GET'])
 def get_solution_detail(solution_id):
     try:
-        solution = Solution.query.get(solution_id)
-        if not solution:
-            return make_err_response('解决方案不存在')
-        
-        # 增加浏览次数
-        solution.view_count += 1
-        db.session.commit()
-        
-        # 构建返回数据
-        result = {
-            'id': solution.id,
-            'title': solution.title,
-            'description': solution.description,
-            'cover_image': solution.cover_image,
-            'content': solution.content,
-            'duration': solution.duration,
-            'price_estimate': float(solution.price_estimate) if solution.price_estimate else None,
-            'difficulty': solution.difficulty,
-            'view_count': solution.view_count,
-            'apply_count': solution.apply_count,
-            'created_at': solution.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'updated_at': solution.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        }
+        result = solution_cache.get(solution_id)
+        if result is None:
+            solution = Solution.query.get(solution_id)
+            if not solution:
+                return make_err_response('解决方案不存在')
+            result = build_solution_detail(solution)
+            solution_cache.set(solution_id, result)
+        
+        # 增加浏览次数，在内存中累计，定时写回数据库
+        view_counter.incr(Solution, solution_id)
+        result['view_count'] += view_counter.pending(Solution, solution_id)
         
         return make_succ_response(result)
     except Exception as e:
         logger.error(f"获取解决方案详情失败: {e}")
         return make_err_response(f"获取解决方案详情失败: {str(e)}")
 
+# 构建解决方案详情的返回数据，浏览次数为数据库中的值
+def build_solution_detail(solution):
+    return {
+        'id': solution.id,
+        'title': solution.title,
+        'description': solution.description,
+        'cover_image': solution.cover_image,
+        'content': solution.content,
+        'duration': solution.duration,
+        'price_estimate': solution.price_estimate or None,
+        'difficulty': solution.difficulty,
+        'view_count': solution.view_count,
+        'apply_count': solution.apply_count,
+        'created_at': solution.created_at,
+        'updated_at': solution.updated_at
+    }
+
 # 应用解决方案到行程
-@app.route('/api/solution/apply', methods=['POST'])
+@bp.route('/api/solution/apply', methods=['POST'])
 def apply_solution():
     try:
         # 获取请求体参数
@@ -170,14 +193,15 @@ def apply_solution():
             application.plan_id = travel_plan.id
         
         db.session.commit()
+        solution_cache.delete(solution_id)
         
         # 构建返回数据
         result = {
             'id': application.id,
             'solution_id': application.solution_id,
-            'travel_date': application.travel_date.strftime('%Y-%m-%d') if application.travel_date else None,
+            'travel_date': application.travel_date,
             'notes': application.notes,
-            'created_at': application.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': application.created_at
         }
         
         return make_succ_response(result)
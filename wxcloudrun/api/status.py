@@ -0,0 +1,55 @@
+from flask import Blueprint, Response, current_app
+from wxcloudrun import db
+from wxcloudrun.common.cache import get_cache_stats
+from wxcloudrun.common.db_pool import get_pool_statuses
+from wxcloudrun.common.metrics import metrics_registry, render_cache_metrics, render_pool_metrics, \
+    render_view_counter_metrics
+from wxcloudrun.common.response import make_succ_response
+from wxcloudrun.common.view_counter import view_counter
+
+bp = Blueprint('status', __name__)
+
+
+def get_engines():
+    """
+    主库和各只读实例的引擎
+    :return: {'primary': 主库引擎, 只读实例的bind_key: 引擎}
+    """
+    engines = {'primary': db.engine}
+    for bind_key in current_app.extensions.get('db_replicas', []):
+        engines[bind_key] = db.get_engine(current_app, bind=bind_key)
+    return engines
+
+
+@bp.route('/api/status/pool', methods=['GET'])
+def pool_status():
+    """
+    获取主库和各只读实例的连接池状态：使用中、空闲、溢出连接数以及取连接的等待时间
+    """
+    return make_succ_response(get_pool_statuses(get_engines()))
+
+
+@bp.route('/api/status/cache', methods=['GET'])
+def cache_status():
+    """
+    获取本进程内各缓存的条目数、命中率和淘汰次数
+    """
+    return make_succ_response(get_cache_stats())
+
+
+@bp.route('/api/status/views', methods=['GET'])
+def view_counter_status():
+    """
+    获取本进程内尚未写回的浏览次数以及写回的次数和失败次数
+    """
+    return make_succ_response(view_counter.stats())
+
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus格式的监控指标：各路由的请求耗时、状态码、SQL条数、数据库耗时、连接池状态、缓存命中情况以及浏览次数写回情况
+    """
+    body = (metrics_registry.render_prometheus() + render_pool_metrics(get_pool_statuses(get_engines())) +
+            render_cache_metrics(get_cache_stats()) + render_view_counter_metrics(view_counter.stats()))
+    return Response(body, mimetype='text/plain; version=0.0.4')
@@ -1,11 +1,12 @@
-from flask import request
-from run import app
+from flask import Blueprint, request
 from wxcloudrun.dao import get_user_by_openid, create_user, update_user
 from wxcloudrun.models import User
 from wxcloudrun.common.response import make_succ_response, make_err_response
 
+bp = Blueprint('user', __name__)
 
-@app.route('/api/user/login', methods=['POST'])
+
+@bp.route('/api/user/login', methods=['POST'])
 def user_login():
     """
     用户登录接口
@@ -62,7 +63,7 @@ def user_login():
     })
 
 
-@app.route('/api/user/update', methods=['POST'])
+@bp.route('/api/user/update', methods=['POST'])
 def update_user_info():
     """
     更新用户信息
@@ -102,7 +103,7 @@ def update_user_info():
     })
 
 
-@app.route('/api/user/info', methods=['GET'])
+@bp.route('/api/user/info', methods=['GET'])
 def get_user_info():
     """
     获取用户信息
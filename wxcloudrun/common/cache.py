@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+# 所有已创建的缓存，用于输出统计
+caches = {}
+
+
+class TTLCache(object):
+    """
+    进程内的TTL/LRU缓存：条目超过ttl秒后过期，条目数超过maxsize时淘汰最久未使用的条目
+    各worker进程各自缓存，写操作需要调用delete失效本进程的缓存，其他进程最多在ttl秒后读到新数据
+    """
+
+    def __init__(self, name, maxsize, ttl):
+        """
+        :param name: 缓存名称，用于统计；为None时不计入get_cache_stats
+        :param maxsize: 最大条目数，0为不缓存
+        :param ttl: 默认过期时间（秒）
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if name is not None:
+            caches[name] = self
+
+    def get(self, key):
+        """
+        获取缓存值，不存在或已过期时返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expire_at = item
+            if expire_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        写入缓存
+        :param ttl: 该条目的过期时间（秒），不传时使用默认值
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """
+        缓存统计
+        :return: 条目数、命中、未命中、淘汰、过期次数和命中率
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+def get_cache_stats():
+    """
+    所有缓存的统计，共享缓存只统计本进程的访问
+    :return: {缓存名称: 统计}
+    """
+    return {name: cache.stats() for name, cache in sorted(caches.items())}
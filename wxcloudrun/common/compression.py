@@ -0,0 +1,82 @@
+import gzip
+
+from flask import request
+
+import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 不压缩的状态码：无响应体或协商缓存命中
+_SKIP_STATUS = (204, 304)
+
+
+def _compressible(response):
+    """
+    判断响应是否需要压缩：已压缩的类型（图片、压缩包等）、流式响应和已经编码过的响应不压缩
+    """
+    if response.direct_passthrough or response.is_streamed:
+        return False
+    if response.status_code < 200 or response.status_code in _SKIP_STATUS:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in config.COMPRESSION_MIMETYPES
+
+
+def choose_encoding(accept_encodings):
+    """
+    根据Accept-Encoding选择压缩算法，brotli优先，客户端两者都不接受时返回None
+    :param accept_encodings: request.accept_encodings
+    :return: 'br'、'gzip'或None
+    """
+    if brotli is not None and accept_encodings.quality('br') > 0:
+        return 'br'
+    if accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    """
+    按指定算法压缩数据
+    :param data: bytes
+    :param encoding: 'br'或'gzip'
+    :return: 压缩后的bytes
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.COMPRESSION_BROTLI_QUALITY)
+    # mtime固定为0，相同内容压缩结果相同
+    return gzip.compress(data, compresslevel=config.COMPRESSION_LEVEL, mtime=0)
+
+
+def init_compression(app):
+    """
+    注册响应压缩的钩子，按Accept-Encoding使用brotli或gzip压缩响应体
+    after_request按注册的逆序执行，需要在其他钩子之前注册，保证压缩在响应修改完之后进行
+    :param app: Flask应用实例
+    """
+
+    @app.after_request
+    def compress_response(response):
+        if request.method == 'HEAD' or not _compressible(response):
+            return response
+        # 同一地址的响应内容随Accept-Encoding变化，告知缓存按该请求头区分
+        response.vary.add('Accept-Encoding')
+
+        data = response.get_data()
+        if len(data) < config.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        compressed = compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
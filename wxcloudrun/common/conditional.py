@@ -0,0 +1,89 @@
+import hashlib
+
+from flask import Response, current_app, g, request
+
+import config
+
+# 支持协商缓存的请求方法
+_CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+
+def cache_validator(validator):
+    """
+    声明接口数据的版本查询函数，放在路由装饰器下方使用
+    版本查询函数接收与视图函数相同的参数，只查询updated_at等少量字段，返回(etag, last_modified)，
+    数据不存在时返回None；客户端缓存未过期时直接返回304，不执行视图函数
+    :param validator: 版本查询函数
+    """
+
+    def decorator(view):
+        view.cache_validator = validator
+        return view
+
+    return decorator
+
+
+def version_etag(*parts):
+    """
+    由数据版本生成ETag，例如version_etag('attraction', id, updated_at)
+    :return: ETag字符串，不含引号
+    """
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def content_etag(data):
+    """
+    由响应内容生成ETag
+    :param data: 响应体bytes
+    :return: ETag字符串，不含引号
+    """
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def _set_validators(response, etag, last_modified):
+    # 响应体会按Accept-Encoding压缩，内容相同但字节不同，使用弱ETag
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+
+
+def init_conditional_get(app):
+    """
+    注册协商缓存的钩子：为GET响应添加ETag/Last-Modified，并按If-None-Match/If-Modified-Since返回304
+    需要在响应压缩之后注册，保证ETag按压缩前的内容计算
+    :param app: Flask应用实例
+    """
+
+    @app.before_request
+    def check_version():
+        if request.method not in _CONDITIONAL_METHODS or request.endpoint is None:
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        validator = getattr(view, 'cache_validator', None)
+        if validator is None:
+            return None
+        version = validator(**request.view_args)
+        if version is None:
+            return None
+        g.cache_version = version
+
+        if not (request.if_none_match or request.if_modified_since):
+            return None
+        response = Response(mimetype='application/json')
+        _set_validators(response, *version)
+        response.make_conditional(request)
+        return response if response.status_code == 304 else None
+
+    @app.after_request
+    def add_validators(response):
+        if request.method not in _CONDITIONAL_METHODS or response.status_code != 200:
+            return response
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if 'cache_version' in g:
+            _set_validators(response, *g.cache_version)
+        elif config.CONDITIONAL_GET_CONTENT_HASH and response.mimetype == 'application/json':
+            _set_validators(response, content_etag(response.get_data()), None)
+        else:
+            return response
+        return response.make_conditional(request)
@@ -0,0 +1,121 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+import config
+
+
+class PoolStats(object):
+    """
+    记录一个连接池取连接的等待时间，按进程统计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.timeouts = 0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            if seconds > self.wait_max:
+                self.wait_max = seconds
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_total_ms': round(self.wait_total * 1000, 3),
+                'wait_avg_ms': round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+                'timeouts': self.timeouts
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    统计取连接等待时间的QueuePool，主库和各只读实例的连接池各自统计
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # 连接池重建（如dispose）后沿用原来的统计
+        pool = super(InstrumentedQueuePool, self).recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout()
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - start)
+
+
+def get_engine_options(uri):
+    """
+    根据config生成SQLAlchemy引擎的连接池配置
+    :param uri: 数据库连接地址
+    :return: SQLALCHEMY_ENGINE_OPTIONS
+    """
+    # sqlite等本地数据库不使用连接池配置
+    if not uri.startswith('mysql'):
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config.DB_POOL_SIZE,
+        'max_overflow': config.DB_MAX_OVERFLOW,
+        'pool_recycle': config.DB_POOL_RECYCLE,
+        'pool_pre_ping': config.DB_POOL_PRE_PING,
+        'pool_timeout': config.DB_POOL_TIMEOUT
+    }
+
+
+def get_pool_status(engine):
+    """
+    获取连接池当前状态
+    :param engine: SQLAlchemy引擎
+    :return: 连接池状态字典
+    """
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow
+        })
+    # 没有统计的连接池（如sqlite）等待时间均为0
+    stats = pool.stats if isinstance(pool, InstrumentedQueuePool) else PoolStats()
+    status.update(stats.snapshot())
+    return status
+
+
+def get_pool_statuses(engines):
+    """
+    分别获取多个引擎的连接池状态
+    :param engines: {名称: SQLAlchemy引擎}，如 {'primary': 主库引擎, 'replica_0': 只读实例引擎}
+    :return: {名称: 连接池状态字典}
+    """
+    return {name: get_pool_status(engine) for name, engine in engines.items()}
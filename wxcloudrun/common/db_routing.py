@@ -0,0 +1,113 @@
+import logging
+import random
+import time
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+
+import config
+
+# 配置日志
+logger = logging.getLogger('travel-cloud')
+
+# 只读请求的HTTP方法
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# 读写一致性token所在的请求/响应头
+CONSISTENCY_HEADER = 'X-DB-Consistency-Token'
+
+
+def get_replica_binds():
+    """
+    根据config生成只读实例的binds配置
+    :return: {bind_key: uri}
+    """
+    binds = {}
+    for index, address in enumerate(config.DB_REPLICA_ADDRESSES):
+        binds['replica_{}'.format(index)] = 'mysql://{}:{}@{}/flask_demo'.format(
+            config.username, config.password, address)
+    return binds
+
+
+class RoutingSession(SignallingSession):
+    """
+    读写分离的Session：只读请求中的查询路由到只读实例，flush和写语句始终走主库
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if self._use_replica(clause):
+            replica_keys = self.app.extensions['db_replicas']
+            return get_state(self.app).db.get_engine(self.app, bind=random.choice(replica_keys))
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+    def _use_replica(self, clause):
+        if not self.app.extensions.get('db_replicas'):
+            return False
+        if self._flushing or not has_request_context() or not g.get('db_use_replica'):
+            return False
+        # 只有SELECT语句走只读实例，写语句和text()原生SQL一律走主库
+        return clause is not None and getattr(clause, 'is_select', False)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    使用RoutingSession的SQLAlchemy
+    """
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written(session, flush_context):
+    # 记录当前请求写过数据库，用于生成读写一致性token
+    if has_request_context():
+        g.db_written = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_executed(orm_execute_state):
+    # session.execute执行的INSERT/UPDATE/DELETE语句不经过flush，同样记录写过数据库
+    if has_request_context() and (orm_execute_state.is_insert or orm_execute_state.is_update or
+                                  orm_execute_state.is_delete):
+        g.db_written = True
+
+
+def _has_valid_token():
+    """
+    请求是否携带未过期的读写一致性token
+    token为写操作后主库固定期的截止时间戳（毫秒），超出最大固定时长的token视为无效
+    """
+    token = request.headers.get(CONSISTENCY_HEADER)
+    if not token:
+        return False
+    try:
+        expire_at = int(token)
+    except ValueError:
+        return False
+    now = int(time.time() * 1000)
+    return now < expire_at <= now + config.DB_REPLICA_PIN_SECONDS * 1000
+
+
+def init_replica_routing(app):
+    """
+    注册读写分离相关的请求钩子
+    :param app: Flask应用实例
+    """
+    app.extensions['db_replicas'] = sorted(get_replica_binds().keys())
+    if not app.extensions['db_replicas']:
+        return
+    logger.info("已启用只读实例: {}".format(len(app.extensions['db_replicas'])))
+
+    @app.before_request
+    def route_reads():
+        # 刚写过数据的用户在固定期内仍然读主库，保证读到自己的写入
+        g.db_use_replica = request.method in READ_ONLY_METHODS and not _has_valid_token()
+
+    @app.after_request
+    def issue_consistency_token(response):
+        if request.method not in READ_ONLY_METHODS and g.get('db_written'):
+            expire_at = int(time.time() * 1000) + config.DB_REPLICA_PIN_SECONDS * 1000
+            response.headers[CONSISTENCY_HEADER] = str(expire_at)
+        return response
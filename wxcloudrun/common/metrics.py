@@ -0,0 +1,215 @@
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 请求耗时直方图的分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class EndpointStats(object):
+    """
+    单个路由的统计数据
+    """
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.status_counts = {}
+        self.sql_count_sum = 0
+        self.sql_count_max = 0
+        self.db_time_sum = 0.0
+
+
+class MetricsRegistry(object):
+    """
+    按路由统计请求耗时、状态码、SQL条数和数据库耗时，按进程统计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def observe(self, endpoint, method, status, latency, sql_count, db_time):
+        key = (endpoint, method)
+        with self._lock:
+            stats = self._endpoints.get(key)
+            if stats is None:
+                stats = self._endpoints[key] = EndpointStats()
+            stats.count += 1
+            stats.latency_sum += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    stats.bucket_counts[index] += 1
+                    break
+            stats.status_counts[status] = stats.status_counts.get(status, 0) + 1
+            stats.sql_count_sum += sql_count
+            stats.sql_count_max = max(stats.sql_count_max, sql_count)
+            stats.db_time_sum += db_time
+
+    def render_prometheus(self):
+        """
+        以Prometheus文本格式输出
+        """
+        with self._lock:
+            items = sorted(self._endpoints.items())
+            lines = [
+                '# HELP http_requests_total Total HTTP requests by route and status.',
+                '# TYPE http_requests_total counter'
+            ]
+            for (endpoint, method), stats in items:
+                for status, count in sorted(stats.status_counts.items()):
+                    lines.append('http_requests_total{%s,status="%s"} %d' % (_labels(endpoint, method), status, count))
+
+            lines.append('# HELP http_request_duration_seconds HTTP request latency by route.')
+            lines.append('# TYPE http_request_duration_seconds histogram')
+            for (endpoint, method), stats in items:
+                labels = _labels(endpoint, method)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, stats.bucket_counts):
+                    cumulative += count
+                    lines.append('http_request_duration_seconds_bucket{%s,le="%s"} %d' % (labels, bound, cumulative))
+                lines.append('http_request_duration_seconds_bucket{%s,le="+Inf"} %d' % (labels, stats.count))
+                lines.append('http_request_duration_seconds_sum{%s} %.6f' % (labels, stats.latency_sum))
+                lines.append('http_request_duration_seconds_count{%s} %d' % (labels, stats.count))
+
+            lines.append('# HELP http_request_sql_statements_total SQL statements executed by route.')
+            lines.append('# TYPE http_request_sql_statements_total counter')
+            for (endpoint, method), stats in items:
+                lines.append('http_request_sql_statements_total{%s} %d' % (_labels(endpoint, method),
+                                                                          stats.sql_count_sum))
+
+            lines.append('# HELP http_request_sql_statements_max Max SQL statements seen in a single request.')
+            lines.append('# TYPE http_request_sql_statements_max gauge')
+            for (endpoint, method), stats in items:
+                lines.append('http_request_sql_statements_max{%s} %d' % (_labels(endpoint, method),
+                                                                        stats.sql_count_max))
+
+            lines.append('# HELP http_request_db_seconds_total Time spent executing SQL by route.')
+            lines.append('# TYPE http_request_db_seconds_total counter')
+            for (endpoint, method), stats in items:
+                lines.append('http_request_db_seconds_total{%s} %.6f' % (_labels(endpoint, method),
+                                                                        stats.db_time_sum))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(endpoint, method):
+    return 'endpoint="%s",method="%s"' % (endpoint.replace('\\', '\\\\').replace('"', '\\"'), method)
+
+
+metrics_registry = MetricsRegistry()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_start' in g:
+        g.sql_count = g.get('sql_count', 0) + 1
+        g.db_time = g.get('db_time', 0.0) + time.perf_counter() - g.pop('sql_start')
+
+
+def init_metrics(app):
+    """
+    注册请求统计的钩子
+    :param app: Flask应用实例
+    """
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.db_time = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' in g:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            metrics_registry.observe(endpoint, request.method, response.status_code,
+                                     time.perf_counter() - g.request_start, g.get('sql_count', 0),
+                                     g.get('db_time', 0.0))
+        return response
+
+
+def render_pool_metrics(pool_statuses):
+    """
+    将各连接池的状态以Prometheus文本格式输出，以pool标签区分主库和各只读实例
+    :param pool_statuses: get_pool_statuses的返回值
+    """
+    metrics = (
+        ('db_pool_checked_out', 'checked_out', 'Connections currently checked out.'),
+        ('db_pool_idle', 'idle', 'Idle connections in the pool.'),
+        ('db_pool_overflow', 'overflow', 'Overflow connections currently open.'),
+        ('db_pool_checkouts_total', 'checkouts', 'Connection checkouts.'),
+        ('db_pool_checkout_timeouts_total', 'timeouts', 'Checkouts that timed out waiting for a connection.'),
+    )
+    lines = []
+    for name, key, help_text in metrics:
+        items = [(pool_name, status[key]) for pool_name, status in sorted(pool_statuses.items()) if key in status]
+        if not items:
+            continue
+        metric_type = 'counter' if name.endswith('_total') else 'gauge'
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        for pool_name, value in items:
+            lines.append('%s{pool="%s"} %d' % (name, pool_name, value))
+    lines.append('# HELP db_pool_checkout_wait_seconds_total Time spent waiting for a connection.')
+    lines.append('# TYPE db_pool_checkout_wait_seconds_total counter')
+    for pool_name, status in sorted(pool_statuses.items()):
+        lines.append('db_pool_checkout_wait_seconds_total{pool="%s"} %.6f'
+                     % (pool_name, status['wait_total_ms'] / 1000))
+    return '\n'.join(lines) + '\n'
+
+
+def render_cache_metrics(cache_stats):
+    """
+    将缓存的统计以Prometheus文本格式输出
+    :param cache_stats: get_cache_stats的返回值
+    """
+    counters = (
+        ('cache_hits_total', 'hits', 'Cache lookups that found a live entry.'),
+        ('cache_misses_total', 'misses', 'Cache lookups that missed or found an expired entry.'),
+        ('cache_errors_total', 'errors', 'Cache operations that failed and were treated as misses.'),
+        ('cache_evictions_total', 'evictions', 'Entries evicted because the cache was full.'),
+        ('cache_entries', 'size', 'Entries currently cached.'),
+    )
+    lines = []
+    for name, key, help_text in counters:
+        items = [(cache_name, stats[key]) for cache_name, stats in sorted(cache_stats.items()) if key in stats]
+        if not items:
+            continue
+        metric_type = 'counter' if name.endswith('_total') else 'gauge'
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        for cache_name, value in items:
+            lines.append('%s{cache="%s"} %d' % (name, cache_name, value))
+    return '\n'.join(lines) + '\n'
+
+
+def render_view_counter_metrics(view_stats):
+    """
+    将浏览次数写回缓冲的统计以Prometheus文本格式输出
+    :param view_stats: view_counter.stats()的返回值
+    """
+    metrics = (
+        ('view_counter_pending_views', 'pending_views', 'gauge', 'Views buffered in memory and not yet written to the database.'),
+        ('view_counter_flushed_views_total', 'flushed_views', 'counter', 'Views written to the database by batched updates.'),
+        ('view_counter_flush_errors_total', 'flush_errors', 'counter', 'Batched view count updates that failed and were retried.'),
+    )
+    lines = []
+    for name, key, metric_type, help_text in metrics:
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        lines.append('%s %d' % (name, view_stats[key]))
+    return '\n'.join(lines) + '\n'
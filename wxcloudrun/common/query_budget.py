@@ -0,0 +1,121 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+# 配置日志
+logger = logging.getLogger('travel-cloud')
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_listening = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    单个请求执行的SQL条数超出预算
+    """
+
+
+def query_budget(max_queries):
+    """
+    声明接口单次请求允许执行的最大SQL条数，放在路由装饰器下方使用
+    :param max_queries: 最大SQL条数
+    """
+
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+
+    return decorator
+
+
+def statement_shape(statement):
+    """
+    归一化SQL语句：合并空白并折叠IN列表，用于识别循环里重复执行的同一条查询
+    :param statement: SQL语句
+    :return: 归一化后的语句
+    """
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    return _IN_LIST.sub('IN (...)', shape)
+
+
+def check_statements(statements, budget, label):
+    """
+    检查一组SQL是否超出预算或存在重复执行的同一条查询
+    :param statements: 执行过的SQL列表
+    :param budget: 最大SQL条数，None表示不限制条数
+    :param label: 日志和异常中显示的名称
+    """
+    repeated = [(shape, count) for shape, count in Counter(map(statement_shape, statements)).most_common(3)
+                if count >= config.QUERY_REPEAT_THRESHOLD]
+    over_budget = budget is not None and len(statements) > budget
+    if not over_budget and not repeated:
+        return
+
+    message = '{} 执行了{}条SQL'.format(label, len(statements))
+    if budget is not None:
+        message += '（预算{}条）'.format(budget)
+    for shape, count in repeated:
+        message += '\n  重复{}次: {}'.format(count, shape)
+
+    if over_budget and config.QUERY_BUDGET_MODE == 'raise':
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def assert_max_queries(max_queries, label='代码块'):
+    """
+    测试中限制一段代码执行的SQL条数，超出时抛出QueryBudgetExceeded
+    :param max_queries: 最大SQL条数
+    :param label: 异常中显示的名称
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    if len(statements) > max_queries:
+        raise QueryBudgetExceeded('{} 执行了{}条SQL（预算{}条）\n  {}'.format(
+            label, len(statements), max_queries, '\n  '.join(map(statement_shape, statements))))
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'budget_statements' in g:
+        g.budget_statements.append(statement)
+
+
+def init_query_budget(app):
+    """
+    注册SQL预算检查的钩子，QUERY_BUDGET_MODE为warn时记录告警，为raise时超出预算的请求直接报错
+    :param app: Flask应用实例
+    """
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _record_statement)
+        _listening = True
+
+    @app.before_request
+    def start_recording():
+        g.budget_statements = []
+
+    @app.after_request
+    def check_budget(response):
+        if 'budget_statements' in g and request.endpoint is not None:
+            view = current_app.view_functions.get(request.endpoint)
+            check_statements(g.budget_statements, getattr(view, 'query_budget', None),
+                             '{} {}'.format(request.method, request.path))
+        return response
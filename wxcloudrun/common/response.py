@@ -1,6 +1,93 @@
 import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
 from flask import Response
 
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 配置日志
+logger = logging.getLogger('travel-cloud')
+
+# 响应中时间和日期的格式
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def _default(obj):
+    '''
+    序列化JSON不支持的类型：时间和日期格式化为字符串，Decimal转为浮点数，其他类型转为字符串
+    '''
+    if isinstance(obj, datetime):
+        return obj.strftime(DATETIME_FORMAT)
+    if isinstance(obj, date):
+        return obj.strftime(DATE_FORMAT)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _orjson_dumps(obj):
+    # 时间类型交给_default处理，保持与json后端相同的输出格式
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+# 可用的JSON编码器，输入为任意对象，输出为UTF-8编码的bytes
+JSON_BACKENDS = {
+    'json': _json_dumps
+}
+if orjson is not None:
+    JSON_BACKENDS['orjson'] = _orjson_dumps
+
+_dumps = _json_dumps
+
+
+def set_json_backend(name):
+    '''
+    切换响应使用的JSON编码器
+    :param name: auto优先使用orjson，未安装时使用标准库json；也可以指定JSON_BACKENDS中的名称
+    :return: 实际使用的编码器名称
+    '''
+    global _dumps
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in JSON_BACKENDS else 'json'
+    if name not in JSON_BACKENDS:
+        logger.warning("JSON编码器{}不可用，使用标准库json".format(name))
+        name = 'json'
+    _dumps = JSON_BACKENDS[name]
+    return name
+
+
+def dumps(obj):
+    '''
+    将对象编码为紧凑的UTF-8 JSON，中文不转义
+    :param obj: 对象，可以包含datetime、date和Decimal
+    :return: bytes
+    '''
+    return _dumps(obj)
+
+
+def make_json_response(data, status=200):
+    '''
+    直接返回JSON数据，用于返回结构不是code/data的接口
+    :param data: 数据
+    :param status: HTTP状态码
+    :return:
+    '''
+    return Response(_dumps(data), status=status, mimetype='application/json')
+
 
 def make_succ_empty_response():
     '''
@@ -11,7 +98,7 @@ def make_succ_empty_response():
         "code": 0,
         "data": {}
     }
-    return Response(json.dumps(data), mimetype='application/json')
+    return make_json_response(data)
 
 
 def make_succ_response(data):
@@ -24,7 +111,7 @@ def make_succ_response(data):
         "code": 0,
         "data": data
     }
-    return Response(json.dumps(res, ensure_ascii=False, default=str), mimetype='application/json')
+    return make_json_response(res)
 
 
 def make_err_response(err_msg):
@@ -37,4 +124,7 @@ def make_err_response(err_msg):
         "code": -1,
         "errorMsg": err_msg
     }
-    return Response(json.dumps(res, ensure_ascii=False), mimetype='application/json') 
\ No newline at end of file
+    return make_json_response(res)
+
+
+set_json_backend(config.JSON_BACKEND)
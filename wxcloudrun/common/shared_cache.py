@@ -0,0 +1,304 @@
+import json
+import logging
+import queue
+import socket
+import threading
+from urllib.parse import unquote, urlparse
+
+import config
+from wxcloudrun.common.cache import TTLCache, caches
+from wxcloudrun.common.response import dumps
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 配置日志
+logger = logging.getLogger('travel-cloud')
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class RedisError(Exception):
+    """
+    Redis返回的错误
+    """
+
+
+class MemoryBackend(object):
+    """
+    进程内存储，用于本地开发和测试；多个worker之间不共享
+    """
+
+    def __init__(self, maxsize=10000):
+        self._cache = TTLCache(None, maxsize, 0)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def get_many(self, keys):
+        return [self._cache.get(key) for key in keys]
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._cache.delete(key)
+
+
+class RedisBackend(object):
+    """
+    基于RESP协议的Redis客户端，只实现缓存需要的GET/MGET/SET EX/DEL命令
+    连接按需创建，用完放回连接池；连接出错时丢弃该连接
+    """
+
+    def __init__(self, host, port=6379, db=0, password=None, timeout=0.2, pool_size=16):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = (sock, sock.makefile('rb'))
+        try:
+            if self.password:
+                self._send(connection, 'AUTH', self.password)
+            if self.db:
+                self._send(connection, 'SELECT', self.db)
+        except Exception:
+            self._close(connection)
+            raise
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        sock, reader = connection
+        try:
+            reader.close()
+            sock.close()
+        except OSError:
+            pass
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Redis连接已断开')
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b'+':
+            return body
+        if prefix == b'-':
+            raise RedisError(body.decode('utf-8', 'replace'))
+        if prefix == b':':
+            return int(body)
+        if prefix == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError('Redis连接已断开')
+            return data[:-2]
+        if prefix == b'*':
+            length = int(body)
+            if length < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(length)]
+        raise ConnectionError('无法解析的Redis响应: {!r}'.format(line))
+
+    def _send(self, connection, *args):
+        sock, reader = connection
+        sock.sendall(self._encode(args))
+        return self._read_reply(reader)
+
+    def execute(self, *args):
+        """
+        执行一条命令
+        :return: Redis的响应
+        """
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            reply = self._send(connection, *args)
+        except RedisError:
+            self._release(connection)
+            raise
+        except Exception:
+            self._close(connection)
+            raise
+        self._release(connection)
+        return reply
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            self._close(connection)
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def get_many(self, keys):
+        return self.execute('MGET', *keys) if keys else []
+
+    def set(self, key, value, ttl):
+        self.execute('SET', key, value, 'EX', int(ttl))
+
+    def delete(self, *keys):
+        if keys:
+            self.execute('DEL', *keys)
+
+
+def create_backend(url):
+    """
+    根据地址创建缓存存储
+    :param url: memory:// 为进程内存储；redis://[:password@]host[:port][/db] 为Redis；空字符串为关闭缓存
+    :return: 缓存存储，关闭时返回None
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'memory':
+        return MemoryBackend()
+    if parsed.scheme == 'redis':
+        return RedisBackend(parsed.hostname or '127.0.0.1', parsed.port or 6379,
+                            db=int(parsed.path.lstrip('/') or 0),
+                            password=unquote(parsed.password) if parsed.password else None,
+                            timeout=config.SHARED_CACHE_TIMEOUT)
+    raise ValueError('不支持的缓存地址: {}'.format(url))
+
+
+class CacheNamespace(object):
+    """
+    共享缓存中的一类数据，如向导详情；值以JSON保存，缓存不可用时按未命中处理，不影响接口
+    """
+
+    def __init__(self, cache, name, ttl):
+        self._cache = cache
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        caches['shared_' + name] = self
+
+    def _key(self, key):
+        return '{}{}:{}'.format(config.SHARED_CACHE_PREFIX, self.name, key)
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def get(self, key):
+        """
+        获取缓存的数据，不存在、缓存关闭或出错时返回None
+        """
+        backend = self._cache.backend
+        if backend is None:
+            return None
+        try:
+            data = backend.get(self._key(key))
+        except Exception as e:
+            self._count('errors')
+            logger.warning("读取缓存{}失败: {}".format(self._key(key), e))
+            return None
+        if data is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return _loads(data)
+
+    def get_many(self, keys):
+        """
+        一次获取多个缓存的数据，Redis中为一条MGET
+        :return: {key: 数据}，只包含命中的key
+        """
+        backend = self._cache.backend
+        keys = list(keys)
+        if backend is None or not keys:
+            return {}
+        try:
+            values = backend.get_many([self._key(key) for key in keys])
+        except Exception as e:
+            self._count('errors')
+            logger.warning("批量读取缓存{}失败: {}".format(self.name, e))
+            return {}
+        found = {key: _loads(data) for key, data in zip(keys, values) if data is not None}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key, value):
+        backend = self._cache.backend
+        if backend is None:
+            return
+        try:
+            backend.set(self._key(key), dumps(value), self.ttl)
+        except Exception as e:
+            self._count('errors')
+            logger.warning("写入缓存{}失败: {}".format(self._key(key), e))
+
+    def delete(self, *keys):
+        """
+        数据变更后删除缓存
+        """
+        backend = self._cache.backend
+        if backend is None or not keys:
+            return
+        try:
+            backend.delete(*[self._key(key) for key in keys])
+        except Exception as e:
+            self._count('errors')
+            logger.error("删除缓存失败，数据最多在{}秒后更新: {} {}".format(self.ttl, [self._key(k) for k in keys], e))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'ttl': self.ttl,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+class SharedCache(object):
+    """
+    多个容器共享的缓存，用于缓存详情接口的数据
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def namespace(self, name, ttl=None):
+        """
+        :param name: 数据类型名称，作为key的前缀
+        :param ttl: 过期时间（秒），不传时使用SHARED_CACHE_TTLS中的配置
+        """
+        if ttl is None:
+            ttl = config.SHARED_CACHE_TTLS.get(name, config.SHARED_CACHE_DEFAULT_TTL)
+        return CacheNamespace(self, name, ttl)
+
+
+shared_cache = SharedCache(create_backend(config.SHARED_CACHE_URL))
@@ -0,0 +1,157 @@
+import threading
+import time
+
+import config
+from wxcloudrun.common.cache import caches
+
+
+def bits_from_ids(ids):
+    """
+    由ID生成位图，先写入字节数组再一次转换成整数，避免逐位修改大整数
+    :param ids: 非负整数ID
+    :return: 以Python整数表示的位图
+    """
+    if not ids:
+        return 0
+    buf = bytearray(max(ids) // 8 + 1)
+    for item_id in ids:
+        buf[item_id >> 3] |= 1 << (item_id & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def bit_positions(bits):
+    """
+    位图中为1的位，即其中的ID
+    :param bits: 以Python整数表示的位图，第i位为1表示包含ID i
+    :return: 升序的ID列表
+    """
+    if not bits:
+        return []
+    # 转成低位在前的二进制字符串后用find逐个查找，扫描在C中完成
+    digits = bin(bits)[:1:-1]
+    positions = []
+    position = digits.find('1')
+    while position >= 0:
+        positions.append(position)
+        position = digits.find('1', position + 1)
+    return positions
+
+
+class CompanionTagIndex(object):
+    """
+    向导到标签的进程内索引：一次扫描CompanionTagRelations和CompanionTags建立，超过ttl秒或调用invalidate后在下次使用时重建
+    标签很少变化，列表和详情接口不再为每个向导查询一次标签；每个标签另有一个向导ID位图，多标签筛选用位运算求交集或并集，
+    另有活跃向导的位图，用于统计列表筛选项中各标签的向导数
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (标签ID到名称, 向导ID到标签ID元组, 标签ID到向导ID位图, 活跃向导位图)，重建时整体替换，读取时不需要加锁
+        self._state = ({}, {}, {}, 0)
+        self._expire_at = 0
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        caches['companion_tags'] = self
+
+    def invalidate(self):
+        """
+        标签或向导标签关系变更后调用，本进程下次使用时重建，其他进程最多在ttl秒后重建
+        """
+        self._expire_at = 0
+
+    def _load(self):
+        from wxcloudrun import db
+        from wxcloudrun.model import Companion, CompanionTag, CompanionTagRelation
+        tags = {tag_id: name for tag_id, name in db.session.query(CompanionTag.id, CompanionTag.name)}
+        by_companion = {}
+        by_tag = {}
+        for companion_id, tag_id in db.session.query(CompanionTagRelation.companion_id, CompanionTagRelation.tag_id) \
+                .order_by(CompanionTagRelation.companion_id, CompanionTagRelation.tag_id):
+            if tag_id in tags:
+                by_companion.setdefault(companion_id, []).append(tag_id)
+                by_tag.setdefault(tag_id, []).append(companion_id)
+        active = [companion_id for companion_id, in db.session.query(Companion.id).filter(Companion.status == 1)]
+        return (tags, {companion_id: tuple(tag_ids) for companion_id, tag_ids in by_companion.items()},
+                {tag_id: bits_from_ids(companion_ids) for tag_id, companion_ids in by_tag.items()},
+                bits_from_ids(active))
+
+    def _ensure_fresh(self):
+        if time.monotonic() < self._expire_at:
+            self.hits += 1
+            return
+        with self._lock:
+            # 等锁期间其他线程可能已经重建
+            if time.monotonic() < self._expire_at:
+                self.hits += 1
+                return
+            self.misses += 1
+            self._state = self._load()
+            self.version += 1
+            self._expire_at = time.monotonic() + self.ttl
+
+    def tags_of(self, companion_id):
+        """
+        :param companion_id: 向导ID
+        :return: 标签列表 [{'id': 标签ID, 'name': 标签名称}]
+        """
+        self._ensure_fresh()
+        tags, by_companion = self._state[:2]
+        return [{'id': tag_id, 'name': tags[tag_id]} for tag_id in by_companion.get(companion_id, ())]
+
+    def tag_bits(self, tag_ids, match_all=True):
+        """
+        有指定标签的向导位图
+        :param tag_ids: 标签ID列表
+        :param match_all: True为同时有所有标签，False为有任一标签
+        :return: 以Python整数表示的位图，包含非活跃的向导
+        """
+        self._ensure_fresh()
+        by_tag = self._state[2]
+        bits = None
+        for tag_id in set(tag_ids):
+            tag_bits = by_tag.get(tag_id, 0)
+            if bits is None:
+                bits = tag_bits
+            elif match_all:
+                bits &= tag_bits
+            else:
+                bits |= tag_bits
+        return bits or 0
+
+    def active_bits(self):
+        """
+        :return: 活跃向导的位图，向导状态变更后其他进程最多在ttl秒后更新
+        """
+        self._ensure_fresh()
+        return self._state[3]
+
+    def count_tags(self, bits):
+        """
+        统计一组向导中各标签的向导数，用于筛选项的计数
+        :param bits: 向导ID位图
+        :return: 按向导数降序的标签列表 [{'id': 标签ID, 'name': 标签名称, 'count': 向导数}]，不含数量为0的标签
+        """
+        self._ensure_fresh()
+        tags, _, by_tag = self._state[:3]
+        counts = []
+        for tag_id, tag_bits in by_tag.items():
+            # 部署环境为Python 3.8，没有int.bit_count
+            count = bin(bits & tag_bits).count('1')
+            if count:
+                counts.append({'id': tag_id, 'name': tags[tag_id], 'count': count})
+        counts.sort(key=lambda item: (-item['count'], item['id']))
+        return counts
+
+    def stats(self):
+        return {
+            'size': len(self._state[1]),
+            'ttl': self.ttl,
+            'version': self.version,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+companion_tag_index = CompanionTagIndex(config.COMPANION_TAG_INDEX_TTL)
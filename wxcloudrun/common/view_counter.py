@@ -0,0 +1,159 @@
+import atexit
+import logging
+import os
+import threading
+import uuid
+
+from sqlalchemy import case
+
+import config
+
+# 配置日志
+logger = logging.getLogger('travel-cloud')
+
+# 单条UPDATE语句最多更新的ID数
+FLUSH_CHUNK_SIZE = 500
+
+
+class ViewCounter(object):
+    """
+    浏览次数的写回缓冲：请求中只在内存里累计增量，后台定时将增量合并为
+    UPDATE ... SET view_count = view_count + CASE id WHEN ... END WHERE id IN (...) 写回数据库，进程退出时也会写回
+    展示的浏览次数为数据库中的值加上本进程尚未写回的增量
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._listeners = {}
+        self._app = None
+        self._worker_pid = None
+        self._stop = threading.Event()
+        # 各模型浏览次数的版本号，每次计数和写回后加一；进程标识在fork后的worker中重新生成
+        self._generations = {}
+        self._token = (None, None)
+        self.flushed_views = 0
+        self.flush_errors = 0
+
+    def init_app(self, app):
+        """
+        绑定Flask应用，写回数据库时需要应用上下文
+        :param app: Flask应用实例
+        """
+        self._app = app
+        atexit.register(self.flush)
+
+    def on_flush(self, model, listener):
+        """
+        注册写回后的回调，如删除对应的详情缓存
+        :param model: 模型类，需要有id和view_count字段
+        :param listener: 回调函数，参数为写回的ID列表
+        """
+        self._listeners.setdefault(model, []).append(listener)
+
+    def incr(self, model, item_id, count=1):
+        """
+        累计一次浏览
+        :param model: 模型类，需要有id和view_count字段
+        :param item_id: 数据ID
+        """
+        self._ensure_worker()
+        with self._lock:
+            key = (model, item_id)
+            self._pending[key] = self._pending.get(key, 0) + count
+            self._generations[model] = self._generations.get(model, 0) + 1
+        if config.VIEW_COUNTER_FLUSH_INTERVAL <= 0:
+            self.flush()
+
+    def pending(self, model, item_id):
+        """
+        本进程尚未写回的浏览次数
+        """
+        with self._lock:
+            return self._pending.get((model, item_id), 0)
+
+    def generation(self, model):
+        """
+        本进程中该模型浏览次数的版本，计数和写回后都会变化，用于计算包含浏览次数的列表的ETag
+        各进程尚未写回的增量不同，版本中带有随机生成的进程标识，不同进程的版本不会相同
+        :return: (进程标识, 版本号)
+        """
+        pid = os.getpid()
+        with self._lock:
+            if self._token[0] != pid:
+                self._token = (pid, uuid.uuid4().hex)
+            return self._token[1], self._generations.get(model, 0)
+
+    def flush(self):
+        """
+        将累计的增量写回数据库，每个模型每批ID一条UPDATE；写回失败时增量放回缓冲区，下次重试
+        :return: 写回的浏览次数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending or self._app is None:
+            return 0
+
+        by_model = {}
+        for (model, item_id), count in pending.items():
+            by_model.setdefault(model, {})[item_id] = count
+
+        from wxcloudrun import db
+        flushed = 0
+        with self._app.app_context():
+            for model, counts in by_model.items():
+                item_ids = sorted(counts)
+                for start in range(0, len(item_ids), FLUSH_CHUNK_SIZE):
+                    chunk = {item_id: counts[item_id] for item_id in item_ids[start:start + FLUSH_CHUNK_SIZE]}
+                    try:
+                        with db.engine.begin() as connection:
+                            connection.execute(model.__table__.update().where(model.id.in_(list(chunk))).values(
+                                view_count=model.view_count + case(chunk, value=model.id, else_=0)))
+                    except Exception as e:
+                        self._restore(model, chunk)
+                        self.flush_errors += 1
+                        logger.error("写回浏览次数失败，将在下次重试: {} {}".format(model.__tablename__, e))
+                        continue
+                    flushed += sum(chunk.values())
+                    with self._lock:
+                        self._generations[model] = self._generations.get(model, 0) + 1
+                    for listener in self._listeners.get(model, []):
+                        listener(list(chunk))
+        self.flushed_views += flushed
+        return flushed
+
+    def _restore(self, model, counts):
+        with self._lock:
+            for item_id, count in counts.items():
+                key = (model, item_id)
+                self._pending[key] = self._pending.get(key, 0) + count
+
+    def _ensure_worker(self):
+        # 后台线程在第一次计数时启动，gunicorn fork出的每个worker进程各自启动一个
+        if self._worker_pid == os.getpid() or config.VIEW_COUNTER_FLUSH_INTERVAL <= 0:
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+        thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+        thread.start()
+
+    def _run(self):
+        while not self._stop.wait(config.VIEW_COUNTER_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("写回浏览次数失败: {}".format(e))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending_items': len(self._pending),
+                'pending_views': sum(self._pending.values()),
+                'flushed_views': self.flushed_views,
+                'flush_errors': self.flush_errors
+            }
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,110 @@
+import logging
+
+from sqlalchemy import bindparam, func, or_
+
+from wxcloudrun import db
+from wxcloudrun.model import Companion, CompanionReservation, CompanionReview
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+# 已取消的预约不占用档期
+RESERVATION_CANCELLED = 3
+
+
+def add_companion_rating(companion_id, rating):
+    """
+    在数据库中原子地累加向导的评分之和与评价数，并据此更新平均评分，不需要读取该向导的所有评价
+    需要在插入评价之前调用：先锁向导行再插入评价，与外键检查的加锁顺序一致，同一向导的并发评价不会死锁
+    :param companion_id: 向导ID
+    :param rating: 新评价的评分
+    :return: 更新的行数，向导不存在时为0
+    """
+    table = Companion.__table__
+    # MySQL按顺序计算SET中的赋值，平均评分放在最前面，使用的是累加前的评分之和与评价数
+    stmt = table.update().where(table.c.id == companion_id).ordered_values(
+        (table.c.rating, (table.c.rating_sum + rating) / (table.c.review_count + 1)),
+        (table.c.rating_sum, table.c.rating_sum + rating),
+        (table.c.review_count, table.c.review_count + 1),
+    )
+    return db.session.execute(stmt).rowcount
+
+
+def reconcile_companion_ratings():
+    """
+    按评价表重新计算所有向导的评分之和、评价数和平均评分，修正累加值与评价表不一致的向导
+    只执行一条GROUP BY查询，不一致的向导批量更新
+    :return: 修正的向导数
+    """
+    stats = db.session.query(
+        CompanionReview.companion_id.label('companion_id'),
+        func.sum(CompanionReview.rating).label('rating_sum'),
+        func.count(CompanionReview.id).label('review_count')
+    ).group_by(CompanionReview.companion_id).subquery()
+    rating_sum = func.coalesce(stats.c.rating_sum, 0)
+    review_count = func.coalesce(stats.c.review_count, 0)
+    rows = db.session.query(Companion.id, rating_sum, review_count) \
+        .outerjoin(stats, stats.c.companion_id == Companion.id) \
+        .filter(or_(Companion.rating_sum != rating_sum, Companion.review_count != review_count,
+                    Companion.review_count.is_(None))).all()
+    if not rows:
+        return 0
+
+    # 没有评价的向导保留原来的评分
+    table = Companion.__table__
+    reviewed = [{'companion_id': row[0], 'new_sum': row[1], 'new_count': row[2],
+                 'new_rating': round(row[1] / row[2], 2)} for row in rows if row[2]]
+    unreviewed = [{'companion_id': row[0]} for row in rows if not row[2]]
+    if reviewed:
+        db.session.execute(table.update().where(table.c.id == bindparam('companion_id')).values(
+            rating=bindparam('new_rating'), rating_sum=bindparam('new_sum'), review_count=bindparam('new_count')),
+            reviewed)
+    if unreviewed:
+        db.session.execute(table.update().where(table.c.id == bindparam('companion_id')).values(
+            rating_sum=0, review_count=0), unreviewed)
+    db.session.commit()
+    logger.info("reconcile_companion_ratings 修正向导评分 {} 个".format(len(rows)))
+    return len(rows)
+
+
+def _active_reservations(companion_id):
+    return db.session.query(CompanionReservation.id, CompanionReservation.start_date,
+                            CompanionReservation.end_date).filter(
+        CompanionReservation.companion_id == companion_id,
+        CompanionReservation.status != RESERVATION_CANCELLED
+    )
+
+
+def lock_companion(companion_id):
+    """
+    锁定向导行（SELECT ... FOR UPDATE）直到事务结束，同一向导的预约依次检查冲突和插入，不会重复预约
+    :param companion_id: 向导ID
+    :return: 向导实体，不存在时为None
+    """
+    return Companion.query.filter(Companion.id == companion_id).with_for_update().first()
+
+
+def find_conflicting_reservation(companion_id, start_date, end_date):
+    """
+    查找与 [start_date, end_date] 重叠的未取消预约
+    沿 (companion_id, end_date, start_date, status) 索引从 end_date >= start_date 开始做范围扫描，只访问在新预约开始之后结束的预约，
+    不会扫描该向导已经结束的历史预约，开始日期和状态条件在索引中判断；旧数据中已有的互相重叠的预约也能查到
+    需要先调用lock_companion，保证检查和插入之间没有其他预约插入
+    :return: 冲突的预约 (id, start_date, end_date)，没有冲突时为None
+    """
+    return _active_reservations(companion_id).filter(
+        CompanionReservation.end_date >= start_date,
+        CompanionReservation.start_date <= end_date
+    ).order_by(CompanionReservation.end_date).first()
+
+
+def get_booked_intervals(companion_id, first_day, last_day):
+    """
+    与 [first_day, last_day] 重叠的未取消预约的日期区间，包括之前开始、跨入该范围的预约
+    与冲突检查一样沿 (companion_id, end_date, start_date, status) 索引从 end_date >= first_day 开始扫描
+    :return: 按开始日期排序的 (id, start_date, end_date) 列表
+    """
+    return _active_reservations(companion_id).filter(
+        CompanionReservation.end_date >= first_day,
+        CompanionReservation.start_date <= last_day
+    ).order_by(CompanionReservation.start_date, CompanionReservation.id).all()
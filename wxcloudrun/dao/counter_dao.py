@@ -1,12 +1,28 @@
 import logging
+import random
+
+from sqlalchemy import func
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.exc import OperationalError
 
+import config
 from wxcloudrun import db
+from wxcloudrun.common.cache import TTLCache
 from wxcloudrun.models.counter import Counters
 
 # 初始化日志
 logger = logging.getLogger('log')
 
+# 分片计数合计值的进程内缓存，key为计数ID
+counter_cache = TTLCache('counter', 16, config.COUNTER_CACHE_TTL)
+
+# 支持单条语句插入或更新的方言
+UPSERT_DIALECTS = {
+    'mysql': mysql.insert,
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
 
 def query_counterbyid(id):
     """
@@ -60,4 +76,64 @@ def update_counterbyid(counter):
         db.session.flush()
         db.session.commit()
     except OperationalError as e:
-        logger.info("update_counterbyid errorMsg= {} ".format(e)) 
\ No newline at end of file
+        logger.info("update_counterbyid errorMsg= {} ".format(e)) 
+
+
+def _shard_range(id):
+    # 计数ID为id的分片是Counters表中ID为 (id-1)*分片数+1 到 id*分片数 的行，计数1的第一个分片即原来的ID为1的行
+    shards = config.COUNTER_SHARDS
+    return (id - 1) * shards + 1, id * shards
+
+
+def increment_counter(id):
+    """
+    随机选择一个分片，在数据库中原子地加一，分片不存在时插入
+    并发的自增分散在多个行上，不会都在同一行的行锁上排队
+    :param id: 计数ID
+    """
+    first, last = _shard_range(id)
+    shard_id = random.randint(first, last)
+    table = Counters.__table__
+    insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+    if insert is None:
+        updated = db.session.execute(table.update().where(table.c.id == shard_id).values(
+            count=table.c['count'] + 1, updatedAt=func.now())).rowcount
+        if not updated:
+            db.session.execute(table.insert().values(id=shard_id, count=1, createdAt=func.now(), updatedAt=func.now()))
+    else:
+        stmt = insert(table).values(id=shard_id, count=1, createdAt=func.now(), updatedAt=func.now())
+        if db.engine.dialect.name == 'mysql':
+            stmt = stmt.on_duplicate_key_update(count=table.c['count'] + 1, updatedAt=func.now())
+        else:
+            stmt = stmt.on_conflict_do_update(index_elements=['id'],
+                                              set_={'count': table.c['count'] + 1, 'updatedAt': func.now()})
+        db.session.execute(stmt)
+    db.session.commit()
+    counter_cache.delete(id)
+
+
+def get_counter_sum(id):
+    """
+    各分片之和，结果在本进程内缓存COUNTER_CACHE_TTL秒
+    :param id: 计数ID
+    :return: 计数的值，没有任何分片时为0
+    """
+    total = counter_cache.get(id)
+    if total is None:
+        first, last = _shard_range(id)
+        total = db.session.query(func.coalesce(func.sum(Counters.count), 0)) \
+            .filter(Counters.id.between(first, last)).scalar()
+        total = int(total)
+        counter_cache.set(id, total)
+    return total
+
+
+def clear_counter(id):
+    """
+    删除计数的所有分片
+    :param id: 计数ID
+    """
+    first, last = _shard_range(id)
+    db.session.query(Counters).filter(Counters.id.between(first, last)).delete(synchronize_session=False)
+    db.session.commit()
+    counter_cache.delete(id)
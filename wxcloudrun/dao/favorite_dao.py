@@ -1,12 +1,21 @@
 import logging
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import load_only
 
 from wxcloudrun import db
+from wxcloudrun.models.attraction import Attraction
 from wxcloudrun.models.favorite import Favorite
+from wxcloudrun.models.travel_guide import TravelGuide
 
 # 初始化日志
 logger = logging.getLogger('log')
 
+# 收藏类型对应的模型，以及收藏列表展示需要的字段
+FAVORITE_ITEM_MODELS = {
+    'attraction': (Attraction, ('id', 'name', 'cover_image', 'description', 'address', 'category')),
+    'guide': (TravelGuide, ('id', 'title', 'cover_image', 'description', 'author')),
+}
+
 
 def add_favorite(favorite):
     """
@@ -59,4 +68,28 @@ def get_user_favorites(user_id, item_type=None):
         return query.order_by(Favorite.created_at.desc()).all()
     except OperationalError as e:
         logger.info("get_user_favorites errorMsg= {} ".format(e))
-        return [] 
\ No newline at end of file
+        return [] 
+
+
+def get_favorite_items(favorites):
+    """
+    批量查询收藏对应的景点和旅游指南，每种类型一条IN查询，只读取列表需要的字段，不修改数据
+    :param favorites: 收藏列表
+    :return: {(收藏类型, 项目ID): 实体}，已被删除的项目不在其中
+    """
+    item_ids = {}
+    for fav in favorites:
+        if fav.type in FAVORITE_ITEM_MODELS:
+            item_ids.setdefault(fav.type, set()).add(fav.item_id)
+
+    items = {}
+    for item_type, ids in item_ids.items():
+        model, columns = FAVORITE_ITEM_MODELS[item_type]
+        try:
+            rows = model.query.options(load_only(*columns)).filter(model.id.in_(ids)).all()
+        except OperationalError as e:
+            logger.info("get_favorite_items errorMsg= {} ".format(e))
+            continue
+        for item in rows:
+            items[(item_type, item.id)] = item
+    return items
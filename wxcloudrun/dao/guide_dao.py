@@ -30,12 +30,7 @@ def get_travel_guide_by_id(guide_id):
     :return: 旅游指南实体
     """
     try:
-        guide = TravelGuide.query.get(guide_id)
-        if guide:
-            # 更新浏览次数
-            guide.view_count += 1
-            db.session.commit()
-        return guide
+        return TravelGuide.query.get(guide_id)
     except OperationalError as e:
         logger.info("get_travel_guide_by_id errorMsg= {} ".format(e))
         return None
@@ -1,24 +1,48 @@
 import logging
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import make_transient_to_detached
 
+import config
 from wxcloudrun import db
+from wxcloudrun.common.cache import TTLCache
 from wxcloudrun.models.user import User
 
 # 初始化日志
 logger = logging.getLogger('log')
 
+# openid到用户字段的进程内缓存，几乎每个需要登录的请求都会查询用户
+user_cache = TTLCache('user', config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+
+
+def _snapshot(user):
+    # 只缓存字段值，不缓存绑定在某个Session上的实体
+    return {attr.key: getattr(user, attr.key) for attr in User.__mapper__.column_attrs}
+
+
+def _attach(values):
+    # 由缓存的字段值构造实体并加入当前Session，不查询数据库，调用方修改后仍可通过update_user保存
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
 
 def get_user_by_openid(openid):
     """
-    根据微信openid获取用户信息
+    根据微信openid获取用户信息，优先读取进程内缓存
     :param openid: 微信用户唯一标识
     :return: 用户实体
     """
+    values = user_cache.get(openid)
+    if values is not None:
+        return _attach(values)
     try:
-        return User.query.filter(User.openid == openid).first()
+        user = User.query.filter(User.openid == openid).first()
     except OperationalError as e:
         logger.info("get_user_by_openid errorMsg= {} ".format(e))
         return None
+    if user is not None:
+        user_cache.set(openid, _snapshot(user))
+    return user
 
 
 def create_user(user):
@@ -27,9 +51,11 @@ def create_user(user):
     :param user: 用户实体
     :return: 创建的用户ID
     """
+    openid = user.openid
     try:
         db.session.add(user)
         db.session.commit()
+        user_cache.delete(openid)
         return user.id
     except OperationalError as e:
         logger.info("create_user errorMsg= {} ".format(e))
@@ -42,8 +68,10 @@ def update_user(user):
     更新用户信息
     :param user: 用户实体
     """
+    openid = user.openid
     try:
         db.session.commit()
+        user_cache.delete(openid)
     except OperationalError as e:
         logger.info("update_user errorMsg= {} ".format(e))
-        db.session.rollback() 
\ No newline at end of file
+        db.session.rollback()
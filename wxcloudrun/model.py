@@ -14,7 +14,7 @@ class Counters(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     count = db.Column(db.Integer, default=1)
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 用户信息表
@@ -29,7 +29,7 @@ class User(db.Model):
     gender = db.Column(db.Integer, default=0, comment='性别，0未知，1男，2女')
     phone = db.Column(db.String(20), comment='手机号码')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 旅游指南表
@@ -46,7 +46,7 @@ class TravelGuide(db.Model):
     view_count = db.Column(db.Integer, default=0, comment='浏览次数')
     like_count = db.Column(db.Integer, default=0, comment='点赞数')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 景点表
@@ -66,7 +66,7 @@ class Attraction(db.Model):
     tips = db.Column(db.Text, comment='游玩提示')
     category = db.Column(db.String(50), comment='景点类别')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 收藏表
@@ -93,7 +93,7 @@ class TravelPlan(db.Model):
     end_date = db.Column(db.Date, comment='结束日期')
     description = db.Column(db.Text, comment='行程描述')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 行程项目表
@@ -108,7 +108,7 @@ class TravelPlanItem(db.Model):
     time_period = db.Column(db.String(50), comment='时间段，如"上午"、"下午"等')
     note = db.Column(db.Text, comment='备注')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 资讯/动态表
@@ -125,7 +125,7 @@ class News(db.Model):
     like_count = db.Column(db.Integer, default=0, comment='点赞数')
     comment_count = db.Column(db.Integer, default=0, comment='评论数')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 资讯点赞表
@@ -184,10 +184,11 @@ class Companion(db.Model):
     experience_years = db.Column(db.Integer, default=0, comment='经验年数')
     languages = db.Column(db.String(255), comment='语言能力')
     rating = db.Column(db.DECIMAL(3, 2), default=5.00, comment='评分')
+    rating_sum = db.Column(db.DECIMAL(12, 2), nullable=False, default=0, comment='评分之和')
     review_count = db.Column(db.Integer, default=0, comment='评价数量')
     status = db.Column(db.SmallInteger, default=1, comment='状态：1活跃，0非活跃')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 向导标签关系表
@@ -202,7 +203,6 @@ class CompanionTagRelation(db.Model):
 # 向导预约表
 class CompanionReservation(db.Model):
     __tablename__ = 'CompanionReservations'
-    __table_args__ = {'extend_existing': True}
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     companion_id = db.Column(db.Integer, db.ForeignKey('Companions.id', ondelete='CASCADE'), nullable=False)
@@ -213,7 +213,13 @@ class CompanionReservation(db.Model):
     special_needs = db.Column(db.Text, comment='特殊需求')
     status = db.Column(db.SmallInteger, default=0, comment='状态：0待确认，1已确认，2已完成，3已取消')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
+    
+    # 按向导和结束日期查找尚未结束的预约，用于检查时间冲突和查询档期；开始日期和状态也在索引中，不需要回表过滤
+    __table_args__ = (
+        db.Index('idx_reservation_companion_dates', 'companion_id', 'end_date', 'start_date', 'status'),
+        {'extend_existing': True}
+    )
 
 
 # 向导评价表
@@ -264,7 +270,7 @@ class Solution(db.Model):
     view_count = db.Column(db.Integer, default=0, comment='浏览次数')
     apply_count = db.Column(db.Integer, default=0, comment='应用次数')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 解决方案应用表
@@ -293,7 +299,7 @@ class Feedback(db.Model):
     images = db.Column(db.Text, comment='图片URLs，逗号分隔')
     status = db.Column(db.SmallInteger, default=0, comment='状态：0未处理，1处理中，2已处理')
     created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now())
+    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
 
 
 # 关于我们信息表
@@ -306,4 +312,4 @@ class AboutInfo(db.Model):
     content = db.Column(db.Text, nullable=False, comment='内容')
     type = db.Column(db.String(50), nullable=False, comment='类型：company, contact, agreement, privacy等')
     created_at = db.Column(db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column(db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now())
+    updated_at = db.Column(db.TIMESTAMP, nullable=False, default=datetime.now(), onupdate=datetime.now)
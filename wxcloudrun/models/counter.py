@@ -1,13 +1,2 @@
-from datetime import datetime
-from wxcloudrun import db
-
-# 计数表
-class Counters(db.Model):
-    # 设置结构体表格名称
-    __tablename__ = 'Counters'
-
-    # 设定结构体对应表格的字段
-    id = db.Column(db.Integer, primary_key=True)
-    count = db.Column(db.Integer, default=1)
-    created_at = db.Column('createdAt', db.TIMESTAMP, nullable=False, default=datetime.now())
-    updated_at = db.Column('updatedAt', db.TIMESTAMP, nullable=False, default=datetime.now()) 
\ No newline at end of file
+# 模型统一定义在wxcloudrun.model中，这里只做转发，避免同一张表被映射两次
+from wxcloudrun.model import Counters
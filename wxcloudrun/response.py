@@ -1,18 +1,2 @@
-import json
-
-from flask import Response
-
-
-def make_succ_empty_response():
-    data = json.dumps({'code': 0, 'data': {}})
-    return Response(data, mimetype='application/json')
-
-
-def make_succ_response(data):
-    data = json.dumps({'code': 0, 'data': data})
-    return Response(data, mimetype='application/json')
-
-
-def make_err_response(err_msg):
-    data = json.dumps({'code': -1, 'errorMsg': err_msg})
-    return Response(data, mimetype='application/json')
+# 响应构造统一在wxcloudrun.common.response中实现，这里保留旧的导入路径
+from wxcloudrun.common.response import make_err_response, make_succ_empty_response, make_succ_response
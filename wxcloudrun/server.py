@@ -0,0 +1,80 @@
+import logging
+
+import config
+
+# 配置日志
+logger = logging.getLogger('travel-cloud')
+
+
+def get_server_options(host, port):
+    """
+    根据config生成gunicorn的配置项
+    :param host: 监听地址
+    :param port: 监听端口
+    :return: gunicorn配置字典
+    """
+    worker_class = config.SERVER_WORKER_CLASS
+    if worker_class == 'gevent':
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            logger.warning("未安装gevent，worker类型回退为gthread")
+            worker_class = 'gthread'
+
+    options = {
+        'bind': '{}:{}'.format(host, port),
+        'workers': config.SERVER_WORKERS,
+        'worker_class': worker_class,
+        'keepalive': config.SERVER_KEEPALIVE,
+        'timeout': config.SERVER_TIMEOUT,
+        'graceful_timeout': config.SERVER_GRACEFUL_TIMEOUT,
+        'accesslog': '-',
+        'errorlog': '-',
+    }
+    if worker_class == 'gevent':
+        options['worker_connections'] = config.SERVER_WORKER_CONNECTIONS
+    else:
+        options['threads'] = config.SERVER_THREADS
+    return options
+
+
+def run_production(app, host, port):
+    """
+    使用gunicorn以多进程方式启动应用
+    :param app: Flask应用实例
+    :param host: 监听地址
+    :param port: 监听端口
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class StandaloneApplication(BaseApplication):
+
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key.lower(), value)
+
+        def load(self):
+            return self.application
+
+    def post_fork(server, worker):
+        # worker进程fork之后丢弃从master继承的数据库连接，避免多个进程共用同一个socket
+        from wxcloudrun import db
+        with app.app_context():
+            db.engine.dispose()
+
+    def worker_exit(server, worker):
+        # worker退出前写回内存中累计的浏览次数
+        from wxcloudrun.common.view_counter import view_counter
+        view_counter.flush()
+
+    options = get_server_options(host, port)
+    options['post_fork'] = post_fork
+    options['worker_exit'] = worker_exit
+    logger.info("以生产模式启动: workers={} worker_class={}".format(options['workers'], options['worker_class']))
+    StandaloneApplication(app, options).run()
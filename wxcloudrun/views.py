@@ -5,8 +5,7 @@ import sys
 import uuid
 import logging
 import random
-from flask import render_template, request, g
-from wxcloudrun import app
+from flask import Blueprint, render_template, request, g
 from wxcloudrun.dao import delete_counterbyid, query_counterbyid, insert_counter, update_counterbyid
 from wxcloudrun.dao import get_user_by_openid, create_user, update_user
 from wxcloudrun.dao import get_travel_guides, get_travel_guide_by_id, create_travel_guide
@@ -14,10 +13,12 @@ from wxcloudrun.dao import get_attractions, get_attraction_by_id, create_attract
 from wxcloudrun.dao import add_favorite, remove_favorite, get_user_favorites
 from wxcloudrun.dao import create_travel_plan, get_user_travel_plans, get_travel_plan_by_id, add_travel_plan_item, get_travel_plan_items
 from wxcloudrun.model import Counters, User, TravelGuide, Attraction, Favorite, TravelPlan, TravelPlanItem
-from wxcloudrun.response import make_succ_empty_response, make_succ_response, make_err_response
+from wxcloudrun.common.response import make_succ_empty_response, make_succ_response, make_err_response
 
+bp = Blueprint('views', __name__)
 
-@app.route('/')
+
+@bp.route('/')
 def index():
     """
     :return: 返回index页面